@@ -72,7 +72,7 @@ public static class RenderManager
                     // Run the blender process with the provided arguments
                     return ProcessManager.RunProcessCheck(
                         DataManager.BlenderPath,
-                        $"-b -P \"{scriptPath}\" -- "
+                        $"-b --python-exit-code 1 -P \"{scriptPath}\" -- "
                             + $"--options \"{jsonRenderOptions}\" --quality {quality}"
                     );
                 },
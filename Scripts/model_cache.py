@@ -0,0 +1,84 @@
+########################################################################################################################
+# model_cache.py
+#
+# This script is used to locate pre-converted models. An .obj or .stl model that has been imported, scaled and centered
+# once is stored as a compressed .blend file, keyed on the source path, modification time, size and unit, so later
+# renders can open it directly instead of parsing the source file again.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import hashlib
+import os
+from typing import List
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The file extensions of the models that can be pre-converted
+SUPPORTED_EXTENSIONS = [".obj", ".stl"]
+
+
+########################################################################################################################
+# MODEL CACHE FUNCTIONS
+########################################################################################################################
+def model_key(model_path: str, unit: float) -> str:
+    """
+    Compute the cache key of a model, which changes whenever the source file is modified or imported at another scale
+    :param model_path: The path to the source model
+    :param unit: The scale of the model relative to meters
+    :return: The cache key of the model
+    """
+    stat = os.stat(model_path)
+    path = os.path.abspath(model_path)
+    identity = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{unit!r}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def cached_model_path(cache_dir: str, model_path: str, unit: float) -> str:
+    """
+    Get the path of the pre-converted .blend file of a model
+    :param cache_dir: The directory of the model cache
+    :param model_path: The path to the source model
+    :param unit: The scale of the model relative to meters
+    :return: The path of the pre-converted .blend file, which may not exist yet
+    """
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}-{model_key(model_path, unit)}.blend")
+
+
+def is_supported(model_path: str) -> bool:
+    """
+    Check if a model can be pre-converted
+    :param model_path: The path to the model
+    :return: True if the model is an .obj or .stl file, otherwise False
+    """
+    return os.path.splitext(model_path)[1] in SUPPORTED_EXTENSIONS
+
+
+def find_models(path: str) -> List[str]:
+    """
+    Find the models that can be pre-converted at a path
+    :param path: The path to a model or to a directory that is searched recursively for models
+    :return: A sorted list of model paths
+    """
+    if os.path.isfile(path):
+        return [path] if is_supported(path) else []
+
+    models = []
+    for root, _, files in os.walk(path):
+        models.extend(os.path.join(root, x) for x in files if is_supported(x))
+    return sorted(models)
+
+
+def default_cache_directory() -> str:
+    """
+    Get the default directory of the model cache
+    :return: The path of the default cache directory
+    """
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "orthographic-renderer", "models"
+    )
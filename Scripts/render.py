@@ -1,8 +1,9 @@
 ########################################################################################################################
 # render.py
 #
-# This script is used to render a view of the scene with the specified parameters. It supports rendering with both
-# Cycles and Eevee render engines. It takes GPU preference over CPU if both are available.
+# This script is used to render one or more views of the scene with the specified parameters. It supports rendering
+# with both Cycles and Eevee render engines. It takes GPU preference over CPU if both are available. When the options
+# contain a "Views" array, the scene is set up once and every view is rendered from the same Blender process.
 #
 # Copyright (C) 2024 noahsub
 ########################################################################################################################
@@ -10,23 +11,134 @@
 ########################################################################################################################
 # IMPORTS
 ########################################################################################################################
+import cProfile
 import datetime
 import json
 import math
 import argparse
 import os
+import re
+import socket
 from enum import Enum
 import sys
-from typing import Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
+import addon_utils
 import bpy
+import numpy as np
+from mathutils import Euler, Matrix
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
 if script_dir not in sys.path:
     sys.path.append(script_dir)
 
+import model_cache
+import render_atlas
+import render_cache
 import render_devices
+import render_options
+import render_profiler
+import render_tiles
+import stl_loader
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The directory of pre-converted .blend models, models are imported from their source file if this is None
+MODEL_CACHE_DIR = None
+
+# The number of triangles per rendered pixel that preview renders are decimated down to, smaller triangles than this
+# do not visibly change a preview
+PREVIEW_TRIANGLES_PER_PIXEL = 0.5
+
+# The intermediate passes of a progressive render, each following pass is rendered with more samples and a larger
+# resolution percentage, and the final pass always uses the normal settings of the render
+DEFAULT_PROGRESSIVE_PASSES = [{"Samples": 8, "Scale": 25}, {"Samples": 64, "Scale": 50}]
+
+# The file extension Blender writes for each output format, the formats that are not listed are rejected
+FORMAT_EXTENSIONS = {
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "WEBP": ".webp",
+    "OPEN_EXR": ".exr",
+    "OPEN_EXR_MULTILAYER": ".exr",
+    "TIFF": ".tif",
+    "BMP": ".bmp",
+    "TARGA": ".tga",
+    "TARGA_RAW": ".tga",
+    "HDR": ".hdr",
+    "CINEON": ".cin",
+    "DPX": ".dpx",
+}
+
+# The image setting each key of the "Output" option sets, in the order they are applied, the format comes first as
+# changing it resets the settings the new format does not support
+OUTPUT_SETTINGS = {
+    "Format": "file_format",
+    "ColorMode": "color_mode",
+    "ColorDepth": "color_depth",
+    "Compression": "compression",
+    "Quality": "quality",
+    "ExrCodec": "exr_codec",
+    "TiffCodec": "tiff_codec",
+}
+
+# The output settings that are not set by the render quality, applied before the "Output" option of every job
+DEFAULT_OUTPUT = {"Compression": 15, "Quality": 90, "ExrCodec": "ZIP"}
+
+# The output settings of a thumbnail that does not specify them
+DEFAULT_THUMBNAIL = {"Format": "JPEG", "Quality": 85}
+
+# The padding around the model as a fraction of its size when views are framed automatically, views keep their own
+# camera location if this is None
+AUTO_FRAME_PADDING = None
+
+# The padding of the "AutoFrame" option when it is set to true
+DEFAULT_AUTO_FRAME_PADDING = 0.05
+
+# The Cycles sampling settings of a job without a "Sampling" option, which are Blender's defaults, MeasureNoise stores
+# the noisy image before denoising so the noise left in each view can be measured
+DEFAULT_SAMPLING = {
+    "NoiseThreshold": 0.01,
+    "MinSamples": 0,
+    "MaxSamples": 4096,
+    "TimeLimit": 0,
+    "MeasureNoise": False,
+}
+
+# The number of samples the last render reached, read from its render statistics, which only Cycles reports
+RENDER_SAMPLES = None
+
+# The width and height in pixels of the tiles of a tiled render when the "Tiles" option is set to true
+DEFAULT_TILE_SIZE = 2048
+
+# The clip start and end distances of a new Blender camera, restored when views are not framed automatically
+DEFAULT_CLIP = (0.1, 1000.0)
+
+# The default line drawing options, colours are sRGB "r,g,b,a" strings of 0-255 values and lengths are in pixels
+DEFAULT_DRAWING = {
+    "LineThickness": 1.5,
+    "LineColour": "0,0,0,255",
+    "CreaseAngle": 134.43,
+    "HiddenLines": False,
+    "HiddenThickness": 0.75,
+    "HiddenColour": "128,128,128,255",
+    "HiddenDash": [6, 4],
+    "Faces": False,
+    "Svg": False,
+}
+
+# The module name of the add-on that writes Freestyle lines to SVG files. It is bundled with Blender up to 4.1, and from
+# 4.2 it is the "Freestyle SVG Exporter" extension, installed from extensions.blender.org as bl_ext.<repository>.<name>
+SVG_ADDON = "render_freestyle_svg"
+
+# The settings of the scene and its world recorded by snapshot_scene, which reset_scene restores between jobs
+SCENE_BASELINE = None
+
+# The vertex, face and triangle counts of the model loaded into the scene, measured once when it is loaded
+MESH_STATS = None
 
 
 ########################################################################################################################
@@ -68,6 +180,8 @@ class Position:
     A class to represent the position and rotation of an object in the scene.
     """
 
+    __slots__ = ("x", "y", "z", "rx", "ry", "rz")
+
     # The x, y, and z coordinates of the object
     x: float
     y: float
@@ -85,49 +199,621 @@ class Position:
         self.ry = ry
         self.rz = rz
 
+    @staticmethod
+    def from_dict(data: dict) -> "Position":
+        """
+        Create a position from its JSON representation
+        :param data: A dictionary with the keys X, Y, Z, Rx, Ry and Rz
+        :return: The position
+        """
+        return Position(
+            data["X"], data["Y"], data["Z"], data["Rx"], data["Ry"], data["Rz"]
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Get the JSON representation of the position
+        :return: A dictionary with the keys X, Y, Z, Rx, Ry and Rz
+        """
+        return {
+            "X": self.x,
+            "Y": self.y,
+            "Z": self.z,
+            "Rx": self.rx,
+            "Ry": self.ry,
+            "Rz": self.rz,
+        }
+
+    def get_rotation(self) -> Tuple[float, float, float]:
+        """
+        Get the rotation in radians, converted exactly so that the same view always gets the same rotation
+        :return: The x, y and z rotations in radians
+        """
+        return math.radians(self.rx), math.radians(self.ry), math.radians(self.rz)
+
     def __str__(self):
         return (
             f"X.{self.x}-Y.{self.y}-Z.{self.z}-RX.{self.rx}-RY.{self.ry}-RZ.{self.rz}"
         )
 
 
+########################################################################################################################
+# LIGHT CLASS
+########################################################################################################################
+class Light:
+    """
+    A class to represent an area light, with its colour already converted to linear RGB.
+    """
+
+    __slots__ = ("power", "size", "position", "colour")
+
+    # The power of the light in watts and its size in meters
+    power: float
+    size: float
+    # The position and rotation of the light
+    position: Position
+    # The linear red, green and blue of the light
+    colour: Tuple[float, float, float]
+
+    def __init__(
+        self,
+        power: float,
+        size: float,
+        position: Position,
+        colour: Tuple[float, float, float],
+    ):
+        self.power = power
+        self.size = size
+        self.position = position
+        self.colour = colour
+
+
+########################################################################################################################
+# CAMERA CLASS
+########################################################################################################################
+class Camera:
+    """
+    A class to represent the camera of the render options.
+    """
+
+    __slots__ = ("distance", "position")
+
+    # The distance of the starting position of the camera above the origin in meters
+    distance: float
+    # The position and rotation of the camera for a single view
+    position: Optional[Position]
+
+    def __init__(self, distance: float, position: Optional[Position]):
+        self.distance = distance
+        self.position = position
+
+    @staticmethod
+    def from_dict(data: dict) -> "Camera":
+        """
+        Create a camera from its JSON representation
+        :param data: A dictionary with the key Distance and the optional key Position
+        :return: The camera
+        """
+        position = data.get("Position")
+        return Camera(
+            data["Distance"], None if position is None else Position.from_dict(position)
+        )
+
+
+########################################################################################################################
+# SCENE FUNCTIONS
+########################################################################################################################
+def get_settings_structs() -> Dict[str, bpy.types.bpy_struct]:
+    """
+    Get the settings of the scene that jobs change, which are restored to their baseline between jobs
+    :return: The settings keyed on their name
+    """
+    scene = bpy.context.scene
+    view_layer = bpy.context.view_layer
+    return {
+        "Scene": scene,
+        "Render": scene.render,
+        "ImageSettings": scene.render.image_settings,
+        "Cycles": scene.cycles,
+        "Eevee": scene.eevee,
+        "ViewSettings": scene.view_settings,
+        "UnitSettings": scene.unit_settings,
+        "ViewLayer": view_layer,
+        "Freestyle": view_layer.freestyle_settings,
+    }
+
+
+def get_struct_settings(struct: bpy.types.bpy_struct) -> dict:
+    """
+    Get the values of the editable settings of a struct, leaving out the data blocks and collections it refers to
+    :param struct: The struct
+    :return: The value of each setting keyed on its identifier
+    """
+    settings = dict()
+    for prop in struct.bl_rna.properties:
+        if prop.is_readonly or prop.type in ("POINTER", "COLLECTION"):
+            continue
+        if prop.identifier in ("rna_type", "name"):
+            continue
+        value = getattr(struct, prop.identifier)
+        if getattr(prop, "array_length", 0) > 0:
+            value = tuple(value)
+        elif isinstance(value, set):
+            value = set(value)
+        settings[prop.identifier] = value
+    return settings
+
+
+def set_struct_settings(struct: bpy.types.bpy_struct, settings: dict) -> None:
+    """
+    Set the settings of a struct that differ from the given values. Some settings are only accepted once others are
+    set, such as a colour mode that depends on the file format, so the settings are set twice.
+    :param struct: The struct
+    :param settings: The value of each setting keyed on its identifier, as returned by get_struct_settings
+    :return: None
+    """
+    for _ in range(2):
+        for identifier, value in settings.items():
+            current = getattr(struct, identifier)
+            if isinstance(value, tuple):
+                current = tuple(current)
+            if current == value:
+                continue
+            try:
+                setattr(struct, identifier, value)
+            except (AttributeError, TypeError, ValueError):
+                pass
+
+
+def get_background_node() -> bpy.types.Node:
+    """
+    Get the background node of the world of the scene, creating the world and the node if the scene does not have them
+    :return: The background node
+    """
+    scene = bpy.context.scene
+    if scene.world is None:
+        scene.world = bpy.data.worlds.new("World")
+    scene.world.use_nodes = True
+    tree = scene.world.node_tree
+
+    node = next((x for x in tree.nodes if x.type == "BACKGROUND"), None)
+    if node is None:
+        node = tree.nodes.new("ShaderNodeBackground")
+        output = next((x for x in tree.nodes if x.type == "OUTPUT_WORLD"), None)
+        if output is None:
+            output = tree.nodes.new("ShaderNodeOutputWorld")
+        tree.links.new(node.outputs["Background"], output.inputs["Surface"])
+    return node
+
+
+def purge_orphans() -> int:
+    """
+    Remove every data block that nothing uses any more, such as the meshes, materials and images of removed models,
+    including data blocks only used by other orphans. Data blocks with a fake user, like cached preview meshes, are
+    kept.
+    :return: The number of removed data blocks
+    """
+    with render_profiler.stage("purge_orphans"):
+        removed = bpy.data.orphans_purge(
+            do_local_ids=True, do_linked_ids=True, do_recursive=True
+        )
+    return removed or 0
+
+
+def snapshot_scene() -> None:
+    """
+    Record the settings of the scene as the baseline that reset_scene returns to, after removing the meshes of the
+    startup file, such as its default cube, so that only models are ever rendered
+    :return: None
+    """
+    global SCENE_BASELINE
+
+    for obj in [x for x in bpy.data.objects if x.type == "MESH"]:
+        bpy.data.objects.remove(obj, do_unlink=True)
+    purge_orphans()
+
+    SCENE_BASELINE = get_scene_settings()
+
+
+def get_scene_settings() -> dict:
+    """
+    Get the settings of the scene and the world background, so that they can be restored later
+    :return: The settings of each struct keyed on its name, and the background colour
+    """
+    structs = get_settings_structs()
+    return {
+        "Settings": {k: get_struct_settings(v) for k, v in structs.items()},
+        "Background": tuple(get_background_node().inputs["Color"].default_value),
+    }
+
+
+def restore_scene_settings(settings: Optional[dict] = None) -> None:
+    """
+    Restore the settings of the scene and the world background, only setting the values that differ from them
+    :param settings: The settings to restore, as returned by get_scene_settings, may be None to restore the baseline
+    recorded by snapshot_scene
+    :return: None
+    """
+    if SCENE_BASELINE is None:
+        snapshot_scene()
+    if settings is None:
+        settings = SCENE_BASELINE
+
+    with render_profiler.stage("restore_settings"):
+        for name, struct in get_settings_structs().items():
+            set_struct_settings(struct, settings["Settings"][name])
+        background = get_background_node()
+        if tuple(background.inputs["Color"].default_value) != settings["Background"]:
+            background.inputs["Color"].default_value = settings["Background"]
+
+
+def reset_scene() -> None:
+    """
+    Return the scene to its baseline between jobs without reloading the factory settings: remove the models and
+    lights, clear the camera animation, purge the orphaned data and restore the recorded settings
+    :return: None
+    """
+    if SCENE_BASELINE is None:
+        snapshot_scene()
+
+    clear_models()
+    delete_lights()
+    for camera in [x for x in bpy.data.objects if x.type == "CAMERA"]:
+        camera.animation_data_clear()
+    purge_orphans()
+    restore_scene_settings()
+
+
 ########################################################################################################################
 # MODEL FUNCTIONS
 ########################################################################################################################
 
 
-def import_model(model_path: str, unit: float) -> None:
+def import_model(
+    model_path: str, unit: float, streaming: bool = False
+) -> List[bpy.types.Object]:
+    """
+    Import an .obj or .stl model, scale it to meters and center it on the origin
+    :param model_path: The path to the model
+    :param unit: The scale of the model relative to meters
+    :param streaming: Whether to load binary .stl models with the chunked loader, which keeps peak memory bounded
+    :return: The imported mesh objects
+    """
     directory = os.path.dirname(model_path)
     file_name = os.path.basename(model_path)
     name = os.path.splitext(file_name)[0]
 
-    if model_path.endswith(".obj"):
-        bpy.ops.wm.obj_import(
-            filepath=model_path,
-            directory=directory,
-            global_scale=unit,
-            forward_axis="Y",
-            up_axis="Z",
-        )
-    elif model_path.endswith(".stl"):
-        bpy.ops.wm.stl_import(
-            filepath=model_path,
-            directory=directory,
-            global_scale=unit,
-            forward_axis="Y",
-            up_axis="Z",
-        )
+    # The chunked loader scales and centers the model itself
+    if (
+        streaming
+        and model_path.endswith(".stl")
+        and stl_loader.is_binary_stl(model_path)
+    ):
+        with render_profiler.stage("import_model"):
+            obj = stl_loader.load_stl(model_path, unit, name)
+        return [obj]
+
+    # The importers name objects after the file or the objects inside it, so the new objects are found by difference
+    existing = set(bpy.data.objects.keys())
+    with render_profiler.stage("import_model"):
+        if model_path.endswith(".obj"):
+            bpy.ops.wm.obj_import(
+                filepath=model_path,
+                directory=directory,
+                global_scale=unit,
+                forward_axis="Y",
+                up_axis="Z",
+            )
+        elif model_path.endswith(".stl"):
+            bpy.ops.wm.stl_import(
+                filepath=model_path,
+                directory=directory,
+                global_scale=unit,
+                forward_axis="Y",
+                up_axis="Z",
+            )
+
+    objects = [
+        x for x in bpy.data.objects if x.name not in existing and x.type == "MESH"
+    ]
+    if len(objects) == 0:
+        raise RuntimeError(f"No meshes were imported from {model_path}")
+
+    bpy.ops.object.select_all(action="DESELECT")
+    for obj in objects:
+        obj.select_set(True)
+    with render_profiler.stage("origin_set"):
+        # bpy.ops.object.origin_set(type="ORIGIN_CENTER_OF_VOLUME", center="MEDIAN")
+        bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="BOUNDS")
+
+    # Center the objects together on the origin, which moves a single object to the origin
+    locations = np.array([x.location for x in objects])
+    extents = np.array([x.dimensions for x in objects]) / 2
+    center = ((locations - extents).min(0) + (locations + extents).max(0)) / 2
+    for obj in objects:
+        obj.location = tuple(np.array(obj.location) - center)
+    return objects
+
+
+def append_models(file_path: str) -> List[bpy.types.Object]:
+    """
+    Append the mesh objects of a .blend file to the scene, without replacing the scene like opening the file would
+    :param file_path: The path to the .blend file
+    :return: The appended mesh objects
+    """
+    with render_profiler.stage("append_blend"):
+        with bpy.data.libraries.load(file_path) as (source, target):
+            target.objects = list(source.objects)
+
+    objects = []
+    for obj in [x for x in target.objects if x is not None]:
+        if obj.type == "MESH":
+            bpy.context.scene.collection.objects.link(obj)
+            objects.append(obj)
+        else:
+            bpy.data.objects.remove(obj)
+    return objects
+
+
+def get_part_matrix(part: dict) -> Matrix:
+    """
+    Get the transform of a part of an assembly from its optional "Position" and "Scale"
+    :param part: The part
+    :return: The world matrix of the part
+    """
+    origin = {"X": 0, "Y": 0, "Z": 0, "Rx": 0, "Ry": 0, "Rz": 0}
+    position = Position.from_dict(dict(origin, **part.get("Position", {})))
+    rotation = Euler(position.get_rotation())
+    return Matrix.LocRotScale(
+        (position.x, position.y, position.z), rotation, (part.get("Scale", 1),) * 3
+    )
+
+
+def load_assembly(parts: List[dict], unit: float, streaming: bool = False) -> dict:
+    """
+    Load an assembly of parts, importing each distinct model file once and placing its repeats as objects that share
+    its mesh data, so that memory and BVH build time grow with the number of unique parts. Files are matched by the
+    hash of their contents, so copies of the same file under different paths are also shared.
+    :param parts: The parts, each with the key Model and the optional keys Unit, Position and Scale
+    :param unit: The scale of the parts without a Unit relative to meters
+    :param streaming: Whether to load binary .stl models with the chunked loader
+    :return: The number of parts, unique models and instanced parts
+    """
+    # The imported objects of each unique model and their matrices relative to the model
+    prototypes = dict()
+    instanced = 0
+
+    for part in parts:
+        model_path = part["Model"]
+        part_unit = part.get("Unit", unit)
+        key = (render_cache.hash_model(model_path), part_unit)
+        matrix = get_part_matrix(part)
+
+        if key not in prototypes:
+            # Parts are appended from the model cache if they have been prepared, as opening the file would replace
+            # the other parts
+            cached_path = None
+            if MODEL_CACHE_DIR is not None and model_cache.is_supported(model_path):
+                cached_path = model_cache.cached_model_path(
+                    MODEL_CACHE_DIR, model_path, part_unit
+                )
+            if model_path.endswith(".blend"):
+                objects = append_models(model_path)
+            elif cached_path is not None and os.path.exists(cached_path):
+                objects = append_models(cached_path)
+            else:
+                objects = import_model(model_path, part_unit, streaming)
+
+            # matrix_world is only recomputed from the location, rotation and scale set by the import when the view
+            # layer is updated
+            bpy.context.view_layer.update()
+            prototypes[key] = [(x, x.matrix_world.copy()) for x in objects]
+            for obj, local in prototypes[key]:
+                obj.matrix_world = matrix @ local
+            continue
+
+        # Place a repeat of the model as new objects linked to the same mesh data
+        for prototype, local in prototypes[key]:
+            obj = bpy.data.objects.new(prototype.name, prototype.data)
+            bpy.context.scene.collection.objects.link(obj)
+            obj.matrix_world = matrix @ local
+        instanced += 1
+
+    bpy.context.view_layer.update()
+    return {"Parts": len(parts), "Unique": len(prototypes), "Instanced": instanced}
+
+
+def get_model_identity(data: dict) -> tuple:
+    """
+    Get what identifies the model of the render options in the scene, either its model or its assembly of parts. The
+    modification time and size of each model file are part of it, so a model that is changed in place is loaded again.
+    :param data: The render options
+    :return: A tuple that is equal for render options that load the same model
+    """
+    models = data.get("Models")
+    paths = [data.get("Model")] if models is None else [x["Model"] for x in models]
+    return (
+        data.get("Model"),
+        data["Unit"],
+        None if models is None else json.dumps(models, sort_keys=True),
+        tuple(get_file_state(x) for x in paths),
+    )
 
+
+def get_file_state(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Get the modification time and size of a file, which change whenever the file is written
+    :param path: The path to the file
+    :return: The modification time in nanoseconds and the size in bytes, or None if the file does not exist
+    """
     try:
-        bpy.data.objects.remove(bpy.data.objects["Cube"], do_unlink=True)
-    except:
-        pass
+        stat = os.stat(path)
+    except (FileNotFoundError, TypeError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
-    bpy.ops.object.select_all(action="DESELECT")
-    bpy.data.objects[name].select_set(True)
-    # bpy.ops.object.origin_set(type="ORIGIN_CENTER_OF_VOLUME", center="MEDIAN")
-    bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="BOUNDS")
-    bpy.data.objects[name].location = (0, 0, 0)
+
+def get_mesh_stats() -> dict:
+    """
+    Get the number of vertices, faces and triangles of every mesh object in the scene combined
+    :return: A dictionary with the keys Objects, Vertices, Faces and Triangles
+    """
+    meshes = [x.data for x in bpy.data.objects if x.type == "MESH"]
+    return {
+        "Objects": len(meshes),
+        "Vertices": sum(len(x.vertices) for x in meshes),
+        "Faces": sum(len(x.polygons) for x in meshes),
+        "Triangles": sum(count_triangles(x) for x in meshes),
+    }
+
+
+def get_model_bounds() -> Optional[np.ndarray]:
+    """
+    Get the world space bounding box of every mesh in the scene. It is computed once from the vertex coordinates of the
+    full meshes and stored on the scene, so that it is also saved with the model in the model cache.
+    :return: A (2, 3) array of the minimum and maximum corners, or None if the scene has no vertices
+    """
+    scene = bpy.context.scene
+    if "ModelBounds" in scene:
+        return np.array(scene["ModelBounds"], dtype=np.float64).reshape(2, 3)
+
+    minimum = np.full(3, np.inf)
+    maximum = np.full(3, -np.inf)
+    for obj in [x for x in bpy.data.objects if x.type == "MESH"]:
+        # Measure the full mesh rather than its decimated preview
+        mesh = bpy.data.meshes.get(obj.get("FullMesh", ""), obj.data)
+        if len(mesh.vertices) == 0:
+            continue
+        coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coordinates)
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        world = coordinates.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        minimum = np.minimum(minimum, world.min(axis=0))
+        maximum = np.maximum(maximum, world.max(axis=0))
+
+    if not np.all(np.isfinite(minimum)):
+        return None
+    bounds = np.array([minimum, maximum])
+    scene["ModelBounds"] = bounds.ravel().tolist()
+    return bounds
+
+
+def clear_models() -> None:
+    """
+    Remove every mesh object and its mesh data, including any decimated preview meshes, from the scene, so that a
+    different model can be imported
+    :return: None
+    """
+    for obj in [x for x in bpy.data.objects if x.type == "MESH"]:
+        names = {obj.data.name, obj.get("FullMesh", obj.data.name)}
+        bpy.data.objects.remove(obj, do_unlink=True)
+        for mesh in [x for x in bpy.data.meshes if x.name.split(".lod")[0] in names]:
+            mesh.use_fake_user = False
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+
+    # Forget the bounds of the removed meshes
+    if "ModelBounds" in bpy.context.scene:
+        del bpy.context.scene["ModelBounds"]
+
+
+########################################################################################################################
+# LEVEL OF DETAIL FUNCTIONS
+########################################################################################################################
+def count_triangles(mesh: bpy.types.Mesh) -> int:
+    """
+    Count the triangles of a mesh
+    :param mesh: The mesh
+    :return: The number of triangles of the mesh
+    """
+    mesh.calc_loop_triangles()
+    return len(mesh.loop_triangles)
+
+
+def get_preview_triangle_budget(data: dict) -> int:
+    """
+    Get the number of triangles a preview render is decimated down to, either the "PreviewTriangles" option or a budget
+    derived from the number of rendered pixels
+    :param data: The render options
+    :return: The triangle budget
+    """
+    if "PreviewTriangles" in data:
+        return data["PreviewTriangles"]
+
+    resolution = data["Resolution"]
+    scale = resolution["Scale"] / 100
+    pixels = resolution["Width"] * scale * resolution["Height"] * scale
+    return int(pixels * PREVIEW_TRIANGLES_PER_PIXEL)
+
+
+def apply_preview_lod(data: dict) -> None:
+    """
+    Replace the meshes of the scene with decimated copies that fit the preview triangle budget. The decimated meshes
+    are kept per model and ratio, in memory and in the model cache, so repeated previews reuse them.
+    :param data: The render options
+    :return: None
+    """
+    objects = [x for x in bpy.data.objects if x.type == "MESH"]
+    full_meshes = [bpy.data.meshes[x.get("FullMesh", x.data.name)] for x in objects]
+    total = sum(count_triangles(x) for x in full_meshes)
+    budget = get_preview_triangle_budget(data)
+
+    if total <= budget:
+        restore_full_meshes()
+        return
+
+    # Quantize the ratio so that nearby budgets share the same decimated mesh
+    ratio = max(0.01, round(budget / total, 2))
+
+    for obj, full_mesh in zip(objects, full_meshes):
+        lod_name = f"{full_mesh.name}.lod{ratio:.2f}"
+        lod_path = None
+        # The decimated meshes of assemblies are only kept in memory
+        cacheable = "Models" not in data and model_cache.is_supported(data["Model"])
+        if MODEL_CACHE_DIR is not None and cacheable:
+            cached_path = model_cache.cached_model_path(
+                MODEL_CACHE_DIR, data["Model"], data["Unit"]
+            )
+            # Only the extension is replaced, as ".blend" may also appear in the directory or the model name
+            root, extension = os.path.splitext(cached_path)
+            lod_path = root + f"-{lod_name}" + extension
+
+        # Load the decimated mesh from the model cache if it has been created by another process
+        if lod_name not in bpy.data.meshes and lod_path and os.path.exists(lod_path):
+            with bpy.data.libraries.load(lod_path) as (source, target):
+                target.meshes = [lod_name]
+            bpy.data.meshes[lod_name].use_fake_user = True
+
+        # Otherwise, decimate the full mesh and store the result
+        if lod_name not in bpy.data.meshes:
+            obj.data = full_mesh
+            modifier = obj.modifiers.new(name="PreviewLOD", type="DECIMATE")
+            modifier.ratio = ratio
+            evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+            lod_mesh = bpy.data.meshes.new_from_object(evaluated)
+            lod_mesh.name = lod_name
+            lod_mesh.use_fake_user = True
+            obj.modifiers.remove(modifier)
+            if lod_path is not None:
+                temporary = lod_path + f".{os.getpid()}.tmp.blend"
+                bpy.data.libraries.write(temporary, {lod_mesh}, compress=True)
+                os.replace(temporary, lod_path)
+
+        # Keep the full mesh alive while the object uses the decimated one
+        full_mesh.use_fake_user = True
+        obj["FullMesh"] = full_mesh.name
+        obj.data = bpy.data.meshes[lod_name]
+
+
+def restore_full_meshes() -> None:
+    """
+    Swap any decimated preview meshes back to the full meshes, so that normal quality renders stay exact
+    :return: None
+    """
+    for obj in bpy.data.objects:
+        if obj.type == "MESH" and "FullMesh" in obj:
+            obj.data = bpy.data.meshes[obj["FullMesh"]]
+            del obj["FullMesh"]
 
 
 ########################################################################################################################
@@ -135,7 +821,9 @@ def import_model(model_path: str, unit: float) -> None:
 ########################################################################################################################
 
 
-def set_render_preferences(quality: str) -> Tuple[str, str]:
+def set_render_preferences(
+    quality: str, sampling: Optional[dict] = None
+) -> Tuple[str, str]:
     device = render_devices.set_render_device()
 
     bpy.context.scene.cycles.preview_samples = 500
@@ -164,7 +852,6 @@ def set_render_preferences(quality: str) -> Tuple[str, str]:
         bpy.context.scene.render.image_settings.file_format = "PNG"
         bpy.context.scene.render.image_settings.color_mode = "RGBA"
         bpy.context.scene.render.image_settings.color_depth = "16"
-        bpy.context.scene.render.image_settings.exr_codec = "DWAA"
 
     if quality == "preview":
         # Switch to Eevee render engine
@@ -178,11 +865,182 @@ def set_render_preferences(quality: str) -> Tuple[str, str]:
         bpy.context.scene.render.image_settings.file_format = "PNG"
         bpy.context.scene.render.image_settings.color_mode = "RGBA"
         bpy.context.scene.render.image_settings.color_depth = "8"
-        bpy.context.scene.render.image_settings.exr_codec = "NONE"
+
+    set_sampling_budget(sampling or dict())
 
     return device
 
 
+def set_sampling_budget(sampling: dict) -> None:
+    """
+    Set the noise and time budget of a render. Cycles samples each pixel adaptively until its noise is below the
+    threshold, the maximum number of samples is reached or the time limit runs out, so simple parts finish early and
+    complex parts stop at the same wall-clock budget. Eevee only uses the maximum number of samples. With MeasureNoise,
+    Cycles also stores the noisy image before denoising, as the noise estimate of a denoised image says nothing about
+    the samples it took, while the delivered image stays denoised.
+    :param sampling: The budget with the optional keys NoiseThreshold, MinSamples, MaxSamples and TimeLimit in seconds,
+    0 meaning no limit, and MeasureNoise
+    :return: None
+    """
+    scene = bpy.context.scene
+    if scene.render.engine != "CYCLES":
+        if "MaxSamples" in sampling:
+            scene.eevee.taa_render_samples = sampling["MaxSamples"]
+        return
+
+    sampling = dict(DEFAULT_SAMPLING, **sampling)
+    scene.cycles.use_adaptive_sampling = True
+    scene.cycles.adaptive_threshold = sampling["NoiseThreshold"]
+    scene.cycles.adaptive_min_samples = sampling["MinSamples"]
+    scene.cycles.samples = sampling["MaxSamples"]
+    scene.cycles.time_limit = sampling["TimeLimit"]
+    bpy.context.view_layer.cycles.denoising_store_passes = sampling["MeasureNoise"]
+
+
+def set_drawing_mode(drawing: Optional[dict]) -> None:
+    """
+    Render the model as a line drawing of its silhouettes, borders and creases with Freestyle. The faces are left out
+    of the render unless asked for, and the lines need neither lighting nor samples, so Eevee is used with a single
+    sample whatever the quality. With "Svg", the lines are also written as vectors next to each rendered image.
+    :param drawing: The drawing options with the optional keys of DEFAULT_DRAWING, or None to render shaded views
+    :return: None
+    :raises RuntimeError: If SVG output is asked for and the SVG exporter add-on is not available
+    """
+    scene = bpy.context.scene
+    view_layer = bpy.context.view_layer
+    scene.render.use_freestyle = drawing is not None
+    view_layer.use_freestyle = drawing is not None
+    view_layer.use_solid = drawing is None or drawing.get("Faces", False)
+    if drawing is None:
+        if hasattr(scene, "svg_export"):
+            scene.svg_export.use_svg_export = False
+        return
+
+    drawing = dict(DEFAULT_DRAWING, **drawing)
+    scene.render.engine = "BLENDER_EEVEE_NEXT"
+    scene.eevee.taa_render_samples = 1
+    scene.render.line_thickness_mode = "ABSOLUTE"
+
+    settings = view_layer.freestyle_settings
+    settings.mode = "EDITOR"
+    settings.crease_angle = math.radians(drawing["CreaseAngle"])
+    for lineset in list(settings.linesets):
+        settings.linesets.remove(lineset)
+
+    add_drawing_lines("Visible", drawing["LineThickness"], drawing["LineColour"], None)
+    if drawing["HiddenLines"]:
+        add_drawing_lines(
+            "Hidden",
+            drawing["HiddenThickness"],
+            drawing["HiddenColour"],
+            drawing["HiddenDash"],
+        )
+
+    if drawing["Svg"]:
+        addon_utils.enable(get_svg_addon(), default_set=True)
+        if not hasattr(scene, "svg_export"):
+            raise RuntimeError(f"The {SVG_ADDON} add-on could not be enabled")
+    if hasattr(scene, "svg_export"):
+        scene.svg_export.use_svg_export = drawing["Svg"]
+        scene.svg_export.mode = "FRAME"
+
+
+def get_svg_addon() -> str:
+    """
+    Get the full module name of the Freestyle SVG exporter, which is the bundled add-on up to Blender 4.1 and an
+    extension of whichever repository it was installed from since Blender 4.2
+    :return: The module name to enable
+    :raises RuntimeError: If the exporter is not installed
+    """
+    for module in addon_utils.modules():
+        if module.__name__ == SVG_ADDON or module.__name__.endswith("." + SVG_ADDON):
+            return module.__name__
+    raise RuntimeError(
+        f"The {SVG_ADDON} add-on is not installed, on Blender 4.2 and later install the "
+        "Freestyle SVG Exporter extension from extensions.blender.org to write SVG files"
+    )
+
+
+def add_drawing_lines(
+    visibility: str, thickness: float, colour: str, dash: Optional[List[int]]
+) -> None:
+    """
+    Add a Freestyle line set that draws the silhouettes, borders and creases of a visibility
+    :param visibility: Either 'Visible' or 'Hidden'
+    :param thickness: The thickness of the lines in pixels
+    :param colour: The sRGB colour of the lines as a "r,g,b,a" string of 0-255 values
+    :param dash: The dash and gap lengths in pixels, or None for solid lines
+    :return: None
+    """
+    rgba = get_linear_colour(colour)
+    lineset = bpy.context.view_layer.freestyle_settings.linesets.new(visibility)
+    lineset.select_by_visibility = True
+    lineset.visibility = visibility.upper()
+    lineset.select_by_edge_types = True
+    lineset.select_silhouette = True
+    lineset.select_border = True
+    lineset.select_crease = True
+
+    # Reuse the line style of a previous job so that line styles do not pile up in a worker
+    name = f"Drawing{visibility}"
+    linestyle = bpy.data.linestyles.get(name) or bpy.data.linestyles.new(name)
+    linestyle.thickness = thickness
+    linestyle.color = rgba[:3]
+    linestyle.alpha = rgba[3]
+    linestyle.use_dashed_line = dash is not None
+    if dash is not None:
+        linestyle.dash1, linestyle.gap1 = dash
+    lineset.linestyle = linestyle
+
+
+def record_render_samples(stats: str, *args) -> None:
+    """
+    Record the number of samples reached from the render statistics, which Cycles reports as "Sample <n>/<total>".
+    Eevee does not report its samples this way, so the samples of an Eevee render are not recorded.
+    :param stats: The render statistics line
+    :return: None
+    """
+    global RENDER_SAMPLES
+
+    match = re.search(r"Sample (\d+)", str(stats))
+    if match is not None:
+        RENDER_SAMPLES = max(RENDER_SAMPLES or 0, int(match.group(1)))
+
+
+def set_output_format(output: dict) -> dict:
+    """
+    Set the image settings of the scene from an output format, leaving the settings it does not specify unchanged
+    :param output: The output format with the optional keys Format, ColorMode, ColorDepth, Compression, Quality and
+    ExrCodec
+    :return: The previous values of all the settings, which restore them when passed back to this function
+    """
+    image_settings = bpy.context.scene.render.image_settings
+
+    # Changing the format can also change the colour mode and depth, so every setting is recorded
+    previous = {k: getattr(image_settings, v) for k, v in OUTPUT_SETTINGS.items()}
+    for key, attribute in OUTPUT_SETTINGS.items():
+        if key in output:
+            value = str(output[key]) if key == "ColorDepth" else output[key]
+            setattr(image_settings, attribute, value)
+    return previous
+
+
+def get_file_extension(output: dict) -> str:
+    """
+    Get the file extension of the images written with an output format
+    :param output: The output format
+    :return: The file extension including the leading dot
+    :raises ValueError: If the format is not a still image format with a known extension
+    """
+    file_format = output.get("Format", "PNG")
+    if file_format not in FORMAT_EXTENSIONS:
+        raise ValueError(
+            f"Unsupported output format {file_format!r}, expected one of "
+            + ", ".join(FORMAT_EXTENSIONS)
+        )
+    return FORMAT_EXTENSIONS[file_format]
+
+
 def set_render_resolution(width: int, height: int, scale: int) -> None:
     """
     Set the resolution of the rendered image
@@ -196,179 +1054,986 @@ def set_render_resolution(width: int, height: int, scale: int) -> None:
     bpy.context.scene.render.resolution_percentage = scale
 
 
-def render_generic_view(name: str, output_folder: str, position: Position):
+def set_render_threads(threads: int) -> None:
+    """
+    Fix the number of threads used for rendering, or let Blender detect it
+    :param threads: The number of threads to use, or 0 to automatically detect the number of threads
+    :return: None
+    """
+    if threads == 0:
+        bpy.context.scene.render.threads_mode = "AUTO"
+    else:
+        bpy.context.scene.render.threads_mode = "FIXED"
+        bpy.context.scene.render.threads = threads
+
+
+def render_generic_view(
+    name: str, output_folder: str, position: Position, write: bool = True
+):
     """
     Render a generic view of the scene with the specified parameters
     :param name: The name of the rendered image
     :param output_folder: The output folder for the rendered image
     :param position: The position and rotation of the camera
+    :param write: Whether to write the rendered image, otherwise it is only kept in the render result
     :return: None
+    :raises Exception: If the render fails
     """
-    set_camera_pos_and_rot(position)
-    bpy.context.scene.render.filepath = output_folder + f"{name}"
-    try:
-        bpy.ops.render.render(write_still=True)
-    except Exception as e:
-        sys.exit(1)
-
-
-########################################################################################################################
-# CAMERA FUNCTIONS
-########################################################################################################################
-def create_camera() -> None:
-    exists = False
-    # Iterate through all the objects in the scene
-    for obj in bpy.data.objects:
-        if obj.type == "CAMERA" and obj.name == "Camera":
-            exists = True
-
-    # If a camera with the name "Camera" does not exist, create one
-    if not exists:
-        bpy.ops.object.camera_add(
-            enter_editmode=False,
-            align="VIEW",
-            location=(0, 0, 0),
-            rotation=(0, 0, 0),
-            scale=(1, 1, 1),
-        )
+    place_camera(position)
+    render_still(output_folder + f"{name}", write)
 
 
-def set_camera_start_pos(distance: float) -> None:
+def remove_output(file_path: str) -> None:
     """
-    Set the camera to a birds eye view of the origin
-    :param distance: The distance from the origin to the camera in meters along the z-axis
+    Remove an image before it is written again. The image may be hardlinked to a render cache entry, which writing it
+    in place would also change.
+    :param file_path: The path of the image
     :return: None
     """
-    # set the initial camera position and rotation to look at the origin from a birds eye view
-    bpy.data.objects["Camera"].location[0] = 0
-    bpy.data.objects["Camera"].location[1] = 0
-    bpy.data.objects["Camera"].location[2] = distance
-
-    bpy.data.objects["Camera"].rotation_euler[0] = 0
-    bpy.data.objects["Camera"].rotation_euler[1] = 0
-    bpy.data.objects["Camera"].rotation_euler[2] = 0
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
 
 
-def set_camera_pos_and_rot(pos: Position) -> None:
+def render_still(file_path: str, write: bool = True) -> None:
     """
-    Set the camera to a specific position and rotation
-    :param pos: The position and rotation of the camera
+    Render the scene and write the result, timing the render and the image write as separate stages
+    :param file_path: The path of the rendered image without its file extension
+    :param write: Whether to write the rendered image, otherwise it is only kept in the render result
+    :return: None
+    :raises Exception: If the render fails
     """
-    bpy.data.objects["Camera"].location[0] = pos.x
-    bpy.data.objects["Camera"].location[1] = pos.y
-    bpy.data.objects["Camera"].location[2] = pos.z
-
-    bpy.data.objects["Camera"].rotation_euler[0] = degrees_to_radians(pos.rx)
-    bpy.data.objects["Camera"].rotation_euler[1] = degrees_to_radians(pos.ry)
-    bpy.data.objects["Camera"].rotation_euler[2] = degrees_to_radians(pos.rz)
-
-
-########################################################################################################################
-# LIGHTING FUNCTIONS
-########################################################################################################################
+    global RENDER_SAMPLES
+
+    scene = bpy.context.scene
+    scene.render.filepath = file_path
+    if record_render_samples not in bpy.app.handlers.render_stats:
+        bpy.app.handlers.render_stats.append(record_render_samples)
+    RENDER_SAMPLES = None
+    with render_profiler.stage("render"):
+        bpy.ops.render.render()
+
+    # The SVG exporter names its file after the frame, move it next to the image
+    svg_path = file_path + f"{scene.frame_current:04d}.svg"
+    if os.path.exists(svg_path):
+        os.replace(svg_path, file_path + ".svg")
+    if not write:
+        return
+    with render_profiler.stage("write_image"):
+        remove_output(file_path + scene.render.file_extension)
+        bpy.data.images["Render Result"].save_render(
+            filepath=file_path + scene.render.file_extension
+        )
 
 
-def create_area_light(power, size, position, colour):
-    # Create a new area light
-    bpy.ops.object.light_add(
-        type="AREA", align="WORLD", location=(0, 0, 0), scale=(1, 1, 1)
+def get_output_size() -> Tuple[int, int]:
+    """
+    Get the size of the rendered image after the resolution percentage is applied
+    :return: The width and height of the rendered image in pixels
+    """
+    render = bpy.context.scene.render
+    return (
+        render.resolution_x * render.resolution_percentage // 100,
+        render.resolution_y * render.resolution_percentage // 100,
     )
 
-    # Get the newly created light
-    light = bpy.context.object
-
-    # Set the light's power
-    light.data.energy = power
-
-    # Set the light's size
-    light.data.size = size
 
-    # Parse the colour
-    rgb_colour = [int(x) for x in colour.split(",")]
-    # Convert sRGB to linear RGB
-    linear_rgb_colour = [srgb_to_linearrgb(x) for x in rgb_colour][:3]
-    # Set the light's colour
-    light.data.color = tuple(linear_rgb_colour)
-
-    # Set the light's position
-    light.location[0] = position.x
-    light.location[1] = position.y
-    light.location[2] = position.z
-
-    # Set the light's rotation
-    light.rotation_euler[0] = degrees_to_radians(position.rx)
-    light.rotation_euler[1] = degrees_to_radians(position.ry)
-    light.rotation_euler[2] = degrees_to_radians(position.rz)
-
-
-def setup_lighting(distance: float):
-    # delete all existing lights
-    bpy.ops.object.select_all(action="DESELECT")
-    bpy.ops.object.select_by_type(type="LIGHT")
-    bpy.ops.object.delete()
+def set_render_border(x: int, y: int, width: int, height: int) -> None:
+    """
+    Limit the render to a region of the image, cropping the render result to the region
+    :param x: The left edge of the region in pixels
+    :param y: The top edge of the region in pixels
+    :param width: The width of the region in pixels
+    :param height: The height of the region in pixels
+    :return: None
+    """
+    render = bpy.context.scene.render
+    image_width, image_height = get_output_size()
+
+    # The border is a fraction of the image measured from the bottom left corner, offset by a quarter of a pixel so
+    # that Blender lands on the same pixel whether it rounds or truncates
+    render.use_border = True
+    render.use_crop_to_border = True
+    render.border_min_x = min(1.0, (x + 0.25) / image_width)
+    render.border_max_x = min(1.0, (x + width + 0.25) / image_width)
+    render.border_min_y = min(1.0, (image_height - y - height + 0.25) / image_height)
+    render.border_max_y = min(1.0, (image_height - y + 0.25) / image_height)
+
+
+def render_tile_files(
+    name: str,
+    output_folder: str,
+    tiles: List[Tuple[int, int, int, int]],
+    shard: Optional[Tuple[int, int]] = None,
+    signature: Optional[str] = None,
+) -> List[str]:
+    """
+    Render regions of the image as separate uncompressed TIFF files. With a signature, the regions whose file already
+    exists and was rendered with the same signature are skipped, and every rendered tile records the signature in a
+    sidecar file next to it. Without a signature, every region is rendered.
+    :param name: The name of the rendered image, the tiles are named <name>.tile<index>
+    :param output_folder: The output folder for the tiles
+    :param tiles: The (x, y, width, height) regions to render
+    :param shard: The index of this process and the number of processes to only render every n-th tile, may be None
+    :param signature: The hash of what the tiles are rendered with, may be None
+    :return: The path of the file of each tile
+    """
+    render = bpy.context.scene.render
+    tile_output = {
+        "Format": "TIFF",
+        "ColorMode": render.image_settings.color_mode,
+        "ColorDepth": "16" if render.image_settings.color_depth == "16" else "8",
+        "TiffCodec": "NONE",
+    }
+    previous = set_output_format(tile_output)
+
+    paths = []
+    try:
+        for index, (x, y, width, height) in enumerate(tiles):
+            path = output_folder + f"{name}.tile{index}"
+            paths.append(path + ".tif")
+            if signature is not None and render_tiles.is_tile_current(
+                paths[-1], signature
+            ):
+                continue
+            if shard is not None and index % shard[1] != shard[0]:
+                continue
+            set_render_border(x, y, width, height)
+            render_still(path)
+            if signature is not None:
+                render_tiles.write_tile_signature(paths[-1], signature)
+    finally:
+        set_output_format(previous)
+        render.use_border = False
+        render.use_crop_to_border = False
+    return paths
+
+
+def render_tiled_view(
+    name: str,
+    output_folder: str,
+    position: Position,
+    tile_size: int,
+    data: dict,
+    quality: str,
+    shard: Optional[Tuple[int, int]] = None,
+) -> None:
+    """
+    Render a view as tiles and stitch them into a single PNG row by row, so that neither the render nor the stitching
+    needs memory for the whole image. With a shard, only this process's share of the tiles is rendered and the tiles
+    are kept. A later run without a shard reuses the tiles rendered with the same signature, renders any other tiles
+    and stitches the image.
+    :param name: The name of the rendered image
+    :param output_folder: The output folder for the rendered image
+    :param position: The position and rotation of the camera
+    :param tile_size: The maximum width and height of a tile in pixels
+    :param data: The render options, which the reused tiles must have been rendered with
+    :param quality: The quality of the render
+    :param shard: The index of this process and the number of processes to only render every n-th tile, may be None
+    :return: None
+    :raises Exception: If the render fails
+    """
+    image_settings = bpy.context.scene.render.image_settings
+    if image_settings.file_format != "PNG":
+        raise ValueError("Tiled renders can only be written as PNG")
+    compression = round(image_settings.compression * 9 / 100)
+
+    width, height = get_output_size()
+    tiles = render_tiles.get_tiles(width, height, tile_size)
+    place_camera(position)
+    signature = get_tile_signature(data, quality, position, tile_size)
+    paths = render_tile_files(name, output_folder, tiles, shard, signature)
+    if shard is not None:
+        return
+
+    with render_profiler.stage("stitch_tiles"):
+        render_tiles.stitch_tiles(
+            tiles, paths, output_folder + name + ".png", compression
+        )
+    for path in paths:
+        render_tiles.remove_tile(path)
 
-    leg = compute_triangular_leg(distance)
 
-    # Create top front left light
-    create_area_light(1000, 3, Position(-leg, -leg, distance, 45, 0, 315))
-    # Create top front right light
-    create_area_light(800, 3, Position(leg, -leg, distance, 45, 0, 45))
-    # Create top back left light
-    create_area_light(200, 3, Position(-leg, leg, distance, 45, 0, 225))
+def get_tile_signature(
+    data: dict, quality: str, position: Position, tile_size: int
+) -> str:
+    """
+    Get the signature of the tiles of a view, which changes with the render options, the quality, the camera position,
+    the tile size, the Blender version and the model files, so that tiles left behind by another render are not reused
+    :param data: The render options
+    :param quality: The quality of the render
+    :param position: The position and rotation of the camera
+    :param tile_size: The maximum width and height of a tile in pixels
+    :return: The hex digest of the signature
+    """
+    environment = {
+        "Blender": bpy.app.version_string,
+        "Model": get_model_identity(data),
+        "TileSize": tile_size,
+    }
+    return render_cache.hash_options(data, position.to_dict(), quality, environment)
 
 
-########################################################################################################################
-# COMPUTATION FUNCTIONS
-########################################################################################################################
-def degrees_to_radians(degrees: float) -> float:
+def render_region_view(
+    name: str, output_folder: str, position: Position, region: dict
+) -> None:
     """
-    Convert degrees to radians
-    :param degrees: The degrees to convert to radians
-    :return: The converted degrees in radians value
+    Render only a region of a view and patch it into the image rendered before, leaving the rest of the image as is
+    :param name: The name of the rendered image
+    :param output_folder: The output folder for the rendered image
+    :param position: The position and rotation of the camera
+    :param region: The region with the keys X, Y, Width and Height in pixels, measured from the top left corner
+    :return: None
+    :raises Exception: If the render fails or the existing image does not have the size of the render
     """
-    return degrees * (3.14159 / 180)
-
+    file_path = output_folder + name + bpy.context.scene.render.file_extension
+    width, height = get_output_size()
+    tile = (region["X"], region["Y"], region["Width"], region["Height"])
+    x, y, tile_width, tile_height = tile
 
-def compute_triangular_leg(distance: float):
+    place_camera(position)
+    (tile_path,) = render_tile_files(name + "-region", output_folder, [tile])
+    try:
+        patch, associated = render_tiles.read_tiff(tile_path)
+        if associated and patch.shape[2] == 4:
+            patch = render_tiles.unpremultiply(patch)
+        patch = patch.astype(np.float32) / np.iinfo(patch.dtype).max
+
+        # Load the stored values of the existing image, without converting them to linear colours
+        image = bpy.data.images.load(file_path)
+        try:
+            image.colorspace_settings.name = "Non-Color"
+            if tuple(image.size) != (width, height):
+                raise ValueError(f"{file_path} is not {width}x{height} pixels")
+            pixels = np.empty(width * height * 4, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+
+            # Blender stores the rows bottom first
+            rows = pixels.reshape(height, width, 4)[::-1]
+            rows[y : y + tile_height, x : x + tile_width, : patch.shape[2]] = patch
+            image.pixels.foreach_set(pixels)
+            with render_profiler.stage("write_image"):
+                remove_output(file_path)
+                image.save()
+        finally:
+            bpy.data.images.remove(image)
+    finally:
+        os.remove(tile_path)
+
+
+def render_progressive_view(
+    name: str, output_folder: str, position: Position, passes: List[dict]
+) -> None:
     """
-    Compute the length of the leg of a right-angled triangle given the hypotenuse
-    :param distance: The length of the hypotenuse
-    :return: The length of the leg of the triangle
+    Render a view as a series of quick low-sample passes followed by a final pass with the normal settings, printing a
+    status line after each pass so the caller can show an image early and swap in the better ones as they arrive. The
+    scene, and with persistent data also the render data, is reused between the passes.
+    :param name: The name of the rendered image, intermediate passes are suffixed with -pass<index>
+    :param output_folder: The output folder for the rendered images
+    :param position: The position and rotation of the camera
+    :param passes: The intermediate passes, each with the keys Samples and Scale
+    :return: None
+    :raises Exception: If the render fails
     """
-    return math.sqrt(math.pow(distance, 2) / 2)
+    scene = bpy.context.scene
+    cycles = scene.render.engine == "CYCLES"
+    final_samples = scene.cycles.samples if cycles else scene.eevee.taa_render_samples
+    final_scale = scene.render.resolution_percentage
+    start = time.perf_counter()
 
+    place_camera(position)
 
-########################################################################################################################
-# FILE FUNCTIONS
-########################################################################################################################
+    try:
+        for index, render_pass in enumerate(passes + [None]):
+            # The final pass restores the normal settings so it matches a normal render
+            if render_pass is None:
+                samples, scale, pass_name = final_samples, final_scale, name
+            else:
+                samples = render_pass["Samples"]
+                scale = min(final_scale, render_pass["Scale"])
+                pass_name = f"{name}-pass{index}"
+
+            if cycles:
+                scene.cycles.samples = samples
+            else:
+                scene.eevee.taa_render_samples = samples
+            scene.render.resolution_percentage = scale
+            render_still(output_folder + pass_name)
+
+            print_status(
+                "PASS",
+                {
+                    "Name": name,
+                    "Pass": index,
+                    "Final": render_pass is None,
+                    "Samples": samples,
+                    "Scale": scale,
+                    "Path": output_folder + pass_name + scene.render.file_extension,
+                    "Seconds": round(time.perf_counter() - start, 3),
+                },
+            )
+    finally:
+        if cycles:
+            scene.cycles.samples = final_samples
+        else:
+            scene.eevee.taa_render_samples = final_samples
+        scene.render.resolution_percentage = final_scale
 
 
-def save_file(file_path: str) -> None:
+def enable_pixel_capture(noisy: bool = False) -> None:
     """
-    Save the file as a .blend file.
-    :param file_path: The path to save the file
+    Add a compositor viewer node fed by the render layers, so that the pixels of each render can be read from memory.
+    The render result itself does not expose its pixels to Python.
+    :param noisy: Whether to capture the noisy image Cycles stores before denoising instead of the final image, the
+    final image is captured if the render does not store it
     :return: None
     """
-    bpy.ops.wm.save_as_mainfile(
-        filepath=file_path.replace(".obj", ".blend").replace(".stl", ".blend")
+    scene = bpy.context.scene
+    scene.use_nodes = True
+    tree = scene.node_tree
+    layers = next((x for x in tree.nodes if x.type == "R_LAYERS"), None)
+    if layers is None:
+        layers = tree.nodes.new("CompositorNodeRLayers")
+
+    viewer = tree.nodes.get("Capture")
+    if viewer is None:
+        viewer = tree.nodes.new("CompositorNodeViewer")
+        viewer.name = "Capture"
+        viewer.use_alpha = True
+
+    # Only the pass that is captured is linked to the viewer, the final image is still written by the render
+    source = layers.outputs["Image"]
+    noisy_image = layers.outputs.get("Noisy Image")
+    if noisy and noisy_image is not None and noisy_image.enabled:
+        source = noisy_image
+    if not any(x.from_socket == source for x in viewer.inputs["Image"].links):
+        tree.links.new(source, viewer.inputs["Image"])
+    tree.nodes.active = viewer
+
+
+def capture_render_pixels() -> np.ndarray:
+    """
+    Copy the pixels of the last render out of the viewer node in a single bulk read
+    :return: A (height, width, 4) float32 array of the linear pixels, top row first
+    """
+    image = bpy.data.images["Viewer Node"]
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, 4)[::-1]
+
+
+def write_pixels(
+    pixels: np.ndarray,
+    file_path: str,
+    size: Optional[Tuple[int, int]] = None,
+    output: Optional[dict] = None,
+) -> str:
+    """
+    Write pixels to an image with the image settings and colour management of the scene
+    :param pixels: A (height, width, 4) float array of linear pixels, top row first
+    :param file_path: The path of the image without its file extension
+    :param size: The width and height to scale the image to before writing it, may be None
+    :param output: An output format that overrides the image settings of the scene for this image only, may be None
+    :return: The path of the written image
+    """
+    scene = bpy.context.scene
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(
+        os.path.basename(file_path), width, height, alpha=True, float_buffer=True
     )
+    previous = set_output_format(output or dict())
+    try:
+        with render_profiler.stage("write_image"):
+            image.pixels.foreach_set(np.ascontiguousarray(pixels[::-1]).ravel())
+            if size is not None:
+                image.scale(*size)
+            path = file_path + scene.render.file_extension
+            remove_output(path)
+            image.save_render(filepath=path, scene=scene)
+    finally:
+        set_output_format(previous)
+        bpy.data.images.remove(image)
+    return path
+
+
+def write_thumbnails(
+    pixels: np.ndarray, file_path: str, thumbnails: List[dict]
+) -> List[str]:
+    """
+    Write downscaled copies of a rendered image from its pixels in memory, without rendering or decoding it again
+    :param pixels: A (height, width, 4) float array of the linear pixels of the render, top row first
+    :param file_path: The path of the rendered image without its file extension
+    :param thumbnails: The thumbnails, each with the key Width, the optional keys Height, which defaults to keeping the
+    aspect ratio, and Suffix, which defaults to -<Width>, and the optional keys of an output format
+    :return: The paths of the written thumbnails
+    """
+    height, width = pixels.shape[:2]
+    paths = []
+    for thumbnail in thumbnails:
+        size = (
+            thumbnail["Width"],
+            thumbnail.get("Height", max(1, round(height * thumbnail["Width"] / width))),
+        )
+        suffix = thumbnail.get("Suffix", f"-{thumbnail['Width']}")
+        output = dict(DEFAULT_THUMBNAIL, **thumbnail)
+        paths.append(write_pixels(pixels, file_path + suffix, size, output))
+    return paths
 
 
 ########################################################################################################################
-# COLOUR FUNCTIONS
+# CAMERA FUNCTIONS
 ########################################################################################################################
-def srgb_to_linearrgb(value: int) -> float:
+def create_camera() -> None:
     """
-    Convert an sRGB value to a linear RGB value
+    Create a camera at the origin and make it the active camera if the scene does not have an active camera
+    :return: None
     """
-    value = value / 255.0
-    if value < 0.04045:
-        if value < 0.0:
-            return 0.0
-        else:
-            return value * 0.077399
+    scene = bpy.context.scene
+
+    # If the scene has no active camera, create one through the data API, which unlike the operator does not trigger a
+    # depsgraph update
+    if scene.camera is None or scene.camera.type != "CAMERA":
+        camera = bpy.data.objects.new("Camera", bpy.data.cameras.new("Camera"))
+        scene.collection.objects.link(camera)
+        scene.camera = camera
+
+
+def get_camera() -> bpy.types.Object:
+    """
+    Get the camera the views are rendered from, the active camera of the scene set up by create_camera
+    :return: The camera object
+    """
+    return bpy.context.scene.camera
+
+
+def set_camera_start_pos(distance: float) -> None:
+    """
+    Set the camera to a birds eye view of the origin
+    :param distance: The distance from the origin to the camera in meters along the z-axis
+    :return: None
+    """
+    # set the initial camera position and rotation to look at the origin from a birds eye view
+    camera = get_camera()
+    camera.location[0] = 0
+    camera.location[1] = 0
+    camera.location[2] = distance
+
+    camera.rotation_euler[0] = 0
+    camera.rotation_euler[1] = 0
+    camera.rotation_euler[2] = 0
+
+
+def set_camera_pos_and_rot(pos: Position) -> None:
+    """
+    Set the camera to a specific position and rotation
+    :param pos: The position and rotation of the camera
+    """
+    camera = get_camera()
+    camera.location[0] = pos.x
+    camera.location[1] = pos.y
+    camera.location[2] = pos.z
+
+    camera.rotation_euler = pos.get_rotation()
+
+
+def get_rotation_matrix(pos: Position) -> np.ndarray:
+    """
+    Get the rotation matrix of a camera rotation, whose columns are the right, up and backward axes of the camera
+    :param pos: The position and rotation of the camera
+    :return: A (3, 3) rotation matrix
+    """
+    x, y, z = pos.get_rotation()
+    rotate_x = np.array(
+        [[1, 0, 0], [0, math.cos(x), -math.sin(x)], [0, math.sin(x), math.cos(x)]]
+    )
+    rotate_y = np.array(
+        [[math.cos(y), 0, math.sin(y)], [0, 1, 0], [-math.sin(y), 0, math.cos(y)]]
+    )
+    rotate_z = np.array(
+        [[math.cos(z), -math.sin(z), 0], [math.sin(z), math.cos(z), 0], [0, 0, 1]]
+    )
+    # Blender applies XYZ Euler rotations in the order x, y, z
+    return rotate_z @ rotate_y @ rotate_x
+
+
+def frame_camera(pos: Position, padding: float) -> None:
+    """
+    Frame the model with an orthographic camera looking in the direction of a view, sizing the orthographic scale to
+    the bounds of the model and clipping tightly around it, so that only the model is sampled
+    :param pos: The view, only its rotation is used
+    :param padding: The padding around the model as a fraction of its size
+    :return: None
+    :raises RuntimeError: If the scene has no geometry to frame
+    """
+    bounds = get_model_bounds()
+    if bounds is None:
+        raise RuntimeError("Cannot frame an empty scene")
+
+    # Project the corners of the bounds onto the axes of the camera
+    rotation = get_rotation_matrix(pos)
+    corners = np.array(
+        [[x, y, z] for x in bounds[:, 0] for y in bounds[:, 1] for z in bounds[:, 2]]
+    )
+    projected = corners @ rotation
+    low, high = projected.min(axis=0), projected.max(axis=0)
+    extent = high - low
+
+    # The orthographic scale covers the larger dimension of the image
+    render = bpy.context.scene.render
+    aspect = render.resolution_x / render.resolution_y
+    if aspect >= 1:
+        scale = max(extent[0], extent[1] * aspect)
+    else:
+        scale = max(extent[1], extent[0] / aspect)
+
+    # Place the camera just in front of the nearest corner, the camera looks along its negative z-axis
+    margin = max(padding * float(extent.max()), 1e-3)
+    local = np.array([(low[0] + high[0]) / 2, (low[1] + high[1]) / 2, high[2] + margin])
+
+    camera = get_camera()
+    camera.location = tuple(rotation @ local)
+    camera.rotation_euler = pos.get_rotation()
+    camera.data.type = "ORTHO"
+    camera.data.ortho_scale = max(scale * (1 + 2 * padding), 1e-3)
+    camera.data.clip_start = margin / 2
+    camera.data.clip_end = margin + extent[2] + margin / 2
+
+
+def place_camera(pos: Position) -> None:
+    """
+    Place the camera for a view, framing the model automatically if automatic framing is enabled
+    :param pos: The position and rotation of the camera
+    :return: None
+    """
+    if AUTO_FRAME_PADDING is None:
+        set_camera_pos_and_rot(pos)
     else:
-        return pow((value + 0.055) * 0.947867, 2.4)
+        frame_camera(pos, AUTO_FRAME_PADDING)
+
+
+def set_auto_frame(auto_frame) -> None:
+    """
+    Enable or disable automatic orthographic framing from the "AutoFrame" option. When it is disabled, the perspective
+    camera and the default clipping range are always set, as an orthographic camera can be left behind by a previous
+    job of this process or be saved in a .blend file that was written after a job that framed the camera.
+    :param auto_frame: Either a boolean or a dictionary with the key Padding
+    :return: None
+    """
+    global AUTO_FRAME_PADDING
+
+    if isinstance(auto_frame, dict):
+        AUTO_FRAME_PADDING = auto_frame.get("Padding", DEFAULT_AUTO_FRAME_PADDING)
+    elif auto_frame:
+        AUTO_FRAME_PADDING = DEFAULT_AUTO_FRAME_PADDING
+    else:
+        AUTO_FRAME_PADDING = None
+        camera = get_camera().data
+        camera.type = "PERSP"
+        camera.clip_start, camera.clip_end = DEFAULT_CLIP
+
+
+########################################################################################################################
+# TURNTABLE FUNCTIONS
+########################################################################################################################
+def get_orbit_position(
+    center: Tuple[float, float, float], radius: float, elevation: float, angle: float
+) -> Position:
+    """
+    Get the camera position on an orbit around a center point, looking at the center
+    :param center: The x, y and z coordinates of the center of the orbit
+    :param radius: The distance from the center to the camera
+    :param elevation: The angle of the camera above the xy-plane in degrees
+    :param angle: The angle of the camera around the z-axis in degrees, where -90 is the front view
+    :return: The position and rotation of the camera
+    """
+    horizontal = radius * math.cos(math.radians(elevation))
+    return Position(
+        center[0] + horizontal * math.cos(math.radians(angle)),
+        center[1] + horizontal * math.sin(math.radians(angle)),
+        center[2] + radius * math.sin(math.radians(elevation)),
+        90 - elevation,
+        0,
+        angle + 90,
+    )
+
+
+def create_turntable_keyframes(turntable: dict, distance: float) -> int:
+    """
+    Key the camera on a full orbit around the model, one keyframe per frame
+    :param turntable: The turntable options with the optional keys Frames, Elevation, Radius, Center and StartAngle
+    :param distance: The camera distance used as the radius if the turntable options do not specify one
+    :return: The number of frames of the turntable
+    """
+    camera = get_camera()
+    camera.animation_data_clear()
+
+    frames = turntable.get("Frames", 36)
+    elevation = turntable.get("Elevation", 0)
+    radius = turntable.get("Radius", distance)
+    center = tuple(turntable.get("Center", (0, 0, 0)))
+    start_angle = turntable.get("StartAngle", -90)
+
+    for frame in range(1, frames + 1):
+        angle = start_angle + 360 * (frame - 1) / frames
+        position = get_orbit_position(center, radius, elevation, angle)
+        set_camera_pos_and_rot(position)
+        camera.keyframe_insert(data_path="location", frame=frame)
+        camera.keyframe_insert(data_path="rotation_euler", frame=frame)
+
+    return frames
+
+
+def render_turntable(
+    data: dict,
+    output_folder: str,
+    frame_start: Optional[int] = None,
+    frame_end: Optional[int] = None,
+) -> dict:
+    """
+    Render a turntable of the model through Blender's animation pipeline, so the scene and render data are reused
+    across frames. The frames are written as a numbered PNG sequence, or as a single MP4 video if the "Output" of the
+    turntable options is "MP4".
+    :param data: The render options with a "Turntable" dictionary
+    :param output_folder: The output folder for the rendered frames
+    :param frame_start: The first frame to render, defaults to the FrameStart of the turntable options or the first
+    frame, used to split a turntable across processes
+    :param frame_end: The last frame to render, defaults to the FrameEnd of the turntable options or the last frame
+    :return: The status of the turntable
+    """
+    scene = bpy.context.scene
+    turntable = data["Turntable"]
+    start = time.perf_counter()
+    frames = create_turntable_keyframes(turntable, data["Camera"]["Distance"])
+
+    # Save the frame range and the full image and video settings, which the MP4 output changes together: restoring the
+    # file format alone would leave the colour mode, depth and compression of the video on the next still
+    saved = (scene.frame_start, scene.frame_end)
+    saved_image_settings = get_struct_settings(scene.render.image_settings)
+    saved_ffmpeg = get_struct_settings(scene.render.ffmpeg)
+    frame_range = [
+        max(1, frame_start or turntable.get("FrameStart", 1)),
+        min(frames, frame_end or turntable.get("FrameEnd", frames)),
+    ]
+    scene.frame_start, scene.frame_end = frame_range
+
+    # Report each frame as it is written
+    def frame_written(scene, *args) -> None:
+        print_status(
+            "FRAME",
+            {
+                "Name": data["Name"],
+                "Frame": scene.frame_current,
+                "Seconds": round(time.perf_counter() - start, 3),
+            },
+        )
+
+    if turntable.get("Output", "PNG") == "MP4":
+        scene.render.image_settings.file_format = "FFMPEG"
+        scene.render.ffmpeg.format = "MPEG4"
+        scene.render.ffmpeg.codec = "H264"
+
+    scene.render.filepath = output_folder + data["Name"] + "-"
+    bpy.app.handlers.render_write.append(frame_written)
+    error = None
+    try:
+        with render_profiler.stage("render"):
+            bpy.ops.render.render(animation=True)
+    except Exception as e:
+        error = str(e)
+    finally:
+        bpy.app.handlers.render_write.remove(frame_written)
+        get_camera().animation_data_clear()
+        scene.frame_start, scene.frame_end = saved
+        set_struct_settings(scene.render.image_settings, saved_image_settings)
+        set_struct_settings(scene.render.ffmpeg, saved_ffmpeg)
+
+    return {
+        "Name": data["Name"],
+        "Status": "completed" if error is None else "failed",
+        "Path": scene.render.filepath,
+        "Frames": frame_range,
+        "Seconds": round(time.perf_counter() - start, 3),
+        "Error": error,
+    }
+
+
+########################################################################################################################
+# LIGHTING FUNCTIONS
+########################################################################################################################
+
+
+def create_area_light(spec: Light) -> bpy.types.Object:
+    """
+    Create an area light through the data API. The caller is responsible for updating the view layer once after all
+    lights are created.
+    :param spec: The power, size, position and colour of the light
+    :return: The light object
+    """
+    # Create the light object and link it to the scene
+    light_data = bpy.data.lights.new(name="Light", type="AREA")
+    light = bpy.data.objects.new(name="Light", object_data=light_data)
+    bpy.context.scene.collection.objects.link(light)
+
+    set_area_light(light, spec)
+    return light
+
+
+def set_area_light(light: bpy.types.Object, spec: Light) -> None:
+    """
+    Set the power, size, position and colour of an existing area light in place
+    :param light: The light object
+    :param spec: The power, size, position and colour of the light
+    :return: None
+    """
+    # Set the power, size and colour of the light data
+    light.data.energy = spec.power
+    light.data.size = spec.size
+    light.data.color = spec.colour
+
+    # Set the position and rotation of the light object
+    light.location = (spec.position.x, spec.position.y, spec.position.z)
+    light.rotation_euler = spec.position.get_rotation()
+
+
+def create_area_lights(lights: List[Light]) -> None:
+    """
+    Create many area lights and update the view layer once afterwards
+    :param lights: The lights
+    :return: None
+    """
+    for spec in lights:
+        create_area_light(spec)
+    bpy.context.view_layer.update()
+
+
+def update_area_lights(lights: List[Light]) -> None:
+    """
+    Update the area lights of the scene in place when there are as many as requested, otherwise recreate them
+    :param lights: The lights
+    :return: None
+    """
+    existing = [x for x in bpy.data.objects if x.type == "LIGHT"]
+    if len(existing) != len(lights) or any(x.data.type != "AREA" for x in existing):
+        delete_lights()
+        create_area_lights(lights)
+        return
+
+    # Every light is overwritten entirely, so the order they are matched in does not matter
+    for light, spec in zip(existing, lights):
+        set_area_light(light, spec)
+    bpy.context.view_layer.update()
+
+
+def delete_lights() -> None:
+    """
+    Delete every light object and its light data through the data API, without the selection operators
+    :return: None
+    """
+    for obj in [x for x in bpy.data.objects if x.type == "LIGHT"]:
+        light_data = obj.data
+        bpy.data.objects.remove(obj, do_unlink=True)
+        if light_data.users == 0:
+            bpy.data.lights.remove(light_data)
+
+
+def parse_lights(data: dict) -> List[Light]:
+    """
+    Parse the lights of the render options. Lights are given either in the "Lights" list of per-light dictionaries, in
+    the compact "LightArray" list of [Power, Size, R, G, B, X, Y, Z, Rx, Ry, Rz] rows with 0-255 sRGB colours, or both.
+    The colours of every light are converted to linear RGB at once.
+    :param data: The render options
+    :return: The lights
+    """
+    lights = [
+        (
+            light["Power"],
+            light["Size"],
+            Position.from_dict(light["Position"]),
+            render_options.parse_colour(light["Colour"])[:3],
+        )
+        for light in data.get("Lights", [])
+    ]
+    for row in data.get("LightArray", []):
+        power, size, red, green, blue, x, y, z, rx, ry, rz = row
+        position = Position(x, y, z, rx, ry, rz)
+        lights.append((power, size, position, (red, green, blue)))
+
+    colours = srgb_to_linear([x[3] for x in lights]).tolist()
+    return [Light(x[0], x[1], x[2], tuple(c)) for x, c in zip(lights, colours)]
+
+
+def setup_lighting(distance: float):
+    # delete all existing lights
+    delete_lights()
+
+    leg = compute_triangular_leg(distance)
+    white = [255, 255, 255]
+
+    create_area_lights(
+        parse_lights(
+            {
+                "LightArray": [
+                    # Create top front left light
+                    [1000, 3, *white, -leg, -leg, distance, 45, 0, 315],
+                    # Create top front right light
+                    [800, 3, *white, leg, -leg, distance, 45, 0, 45],
+                    # Create top back left light
+                    [200, 3, *white, -leg, leg, distance, 45, 0, 225],
+                ]
+            }
+        )
+    )
+
+
+########################################################################################################################
+# COMPUTATION FUNCTIONS
+########################################################################################################################
+def degrees_to_radians(degrees: float) -> float:
+    """
+    Convert degrees to radians
+    :param degrees: The degrees to convert to radians
+    :return: The converted degrees in radians value
+    """
+    return math.radians(degrees)
+
+
+def estimate_noise(pixels: np.ndarray) -> float:
+    """
+    Estimate the standard deviation of the noise left in an image from the response of its luminance to a kernel that
+    cancels out edges and gradients, following Immerkaer's fast noise variance estimation
+    :param pixels: A (height, width, 4) float array of linear pixels
+    :return: The estimated standard deviation of the noise of the luminance
+    """
+    luminance = pixels[..., :3] @ np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+    height, width = luminance.shape
+    if height < 3 or width < 3:
+        return 0.0
+
+    # Convolve with [[1, -2, 1], [-2, 4, -2], [1, -2, 1]] through shifted views of the image
+    response = (
+        luminance[:-2, :-2]
+        - 2 * luminance[:-2, 1:-1]
+        + luminance[:-2, 2:]
+        - 2 * luminance[1:-1, :-2]
+        + 4 * luminance[1:-1, 1:-1]
+        - 2 * luminance[1:-1, 2:]
+        + luminance[2:, :-2]
+        - 2 * luminance[2:, 1:-1]
+        + luminance[2:, 2:]
+    )
+    total = float(np.abs(response, dtype=np.float64).sum())
+    return math.sqrt(math.pi / 2) * total / (6 * (width - 2) * (height - 2))
+
+
+def compute_triangular_leg(distance: float):
+    """
+    Compute the length of the leg of a right-angled triangle given the hypotenuse
+    :param distance: The length of the hypotenuse
+    :return: The length of the leg of the triangle
+    """
+    return math.sqrt(math.pow(distance, 2) / 2)
+
+
+########################################################################################################################
+# FILE FUNCTIONS
+########################################################################################################################
+
+
+def save_file(file_path: str) -> None:
+    """
+    Save the file as a .blend file.
+    :param file_path: The path to save the file
+    :return: None
+    """
+    bpy.ops.wm.save_as_mainfile(
+        filepath=file_path.replace(".obj", ".blend").replace(".stl", ".blend")
+    )
+
+
+def save_prepared_model(file_path: str) -> None:
+    """
+    Save a copy of the scene with the imported model as a compressed .blend file, writing it atomically so that other
+    processes never open a partially written file
+    :param file_path: The path to save the file
+    :return: None
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Store the bounds of the model with it, so that framing does not have to read its vertices again
+    get_model_bounds()
+
+    temporary = file_path + f".{os.getpid()}.tmp.blend"
+    bpy.ops.wm.save_as_mainfile(filepath=temporary, compress=True, copy=True)
+    os.replace(temporary, file_path)
+
+
+def prepare_models(path: str, unit: float, streaming: bool = False) -> int:
+    """
+    Import, scale and center every model at a path once and store them in the model cache, so later renders can skip
+    parsing the source files
+    :param path: The path to a model or a directory of models
+    :param unit: The scale of the models relative to meters
+    :param streaming: Whether to load binary .stl models with the chunked loader
+    :return: The number of models that failed to be prepared
+    """
+    failed = 0
+    models = model_cache.find_models(path)
+    for index, model_path in enumerate(models):
+        start = time.perf_counter()
+        cached_path = model_cache.cached_model_path(MODEL_CACHE_DIR, model_path, unit)
+        error = None
+
+        if os.path.exists(cached_path):
+            state = "cached"
+        else:
+            try:
+                reset_scene()
+                import_model(model_path, unit, streaming)
+                save_prepared_model(cached_path)
+                state = "prepared"
+            except Exception as e:
+                state = "failed"
+                error = str(e)
+                failed += 1
+
+        print_status(
+            "PREPARE",
+            {
+                "Index": index,
+                "Total": len(models),
+                "Model": model_path,
+                "Status": state,
+                "Path": cached_path,
+                "Seconds": round(time.perf_counter() - start, 3),
+                "Error": error,
+            },
+        )
+    return failed
+
+
+########################################################################################################################
+# COLOUR FUNCTIONS
+########################################################################################################################
+def srgb_to_linear(values) -> np.ndarray:
+    """
+    Convert 0-255 sRGB values to linear RGB values with the exact sRGB transfer function, any number of values at once
+    :param values: A number or an array of numbers of any shape
+    :return: An array of linear values with the same shape
+    """
+    values = np.maximum(np.asarray(values, dtype=np.float64) / 255.0, 0.0)
+    return np.where(values < 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def get_linear_colour(colour) -> Tuple[float, float, float, float]:
+    """
+    Convert an sRGB colour to a linear colour, the alpha is kept linear
+    :param colour: The sRGB colour, either a "r,g,b,a" string or a sequence of 0-255 values
+    :return: The linear red, green, blue and alpha from 0 to 1
+    """
+    rgba = render_options.parse_colour(colour)
+    return (*srgb_to_linear(rgba[:3]).tolist(), rgba[3] / 255)
 
 
 ########################################################################################################################
@@ -383,35 +2048,140 @@ def get_formatted_date():
 
 
 ########################################################################################################################
-# MAIN
+# JOB FUNCTIONS
 ########################################################################################################################
-if __name__ == "__main__":
-    # Parse the command line arguments
-    parser = BlenderArgparse(
-        description="Script to render a view of the scene with the specified parameters"
-    )
-    parser.add_argument("--options", type=str, help="Options for rendering")
-    parser.add_argument(
-        "--quality",
-        type=str,
-        help="The quality of the render, either 'preview' or 'normal'",
-    )
-    args = parser.parse_args()
+def load_options(options: str, manifest: str) -> dict:
+    """
+    Load the render options from either the JSON string passed with --options or a JSON manifest file
+    :param options: The JSON string of render options, may be None
+    :param manifest: The path to a JSON manifest file of render options, may be None
+    :return: The parsed render options
+    """
+    if manifest is not None:
+        with open(manifest, "r") as file:
+            return json.load(file)
+    return json.loads(options)
 
-    data = json.loads(args.options)
 
-    # If the output path does not end with a "/", add one
+def get_output_path(data: dict) -> str:
+    """
+    Get the output directory of the render options, ensuring it ends with a "/"
+    :param data: The render options
+    :return: The output directory
+    """
     output_path = data["OutputDirectory"]
     if not output_path.endswith("/"):
         output_path += "/"
+    return output_path
+
+
+def get_views(data: dict) -> List[Tuple[str, Position]]:
+    """
+    Get the list of named camera positions to render. If the render options contain a "Views" array each entry is
+    rendered, otherwise the single "Camera" position is rendered under the job name.
+    :param data: The render options
+    :return: A list of (name, position) pairs
+    """
+    if "Views" not in data:
+        return [(data["Name"], Camera.from_dict(data["Camera"]).position)]
+
+    views = []
+    for index, view in enumerate(data["Views"]):
+        name = view.get("Name", f"{data['Name']}-{index}")
+        views.append((name, Position.from_dict(view["Position"])))
+    return views
+
+
+def load_model(data: dict) -> Optional[dict]:
+    """
+    Load the model of the render options into the scene, opening its pre-converted .blend file if the model cache is
+    enabled, or the assembly of parts of the "Models" option, which takes the place of "Model"
+    :param data: The render options
+    :return: The part counts of an assembly, or None for a single model
+    """
+    if "Models" in data:
+        assembly = load_assembly(
+            data["Models"], data["Unit"], data.get("StreamingImport", False)
+        )
+        print_status("ASSEMBLY", dict(assembly, Name=data["Name"]))
+        return assembly
+
+    model_path = data["Model"]
+
+    # Use the pre-converted .blend file of the model, creating it if it does not exist yet
+    if MODEL_CACHE_DIR is not None and model_cache.is_supported(model_path):
+        cached_path = model_cache.cached_model_path(
+            MODEL_CACHE_DIR, model_path, data["Unit"]
+        )
+        if not os.path.exists(cached_path):
+            import_model(model_path, data["Unit"], data.get("StreamingImport", False))
+            save_prepared_model(cached_path)
+            return None
+        model_path = cached_path
 
     # Import the model if it is not a .blend file
-    if not data["Model"].endswith(".blend"):
-        import_model(data["Model"], data["Unit"])
+    if not model_path.endswith(".blend"):
+        import_model(model_path, data["Unit"], data.get("StreamingImport", False))
 
     # Otherwise, open the .blend file
     else:
-        bpy.ops.wm.open_mainfile(filepath=data["Model"])
+        with render_profiler.stage("open_blend"):
+            bpy.ops.wm.open_mainfile(filepath=model_path)
+    return None
+
+
+def get_scene_parts(data: dict, quality: str) -> dict:
+    """
+    Get the options each part of the scene configuration depends on, so that a part whose options did not change since
+    the previous job can be left as it is
+    :param data: The render options
+    :param quality: The quality of the render, either 'preview' or 'normal'
+    :return: The options of each part keyed on the part name
+    """
+    return {
+        "LevelOfDetail": [quality, data.get("PreviewTriangles"), data["Resolution"]],
+        "Lights": [data.get("Lights", []), data.get("LightArray", [])],
+        # The turntable and atlas paths also change the image settings and the compositor nodes, and the noise
+        # measurement follows the sampling options
+        "RenderPreferences": [
+            quality,
+            data.get("Output", dict()),
+            data.get("Sampling"),
+            data.get("Drawing"),
+            data.get("Turntable"),
+            data.get("Atlas"),
+        ],
+        "Threads": data.get("Threads", 0),
+        "Resolution": data["Resolution"],
+        "Camera": [data["Camera"]["Distance"], data.get("AutoFrame", False)],
+        "Background": [quality, data["BackgroundColour"]],
+    }
+
+
+def configure_scene(
+    data: dict, quality: str, previous: Optional[dict] = None
+) -> List[str]:
+    """
+    Configure everything in the scene except loading the model: preview level of detail, units, camera, lights, render
+    preferences, resolution and background colour
+    :param data: The render options
+    :param quality: The quality of the render, either 'preview' or 'normal'
+    :param previous: The scene parts of the previous job configured in this scene, as returned by get_scene_parts,
+    only the parts that differ from them are configured again, may be None to configure every part
+    :return: The names of the parts that were left as they were
+    """
+    parts = get_scene_parts(data, quality)
+    reused = [
+        k for k, v in parts.items() if previous is not None and previous.get(k) == v
+    ]
+
+    # Decimate dense meshes for previews, and keep the full meshes for every other quality
+    if "LevelOfDetail" not in reused:
+        if quality == "preview":
+            with render_profiler.stage("preview_lod"):
+                apply_preview_lod(data)
+        else:
+            restore_full_meshes()
 
     # Set the default unit settings
     bpy.context.scene.unit_settings.system = "METRIC"
@@ -421,58 +2191,61 @@ if __name__ == "__main__":
     # Create the camera
     create_camera()
 
-    # delete all existing lights
-    bpy.ops.object.select_all(action="DESELECT")
-    bpy.ops.object.select_by_type(type="LIGHT")
-    bpy.ops.object.delete()
-
-    # Set up the lighting
-    for light in data["Lights"]:        
-        create_area_light(
-            light["Power"],
-            light["Size"],
-            Position(
-                light["Position"]["X"],
-                light["Position"]["Y"],
-                light["Position"]["Z"],
-                light["Position"]["Rx"],
-                light["Position"]["Ry"],
-                light["Position"]["Rz"],
-            ),
-            light["Colour"],
-        )
+    # Set up the lighting, updating the previous lights in place if there are any
+    if "Lights" not in reused:
+        with render_profiler.stage("create_lights"):
+            if previous is None:
+                delete_lights()
+                create_area_lights(parse_lights(data))
+            else:
+                update_area_lights(parse_lights(data))
 
     # Detect the rendering device and set the rendering preferences
-    set_render_preferences(args.quality)
+    if "RenderPreferences" not in reused:
+        with render_profiler.stage("render_preferences"):
+            set_render_preferences(quality, data.get("Sampling"))
+            set_drawing_mode(data.get("Drawing"))
+
+        # Override the image settings of the quality with the output format of the job
+        output = data.get("Output", dict())
+        set_output_format(dict(DEFAULT_OUTPUT, **output))
+        if output.get("Thumbnails") or is_noise_measured(data):
+            enable_pixel_capture(noisy=is_noise_measured(data))
+
+    # Set the number of render threads
+    if "Threads" not in reused:
+        set_render_threads(data.get("Threads", 0))
 
     # Set the rendering resolution
-    set_render_resolution(
-        width=data["Resolution"]["Width"],
-        height=data["Resolution"]["Height"],
-        scale=data["Resolution"]["Scale"],
-    )
+    if "Resolution" not in reused:
+        set_render_resolution(
+            width=data["Resolution"]["Width"],
+            height=data["Resolution"]["Height"],
+            scale=data["Resolution"]["Scale"],
+        )
 
-    # Set the camera position
-    dist = data["Camera"]["Distance"]
-    leg = compute_triangular_leg(dist)
-    position = Position(
-        x=data["Camera"]["Position"]["X"],
-        y=data["Camera"]["Position"]["Y"],
-        z=data["Camera"]["Position"]["Z"],
-        rx=data["Camera"]["Position"]["Rx"],
-        ry=data["Camera"]["Position"]["Ry"],
-        rz=data["Camera"]["Position"]["Rz"],
-    )
+    # Set the camera start position
+    if "Camera" not in reused:
+        set_camera_start_pos(data["Camera"]["Distance"])
+        set_auto_frame(data.get("AutoFrame", False))
+
+    if "Background" not in reused:
+        set_background_colour(data["BackgroundColour"], quality)
+    return reused
 
-    set_camera_start_pos(dist)
 
-    # Set the background color
-    rgb_background_colour = [int(x) for x in data["BackgroundColour"].split(",")]
-    # Convert sRGB to linear RGB
-    linear_rgb_background_colour = [srgb_to_linearrgb(x) for x in rgb_background_colour]
+def set_background_colour(colour: str, quality: str) -> None:
+    """
+    Set the background of the scene to a colour, or make it transparent
+    :param colour: The sRGB background colour as a "r,g,b,a" string of 0-255 values
+    :param quality: The quality of the render, previews always have a transparent background
+    :return: None
+    """
+    # Convert the background color from sRGB to linear RGB
+    linear_rgb_background_colour = get_linear_colour(colour)
 
     # if the alpha channel is 0 or the quality is set to preview, set the background to transparent
-    if rgb_background_colour[3] == 0 or args.quality == "preview":
+    if linear_rgb_background_colour[3] == 0 or quality == "preview":
         bpy.context.scene.render.film_transparent = True
 
     # otherwise, set the background to the specified colour
@@ -481,19 +2254,713 @@ if __name__ == "__main__":
         bpy.context.scene.render.film_transparent = False
 
         # Set background color
-        bpy.context.scene.world.use_nodes = True
-        bg_node = bpy.context.scene.world.node_tree.nodes["Background"]
-        bg_node.inputs["Color"].default_value = (
-            linear_rgb_background_colour[0],
-            linear_rgb_background_colour[1],
-            linear_rgb_background_colour[2],
-            rgb_background_colour[3] / 255,
+        bg_node = get_background_node()
+        bg_node.inputs["Color"].default_value = linear_rgb_background_colour
+
+
+def render_views(
+    views: List[Tuple[str, Position]],
+    output_path: str,
+    cache: Optional[render_cache.RenderCache] = None,
+    keys: Optional[Dict[str, str]] = None,
+    prepare: Optional[Callable[[], None]] = None,
+    passes: Optional[List[dict]] = None,
+    tiles: Optional[List[Tuple[str, np.ndarray]]] = None,
+    write_views: bool = True,
+    output: Optional[dict] = None,
+    renderer: Optional[Callable[[str, str, Position], None]] = None,
+    measure_noise: bool = False,
+) -> List[dict]:
+    """
+    Render each view of the scene, printing a status line per view so the caller can track progress
+    :param views: A list of (name, position) pairs to render
+    :param output_path: The output folder for the rendered images
+    :param cache: The render cache to serve views from and store rendered views in, may be None
+    :param keys: The cache key of each view, keyed on the view name
+    :param prepare: Called once before the first view that is not served from the cache, to set up the scene
+    :param passes: The intermediate passes to render each view progressively with, may be None
+    :param tiles: A list the (name, pixels) pair of each rendered view is appended to, may be None
+    :param write_views: Whether to write the rendered images, views that are not written are only kept in memory
+    :param output: The output format of the rendered images, whose thumbnails are written for every rendered view,
+    may be None
+    :param renderer: Renders a view from its name, output folder and position in place of the generic or progressive
+    render, may be None
+    :param measure_noise: Whether to estimate the noise left in each rendered view, which should be rendered without
+    the denoiser
+    :return: The status of each rendered view, whose Samples are only known for Cycles renders
+    """
+    output = output or dict()
+    extension = get_file_extension(output)
+    thumbnails = output.get("Thumbnails", [])
+    statuses = []
+    for index, (name, position) in enumerate(views):
+        start = time.perf_counter()
+        path = output_path + name + extension if write_views else None
+        thumbnail_paths = []
+        noise = None
+        state = "completed"
+        error = None
+        failed_stage = None
+
+        # Serve the view from the cache if it has already been rendered with the same settings
+        if cache is not None and cache.fetch(keys[name], path):
+            state = "cached"
+        else:
+            try:
+                if prepare is not None:
+                    prepare()
+                    prepare = None
+                if renderer is not None:
+                    renderer(name, output_path, position)
+                elif passes is not None:
+                    render_progressive_view(name, output_path, position, passes)
+                else:
+                    render_generic_view(
+                        name=name,
+                        output_folder=output_path,
+                        position=position,
+                        write=write_views,
+                    )
+                capture = tiles is not None or len(thumbnails) != 0 or measure_noise
+                if renderer is None and capture:
+                    pixels = capture_render_pixels()
+                    if measure_noise:
+                        noise = round(estimate_noise(pixels), 6)
+                    thumbnail_paths = write_thumbnails(
+                        pixels, output_path + name, thumbnails
+                    )
+                    if tiles is not None:
+                        tiles.append((name, pixels))
+                if cache is not None:
+                    cache.store(keys[name], path)
+            except Exception as e:
+                state = "failed"
+                error = str(e)
+                failed_stage = render_profiler.get_failed_stage(e)
+
+        status = {
+            "Index": index,
+            "Total": len(views),
+            "Name": name,
+            "Status": state,
+            "Path": path,
+            "Thumbnails": thumbnail_paths,
+            "Samples": RENDER_SAMPLES if state == "completed" else None,
+            "Noise": noise,
+            "Seconds": round(time.perf_counter() - start, 3),
+            "Error": error,
+            "Stage": failed_stage,
+        }
+        print_status("VIEW", status)
+        statuses.append(status)
+    return statuses
+
+
+def render_atlas_views(
+    data: dict,
+    views: List[Tuple[str, Position]],
+    output_path: str,
+    prepare: Optional[Callable[[], None]] = None,
+) -> List[dict]:
+    """
+    Render each view and tile the rendered pixels into a single sheet in memory, so the views are not written and read
+    back to compose it. The "Atlas" option may contain the keys Name, Columns, Padding, Labels, LabelScale,
+    LabelColour, BackgroundColour and KeepViews, which also writes the individual views.
+    :param data: The render options
+    :param views: A list of (name, position) pairs to render
+    :param output_path: The output folder for the sheet and the views
+    :param prepare: Called once before the first view, to set up the scene
+    :return: The status of each rendered view, followed by the status of the sheet
+    """
+    atlas = data["Atlas"]
+    start = time.perf_counter()
+    tiles = []
+
+    def prepare_capture() -> None:
+        if prepare is not None:
+            prepare()
+        enable_pixel_capture()
+
+    output = data.get("Output", dict())
+    statuses = render_views(
+        views,
+        output_path,
+        prepare=prepare_capture,
+        tiles=tiles,
+        write_views=atlas.get("KeepViews", False),
+        output=output,
+    )
+
+    name = atlas.get("Name", data["Name"] + "-atlas")
+    error = None
+    try:
+        if len(tiles) == 0:
+            raise RuntimeError("No views were rendered")
+        sheet = render_atlas.compose_atlas(
+            tiles,
+            columns=atlas.get("Columns"),
+            padding=atlas.get("Padding", 16),
+            # The colours of the sheet are converted to the linear colours of the rendered pixels
+            background=get_linear_colour(
+                atlas.get("BackgroundColour", "255,255,255,255")
+            ),
+            label_colour=(
+                get_linear_colour(atlas.get("LabelColour", "0,0,0,255"))
+                if atlas.get("Labels", True)
+                else None
+            ),
+            label_scale=atlas.get("LabelScale", 2),
+        )
+        del tiles
+        write_pixels(sheet, output_path + name)
+    except Exception as e:
+        error = str(e)
+
+    status = {
+        "Name": name,
+        "Status": "completed" if error is None else "failed",
+        "Path": output_path + name + get_file_extension(output),
+        "Views": len(views),
+        "Seconds": round(time.perf_counter() - start, 3),
+        "Error": error,
+    }
+    print_status("ATLAS", status)
+    return statuses + [status]
+
+
+def get_view_renderer(
+    data: dict, quality: str, shard: Optional[Tuple[int, int]] = None
+) -> Optional[Callable[[str, str, Position], None]]:
+    """
+    Get the function that renders each view in place of a single full frame render, from the "Region" option, which
+    re-renders a region of an existing image, or the "Tiles" option, which is either true or a dictionary with the key
+    Size
+    :param data: The render options
+    :param quality: The quality of the render
+    :param shard: The index of this process and the number of processes to split the tiles of a tiled render with,
+    may be None
+    :return: The view renderer, or None if the views are rendered as a single frame
+    """
+    if "Region" in data:
+        return lambda name, folder, pos: render_region_view(
+            name, folder, pos, data["Region"]
+        )
+
+    tiles = data.get("Tiles", False)
+    if not tiles:
+        return None
+    size = DEFAULT_TILE_SIZE
+    if isinstance(tiles, dict):
+        size = tiles.get("Size", DEFAULT_TILE_SIZE)
+    return lambda name, folder, pos: render_tiled_view(
+        name, folder, pos, size, data, quality, shard
+    )
+
+
+def get_progressive_passes(data: dict) -> Optional[List[dict]]:
+    """
+    Get the intermediate passes of a progressive render from the "Progressive" option, which is either true to use the
+    default passes or a list of passes with the keys Samples and Scale
+    :param data: The render options
+    :return: The intermediate passes, or None if the views are not rendered progressively
+    """
+    progressive = data.get("Progressive", False)
+    if progressive is True:
+        return DEFAULT_PROGRESSIVE_PASSES
+    if not progressive:
+        return None
+    return progressive
+
+
+def is_noise_measured(data: dict) -> bool:
+    """
+    Check if the noise left in each view is measured, which the MeasureNoise key of the "Sampling" option asks for
+    :param data: The render options
+    :return: True if the noise is measured, otherwise False
+    """
+    return data.get("Sampling", dict()).get("MeasureNoise", False)
+
+
+def get_cache_keys(
+    cache: Optional[render_cache.RenderCache],
+    data: dict,
+    views: List[Tuple[str, Position]],
+    quality: str,
+) -> Dict[str, str]:
+    """
+    Get the render cache key of each view
+    :param cache: The render cache, may be None
+    :param data: The render options
+    :param views: A list of (name, position) pairs
+    :param quality: The quality of the render
+    :return: The cache key of each view keyed on the view name, empty if there is no cache or if the views write SVG
+    files or thumbnails, which the cache does not hold
+    """
+    if cache is None or data.get("Drawing", dict()).get("Svg", False):
+        return dict()
+    if data.get("Output", dict()).get("Thumbnails"):
+        return dict()
+    environment = get_render_environment()
+    return {
+        name: cache.key(data, pos.to_dict(), quality, environment)
+        for name, pos in views
+    }
+
+
+def get_render_environment() -> dict:
+    """
+    Get what renders the views besides the render options: the Blender version and the render engine and device the
+    render preferences resolve to, so that a cached view is only served to the same renderer
+    :return: A dictionary with the keys Blender, Engine and Device
+    """
+    engine, device = render_devices.set_render_device() or (None, None)
+    return {"Blender": bpy.app.version_string, "Engine": engine, "Device": device}
+
+
+def get_profile_report() -> dict:
+    """
+    Get the profiling report of the stages recorded so far, along with the mesh statistics of the loaded model
+    :return: The profiling report
+    """
+    report = render_profiler.get_report()
+    report["Mesh"] = MESH_STATS
+    return report
+
+
+def write_profile_report(report: dict, destination: str, file_path: str) -> None:
+    """
+    Write a profiling report either to stdout on a [PROFILE] line or to a sidecar JSON file
+    :param report: The profiling report
+    :param destination: Either 'stdout' or 'sidecar'
+    :param file_path: The path of the sidecar file
+    :return: None
+    """
+    if destination == "sidecar":
+        with open(file_path, "w") as file:
+            json.dump(report, file, indent=4)
+    else:
+        print_status("PROFILE", report)
+
+
+def print_status(tag: str, payload: dict) -> None:
+    """
+    Print a tagged JSON status line that can be picked out of Blender's own output by the caller
+    :param tag: The tag identifying the kind of status line
+    :param payload: The JSON serializable status
+    :return: None
+    """
+    print(f"[{tag}] {json.dumps(payload)}", flush=True)
+
+
+########################################################################################################################
+# WORKER FUNCTIONS
+########################################################################################################################
+# The model identity from get_model_identity that is currently loaded into the scene of the worker
+LOADED_MODEL = None
+
+# The part counts of the assembly that is currently loaded into the scene of the worker, None for a single model
+LOADED_ASSEMBLY = None
+
+# The scene parts configured for the previous job of the worker, as returned by get_scene_parts
+CONFIGURED_PARTS = None
+
+# The scene parts that only change the settings restored by restore_scene_settings. They share the same settings, so
+# they are configured again together from the baseline whenever one of them changes.
+SETTINGS_PARTS = ("RenderPreferences", "Threads", "Resolution", "Background")
+
+# The settings of the scene once the previous job of the worker configured it, as returned by get_scene_settings
+CONFIGURED_SETTINGS = None
+
+# The number of seconds the last configuration of every scene part took, to compare incremental jobs against
+FULL_SETUP_SECONDS = None
+
+
+def run_job(
+    data: dict,
+    quality: str,
+    cache: Optional[render_cache.RenderCache] = None,
+    frame_start: Optional[int] = None,
+    frame_end: Optional[int] = None,
+    tile_shard: Optional[Tuple[int, int]] = None,
+    profile_path: Optional[str] = None,
+) -> dict:
+    """
+    Render a job, either inside a long-lived worker or once from the command line, only reloading the model when the
+    Model or Unit differ from the previous job, and only configuring the parts of the scene whose options differ from
+    the previous job
+    :param data: The render options of the job
+    :param quality: The quality of the render, either 'preview' or 'normal'
+    :param cache: The render cache, may be None
+    :param frame_start: The first turntable frame to render, may be None to start at the first frame
+    :param frame_end: The last turntable frame to render, may be None to end at the last frame
+    :param tile_shard: The index of this process and the number of processes to split the tiles of a tiled render
+    with, may be None
+    :param profile_path: The path to write a cProfile dump of the scene setup to, may be None
+    :return: The result of the job
+    :raises render_options.OptionsError: If the render options are invalid, before the scene is touched
+    """
+    render_options.check_options(data)
+    render_profiler.reset()
+    start = time.perf_counter()
+    views = get_views(data)
+    keys = get_cache_keys(cache, data, views, quality)
+    timings = {"Load": 0.0, "Setup": 0.0}
+    reused = LOADED_MODEL == get_model_identity(data)
+    reused_parts = []
+
+    def setup() -> None:
+        global LOADED_MODEL, LOADED_ASSEMBLY, MESH_STATS, FULL_SETUP_SECONDS
+        global CONFIGURED_PARTS, CONFIGURED_SETTINGS
+        prepare_start = time.perf_counter()
+        previous = CONFIGURED_PARTS if reused else None
+        CONFIGURED_PARTS = None
+        CONFIGURED_SETTINGS = None
+
+        # Only reload the model if it differs from the one already in the scene, every part of the scene is then
+        # configured again from the baseline
+        if not reused:
+            LOADED_MODEL = None
+            reset_scene()
+            LOADED_ASSEMBLY = load_model(data)
+            MESH_STATS = get_mesh_stats()
+            LOADED_MODEL = get_model_identity(data)
+        loaded = time.perf_counter()
+
+        # A settings part can leave behind settings that another one does not set, so when any of them changes the
+        # settings go back to the baseline and every settings part is configured again
+        parts = get_scene_parts(data, quality)
+        if previous is not None and any(
+            previous.get(x) != parts[x] for x in SETTINGS_PARTS
+        ):
+            restore_scene_settings()
+            previous = {k: v for k, v in previous.items() if k not in SETTINGS_PARTS}
+
+        reused_parts.extend(configure_scene(data, quality, previous))
+        CONFIGURED_PARTS = parts
+        CONFIGURED_SETTINGS = get_scene_settings()
+        timings["Load"] = round(loaded - prepare_start, 3)
+        timings["Setup"] = round(time.perf_counter() - loaded, 3)
+        if previous is None:
+            FULL_SETUP_SECONDS = timings["Setup"]
+
+    # Set up the scene once, unless every view is served from the cache
+    def prepare() -> None:
+        if profile_path is None:
+            setup()
+            return
+        profiler = cProfile.Profile()
+        profiler.runcall(setup)
+        profiler.dump_stats(profile_path)
+
+    output_path = get_output_path(data)
+    try:
+        if "Turntable" in data:
+            prepare()
+            status = render_turntable(data, output_path, frame_start, frame_end)
+            print_status("TURNTABLE", status)
+            statuses = [status]
+        else:
+            if data.get("SaveBlenderFile", False):
+                prepare()
+                prepare = None
+            if "Atlas" in data:
+                statuses = render_atlas_views(data, views, output_path, prepare)
+            else:
+                passes = get_progressive_passes(data)
+                renderer = get_view_renderer(data, quality, tile_shard)
+                statuses = render_views(
+                    views,
+                    output_path,
+                    cache if renderer is None and keys else None,
+                    keys,
+                    prepare,
+                    passes,
+                    output=data.get("Output"),
+                    renderer=renderer,
+                    measure_noise=is_noise_measured(data),
+                )
+        timings["Total"] = round(time.perf_counter() - start, 3)
+        timings["FullSetup"] = FULL_SETUP_SECONDS
+        timings["Render"] = round(
+            timings["Total"] - timings["Load"] - timings["Setup"], 3
+        )
+
+        if data.get("SaveBlenderFile", False):
+            save_file(output_path + data["Name"] + ".blend")
+    finally:
+        # Return the settings to what the configuration of the scene set after every job, so that nothing the render
+        # changed, such as the image settings of an atlas or the frames of a turntable, leaks into the next job while
+        # the configured parts can still be reused. Only the settings that differ are set, and the settings go back to
+        # the baseline if the scene was never fully configured.
+        restore_scene_settings(CONFIGURED_SETTINGS)
+
+    # Release the data blocks the job left unused, so the memory of the worker stays flat from job to job
+    purged = purge_orphans()
+
+    errors = [x["Error"] for x in statuses if x["Error"] is not None]
+    return {
+        "Name": data["Name"],
+        "Paths": [x["Path"] for x in statuses if x["Path"] is not None],
+        "ModelReused": reused,
+        "Assembly": LOADED_ASSEMBLY if "Models" in data else None,
+        "Reused": reused_parts,
+        "Samples": {x["Name"]: x.get("Samples") for x in statuses},
+        "Noise": {x["Name"]: x.get("Noise") for x in statuses},
+        "Cached": [x["Name"] for x in statuses if x["Status"] == "cached"],
+        "Purged": purged,
+        "Timings": timings,
+        "Profile": get_profile_report() if data.get("Profile", False) else None,
+        "Error": "; ".join(errors) if errors else None,
+    }
+
+
+def handle_job(
+    line: str, quality: str, cache: Optional[render_cache.RenderCache] = None
+) -> dict:
+    """
+    Parse and run a single newline-delimited JSON job, capturing any error in the result
+    :param line: A JSON document with the same schema as --options, optionally with a "Quality" key
+    :param quality: The default quality of the render, used if the job does not specify one
+    :param cache: The render cache, may be None
+    :return: The result of the job
+    """
+    try:
+        data = json.loads(line)
+        if data.get("Command") == "shutdown":
+            return {"Command": "shutdown", "Error": None}
+        return run_job(data, data.get("Quality", quality), cache)
+    except Exception as e:
+        return {"Error": f"{type(e).__name__}: {e}"}
+
+
+def serve_stdin(quality: str, cache: Optional[render_cache.RenderCache] = None) -> None:
+    """
+    Read newline-delimited JSON jobs from stdin until it is closed, answering each with a [RESULT] status line
+    :param quality: The default quality of the render
+    :param cache: The render cache, may be None
+    :return: None
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = handle_job(line, quality, cache)
+        print_status("RESULT", result)
+        if result.get("Command") == "shutdown":
+            break
+
+
+def serve_socket(
+    path: str, quality: str, cache: Optional[render_cache.RenderCache] = None
+) -> None:
+    """
+    Listen on a local UNIX socket for newline-delimited JSON jobs, answering each with a JSON result line on the same
+    connection. Connections are served one at a time so jobs never overlap in the scene.
+    :param path: The path of the UNIX socket
+    :param quality: The default quality of the render
+    :param cache: The render cache, may be None
+    :return: None
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError(
+            "UNIX sockets are not supported on this platform, use stdin instead"
         )
 
-    # Render the view
-    render_generic_view(name=data["Name"], output_folder=output_path, position=position)
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection, connection.makefile("rw") as stream:
+                for line in stream:
+                    if not line.strip():
+                        continue
+                    result = handle_job(line, quality, cache)
+                    stream.write(json.dumps(result) + "\n")
+                    stream.flush()
+                    if result.get("Command") == "shutdown":
+                        return
+    finally:
+        server.close()
+        os.remove(path)
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    # Parse the command line arguments
+    parser = BlenderArgparse(
+        description="Script to render a view of the scene with the specified parameters"
+    )
+    parser.add_argument("--options", type=str, help="Options for rendering")
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Path to a JSON file of options for rendering, used instead of --options",
+    )
+    parser.add_argument(
+        "--quality",
+        type=str,
+        help="The quality of the render, either 'preview' or 'normal'",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Run as a long-lived worker that reads newline-delimited JSON jobs",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="Path of a UNIX socket to read worker jobs from instead of stdin",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the render cache, rendered views are cached if this is set",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        help="The maximum size of the render cache in megabytes",
+    )
+    parser.add_argument(
+        "--model-cache-dir",
+        type=str,
+        help="Directory of pre-converted .blend models, .obj and .stl models are cached if this is set",
+    )
+    parser.add_argument(
+        "--prepare",
+        type=str,
+        help="Pre-convert the model, or every model in the directory, at this path into the model cache and exit",
+    )
+    parser.add_argument(
+        "--unit",
+        type=float,
+        default=1,
+        help="The scale of the models relative to meters, used with --prepare",
+    )
+    parser.add_argument(
+        "--streaming-import",
+        action="store_true",
+        help="Load binary .stl models with the chunked loader, used with --prepare",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        choices=["stdout", "sidecar"],
+        help="Where to write the per-stage timing report, a [PROFILE] line or a <Name>.profile.json file, it is only "
+        'written if this, --profile or the "Profile" option is given',
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Path to write a cProfile dump of the scene setup to",
+    )
+    parser.add_argument(
+        "--refresh-devices",
+        action="store_true",
+        help="Ignore the render device cache and probe the render devices again",
+    )
+    parser.add_argument(
+        "--frame-start",
+        type=int,
+        help="The first turntable frame to render, to split a turntable across processes",
+    )
+    parser.add_argument(
+        "--frame-end",
+        type=int,
+        help="The last turntable frame to render, to split a turntable across processes",
+    )
+    parser.add_argument(
+        "--tile-shard",
+        type=int,
+        nargs=2,
+        metavar=("INDEX", "COUNT"),
+        help="Only render every COUNT-th tile of a tiled render starting at INDEX and keep the tiles, a later run "
+        "without this flag stitches them",
+    )
+    args = parser.parse_args()
+
+    render_devices.REFRESH_DEVICES = args.refresh_devices
+
+    # Record the baseline of the scene before any model is loaded into it
+    snapshot_scene()
+
+    if args.model_cache_dir is not None:
+        MODEL_CACHE_DIR = args.model_cache_dir
+
+    # Warm the model cache and exit if requested
+    if args.prepare is not None:
+        if MODEL_CACHE_DIR is None:
+            MODEL_CACHE_DIR = model_cache.default_cache_directory()
+        failures = prepare_models(args.prepare, args.unit, args.streaming_import)
+        sys.exit(1 if failures != 0 else 0)
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = render_cache.RenderCache(args.cache_dir, args.cache_max_mb * 1024**2)
+
+    # Serve jobs until shutdown if running as a worker
+    if args.worker:
+        if args.socket is not None:
+            serve_socket(args.socket, args.quality, cache)
+        else:
+            serve_stdin(args.quality, cache)
+        sys.exit(0)
 
-    save = data["SaveBlenderFile"]
+    # Report an error raised outside the views as a failed view and exit non-zero, so runners never record the job as
+    # completed whatever the exit code Blender is started with
+    data = dict()
+    try:
+        data = load_options(args.options, args.manifest)
+
+        # Check the options before any work is done with them, so an invalid job fails before its model is imported
+        try:
+            render_options.check_options(data)
+            get_file_extension(data.get("Output", dict()))
+        except render_options.OptionsError as e:
+            print_status("INVALID", {"Name": data.get("Name"), "Errors": e.errors})
+            sys.exit(1)
+        except ValueError as e:
+            print_status("INVALID", {"Name": data.get("Name"), "Errors": [str(e)]})
+            sys.exit(1)
+
+        result = run_job(
+            data,
+            args.quality,
+            cache,
+            args.frame_start,
+            args.frame_end,
+            args.tile_shard,
+            args.profile,
+        )
 
-    if save:
-        save_file(output_path + data["Name"] + ".blend")
+        # Only write the timing report when it is asked for
+        profile = data.get("Profile", False) or args.profile is not None
+        if profile or args.report is not None:
+            write_profile_report(
+                get_profile_report(),
+                args.report or "stdout",
+                get_output_path(data) + data["Name"] + ".profile.json",
+            )
+
+        if result["Error"] is not None:
+            sys.exit(1)
+    except Exception as e:
+        print_status(
+            "VIEW",
+            {
+                "Name": data.get("Name") if isinstance(data, dict) else None,
+                "Status": "failed",
+                "Path": None,
+                "Error": f"{type(e).__name__}: {e}",
+                "Stage": render_profiler.get_failed_stage(e),
+            },
+        )
+        sys.exit(1)
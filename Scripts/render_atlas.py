@@ -0,0 +1,201 @@
+########################################################################################################################
+# render_atlas.py
+#
+# This script is used to tile the pixels of several rendered views into a single drawing sheet in memory, with an
+# optional label under each view, so that the views do not have to be written and read back to compose the sheet.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# A 5x7 bitmap font for the labels, each glyph is seven rows of five bits with the leftmost pixel in the highest bit
+FONT = {
+    "A": "0E11111F111111",
+    "B": "1E11111E11111E",
+    "C": "0E11101010110E",
+    "D": "1E11111111111E",
+    "E": "1F10101E10101F",
+    "F": "1F10101E101010",
+    "G": "0E11101711110F",
+    "H": "1111111F111111",
+    "I": "0E04040404040E",
+    "J": "0702020202120C",
+    "K": "11121418141211",
+    "L": "1010101010101F",
+    "M": "111B1515111111",
+    "N": "11111915131111",
+    "O": "0E11111111110E",
+    "P": "1E11111E101010",
+    "Q": "0E11111115120D",
+    "R": "1E11111E141211",
+    "S": "0F10100E01011E",
+    "T": "1F040404040404",
+    "U": "1111111111110E",
+    "V": "11111111110A04",
+    "W": "1111111515150A",
+    "X": "11110A040A1111",
+    "Y": "1111110A040404",
+    "Z": "1F01020408101F",
+    "0": "0E11131519110E",
+    "1": "040C040404040E",
+    "2": "0E11010204081F",
+    "3": "1F02040201110E",
+    "4": "02060A121F0202",
+    "5": "1F101E0101110E",
+    "6": "0608101E11110E",
+    "7": "1F010204080808",
+    "8": "0E11110E11110E",
+    "9": "0E11110F01020C",
+    "-": "0000001F000000",
+    "_": "0000000000001F",
+    ".": "00000000000C0C",
+    " ": "00000000000000",
+    "?": "0E110102040004",
+}
+
+# The width and height of a glyph, and the horizontal advance from one glyph to the next
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+GLYPH_ADVANCE = 6
+
+
+########################################################################################################################
+# LABEL FUNCTIONS
+########################################################################################################################
+def get_glyph(character: str) -> np.ndarray:
+    """
+    Get the bitmap of a character, lower case characters are drawn in upper case and unknown characters as '?'
+    :param character: The character
+    :return: A (7, 5) boolean array of the pixels of the glyph
+    """
+    rows = bytes.fromhex(FONT.get(character.upper(), FONT["?"]))
+    bits = np.frombuffer(rows, dtype=np.uint8)[:, np.newaxis] >> np.arange(4, -1, -1)
+    return (bits & 1).astype(bool)
+
+
+def render_label(text: str, scale: int) -> np.ndarray:
+    """
+    Render a line of text into a mask
+    :param text: The text of the label
+    :param scale: The size of a font pixel in image pixels
+    :return: A boolean array of the pixels of the text, top row first
+    """
+    mask = np.zeros((GLYPH_HEIGHT, max(1, len(text) * GLYPH_ADVANCE - 1)), dtype=bool)
+    for index, character in enumerate(text):
+        x = index * GLYPH_ADVANCE
+        mask[:, x : x + GLYPH_WIDTH] = get_glyph(character)
+    return np.kron(mask, np.ones((scale, scale), dtype=bool))
+
+
+########################################################################################################################
+# ATLAS FUNCTIONS
+########################################################################################################################
+def get_layout(count: int, columns: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Get the number of rows and columns of an atlas, as close to square as possible unless the columns are given
+    :param count: The number of views
+    :param columns: The number of columns, may be None
+    :return: The number of rows and columns
+    """
+    if columns is None or columns <= 0:
+        columns = math.ceil(math.sqrt(count))
+    columns = max(1, min(columns, count))
+    return math.ceil(count / columns), columns
+
+
+def premultiply(colour: Tuple[float, float, float, float]) -> Tuple[float, ...]:
+    """
+    Multiply the colour of a straight RGBA colour by its alpha
+    :param colour: The straight colour
+    :return: The premultiplied colour
+    """
+    return tuple(x * colour[3] for x in colour[:3]) + (colour[3],)
+
+
+def composite_over(
+    pixels: np.ndarray, destination: np.ndarray, premultiplied: bool = True
+) -> None:
+    """
+    Composite pixels over the pixels of a destination in place with the over operator
+    :param pixels: A (height, width, 4) float array of the pixels to composite
+    :param destination: A float array of the same shape and alpha representation that is written to
+    :param premultiplied: Whether the colour of both arrays is premultiplied by their alpha
+    :return: None
+    """
+    alpha = pixels[..., 3:]
+    if premultiplied:
+        destination *= 1 - alpha
+        destination += pixels
+        return
+
+    below = destination[..., 3:] * (1 - alpha)
+    result_alpha = alpha + below
+    result = pixels[..., :3] * alpha + destination[..., :3] * below
+    np.divide(result, result_alpha, out=result, where=result_alpha > 0)
+    destination[..., :3] = result
+    destination[..., 3:] = result_alpha
+
+
+def compose_atlas(
+    tiles: List[Tuple[str, np.ndarray]],
+    columns: Optional[int] = None,
+    padding: int = 16,
+    background: Tuple[float, float, float, float] = (1, 1, 1, 1),
+    label_colour: Optional[Tuple[float, float, float, float]] = (0, 0, 0, 1),
+    label_scale: int = 2,
+    premultiplied: bool = True,
+) -> np.ndarray:
+    """
+    Tile views into a single sheet, left to right and top to bottom in the order they are given. Every cell is the size
+    of the largest view and smaller views are centered in their cell. The views are composited over the background, so
+    the transparent parts of a view, such as the film of a preview render, show the sheet instead of a hole.
+    :param tiles: A list of (name, pixels) pairs, where the pixels are a (height, width, 4) float array, top row first
+    :param columns: The number of columns, as close to square as possible if None
+    :param padding: The number of pixels around and between the cells
+    :param background: The colour of the sheet
+    :param label_colour: The colour of the label drawn under each view, or None to not draw labels
+    :param label_scale: The size of a font pixel of the labels in image pixels
+    :param premultiplied: Whether the colour of the views is premultiplied by their alpha, as Blender's render results
+    are, the sheet is returned in the same form
+    :return: A (height, width, 4) float32 array of the sheet, top row first
+    """
+    rows, columns = get_layout(len(tiles), columns)
+    cell_height = max(x.shape[0] for _, x in tiles)
+    cell_width = max(x.shape[1] for _, x in tiles)
+    label_height = 0 if label_colour is None else GLYPH_HEIGHT * label_scale + padding
+
+    step_y = cell_height + label_height + padding
+    step_x = cell_width + padding
+    sheet = np.empty(
+        (rows * step_y + padding, columns * step_x + padding, 4), np.float32
+    )
+    sheet[:] = premultiply(background) if premultiplied else background
+
+    for index, (name, pixels) in enumerate(tiles):
+        top = padding + (index // columns) * step_y
+        left = padding + (index % columns) * step_x
+
+        y = top + (cell_height - pixels.shape[0]) // 2
+        x = left + (cell_width - pixels.shape[1]) // 2
+        region = sheet[y : y + pixels.shape[0], x : x + pixels.shape[1]]
+        composite_over(pixels, region, premultiplied)
+
+        if label_colour is not None:
+            # Center the label under the cell, clipped to the width of the cell
+            mask = render_label(name, label_scale)[:, :cell_width]
+            y = top + cell_height + padding
+            x = left + (cell_width - mask.shape[1]) // 2
+            region = sheet[y : y + mask.shape[0], x : x + mask.shape[1]]
+            region[mask] = premultiply(label_colour) if premultiplied else label_colour
+
+    return sheet
@@ -0,0 +1,441 @@
+########################################################################################################################
+# render_benchmark.py
+#
+# This script is used to benchmark render.py. It generates synthetic meshes at several triangle counts, renders them
+# at several qualities, resolutions and view counts, and records the setup time, render time, peak memory and output
+# size of every run to a JSON results file. Two results files can be compared to flag regressions. It is run with a
+# regular Python interpreter rather than inside Blender.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The path to the render script that is benchmarked
+RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render.py")
+
+# The camera distance of every view, the synthetic meshes are spheres with a radius of one meter
+CAMERA_DISTANCE = 5
+
+# The views that are rendered, in order, when a run renders N views
+VIEWS = [
+    {"Name": "top", "Position": {"X": 0, "Y": 0, "Z": 5, "Rx": 0, "Ry": 0, "Rz": 0}},
+    {
+        "Name": "front",
+        "Position": {"X": 0, "Y": -5, "Z": 0, "Rx": 90, "Ry": 0, "Rz": 0},
+    },
+    {
+        "Name": "right",
+        "Position": {"X": 5, "Y": 0, "Z": 0, "Rx": 90, "Ry": 0, "Rz": 90},
+    },
+    {
+        "Name": "iso",
+        "Position": {"X": 2.89, "Y": -2.89, "Z": 2.89, "Rx": 54.7, "Ry": 0, "Rz": 45},
+    },
+]
+
+# The stages of the profiling report that make up the render time, every other top-level stage is setup time
+RENDER_STAGES = ["render", "write_image"]
+
+# The fields that identify the same benchmark run in two results files
+RUN_KEYS = ["Triangles", "Format", "Quality", "Resolution", "Views"]
+
+# The metrics that are compared between two results files, a larger value is worse for every metric
+METRICS = ["SetupSeconds", "RenderSeconds", "WallSeconds", "PeakRSS", "OutputBytes"]
+
+
+########################################################################################################################
+# MESH GENERATION FUNCTIONS
+########################################################################################################################
+def sphere_grid(triangles: int) -> Tuple[int, int]:
+    """
+    Get the number of rings and segments of a UV sphere with roughly the given number of triangles
+    :param triangles: The target number of triangles
+    :return: The number of rings and segments
+    """
+    segments = max(3, int(math.sqrt(triangles)))
+    rings = max(2, triangles // (2 * segments))
+    return rings, segments
+
+
+def sphere_vertex(ring: int, segment: int, rings: int, segments: int) -> tuple:
+    """
+    Get a vertex of a UV sphere with a radius of one
+    :param ring: The ring of the vertex, from 0 at the top pole to rings at the bottom pole
+    :param segment: The segment of the vertex
+    :param rings: The number of rings of the sphere
+    :param segments: The number of segments of the sphere
+    :return: The x, y and z coordinates of the vertex
+    """
+    theta = math.pi * ring / rings
+    phi = 2 * math.pi * (segment % segments) / segments
+    return (
+        math.sin(theta) * math.cos(phi),
+        math.sin(theta) * math.sin(phi),
+        math.cos(theta),
+    )
+
+
+def sphere_triangles(rings: int, segments: int):
+    """
+    Generate the triangles of a UV sphere as (ring, segment) corners
+    :param rings: The number of rings of the sphere
+    :param segments: The number of segments of the sphere
+    :return: An iterator of triangles, each a tuple of three (ring, segment) corners
+    """
+    for ring, segment in itertools.product(range(rings), range(segments)):
+        a, b = (ring, segment), (ring, segment + 1)
+        c, d = (ring + 1, segment), (ring + 1, segment + 1)
+        yield a, c, d
+        yield a, d, b
+
+
+def write_stl(path: str, triangles: int) -> None:
+    """
+    Write a binary STL file of a UV sphere
+    :param path: The path of the STL file
+    :param triangles: The target number of triangles
+    :return: None
+    """
+    rings, segments = sphere_grid(triangles)
+    count = 2 * rings * segments
+    triangle = struct.Struct("<12fH")
+
+    with open(path, "wb") as file:
+        file.write(b"\0" * 80)
+        file.write(struct.pack("<I", count))
+        for corners in sphere_triangles(rings, segments):
+            points = [sphere_vertex(r, s, rings, segments) for r, s in corners]
+            file.write(triangle.pack(0, 0, 0, *itertools.chain(*points), 0))
+
+
+def write_obj(path: str, triangles: int) -> None:
+    """
+    Write an OBJ file of a UV sphere
+    :param path: The path of the OBJ file
+    :param triangles: The target number of triangles
+    :return: None
+    """
+    rings, segments = sphere_grid(triangles)
+
+    def index(ring: int, segment: int) -> int:
+        return ring * segments + segment % segments + 1
+
+    with open(path, "w") as file:
+        for ring, segment in itertools.product(range(rings + 1), range(segments)):
+            x, y, z = sphere_vertex(ring, segment, rings, segments)
+            file.write(f"v {x:.6f} {y:.6f} {z:.6f}\n")
+        for corners in sphere_triangles(rings, segments):
+            file.write("f " + " ".join(str(index(r, s)) for r, s in corners) + "\n")
+
+
+def generate_model(directory: str, triangles: int, model_format: str) -> str:
+    """
+    Generate a synthetic model, reusing it if it has already been generated
+    :param directory: The directory to write the model to
+    :param triangles: The target number of triangles
+    :param model_format: Either 'stl' or 'obj'
+    :return: The path of the model
+    """
+    path = os.path.join(directory, f"sphere-{triangles}.{model_format}")
+    if not os.path.exists(path):
+        # Write to a temporary file first so an interrupted run never leaves a truncated model behind
+        temporary = path + ".tmp"
+        if model_format == "stl":
+            write_stl(temporary, triangles)
+        else:
+            write_obj(temporary, triangles)
+        os.replace(temporary, path)
+    return path
+
+
+########################################################################################################################
+# BENCHMARK FUNCTIONS
+########################################################################################################################
+def create_options(
+    model: str, output: str, resolution: Tuple[int, int], views: int
+) -> dict:
+    """
+    Create the render options of a benchmark run
+    :param model: The path of the model
+    :param output: The output directory
+    :param resolution: The width and height of the rendered images
+    :param views: The number of views to render
+    :return: The render options
+    """
+    return {
+        "Name": "benchmark",
+        "Model": model,
+        "Unit": 1,
+        "OutputDirectory": output,
+        "Resolution": {"Width": resolution[0], "Height": resolution[1], "Scale": 100},
+        "Camera": {"Distance": CAMERA_DISTANCE, "Position": VIEWS[0]["Position"]},
+        "Views": VIEWS[:views],
+        "Lights": [
+            {
+                "Power": 1000,
+                "Size": 3,
+                "Colour": "255,255,255,255",
+                "Position": {"X": -3, "Y": -3, "Z": 5, "Rx": 45, "Ry": 0, "Rz": 315},
+            }
+        ],
+        "BackgroundColour": "255,255,255,255",
+        "SaveBlenderFile": False,
+    }
+
+
+def run_benchmark(blender: str, options: dict, quality: str, cpu_only: bool) -> dict:
+    """
+    Run render.py once and measure it
+    :param blender: The path to the Blender executable
+    :param options: The render options
+    :param quality: The quality of the render
+    :param cpu_only: Whether to hide every GPU from Blender
+    :return: The measurements of the run
+    """
+    environment = dict(os.environ)
+    if cpu_only:
+        environment["CUDA_VISIBLE_DEVICES"] = ""
+
+    # Blender exits with code 0 when the script raises unless it is told otherwise
+    command = [blender, "-b", "--python-exit-code", "1", "-P", RENDER_SCRIPT, "--"]
+    command += ["--options", json.dumps(options), "--quality", quality]
+    command += ["--report", "stdout"]
+
+    start = time.perf_counter()
+    process = subprocess.run(command, env=environment, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    profile = {"Stages": [], "PeakRSS": None}
+    for line in process.stdout.splitlines():
+        if line.startswith("[PROFILE] "):
+            profile = json.loads(line[len("[PROFILE] ") :])
+
+    # Only sum the time of the top-level stages, the time of a nested stage such as find_render_devices is already
+    # part of the stage it ran in
+    stages = {x["Stage"]: x.get("TopLevelWall", x["Wall"]) for x in profile["Stages"]}
+    render_seconds = sum(v for k, v in stages.items() if k in RENDER_STAGES)
+    setup_seconds = sum(v for k, v in stages.items() if k not in RENDER_STAGES)
+    output_bytes = sum(
+        os.path.getsize(os.path.join(options["OutputDirectory"], x))
+        for x in os.listdir(options["OutputDirectory"])
+        if x.endswith(".png")
+    )
+
+    return {
+        "ExitCode": process.returncode,
+        "SetupSeconds": round(setup_seconds, 4),
+        "RenderSeconds": round(render_seconds, 4),
+        "WallSeconds": round(wall, 4),
+        "PeakRSS": profile["PeakRSS"],
+        "OutputBytes": output_bytes,
+    }
+
+
+def run_suite(args: argparse.Namespace) -> dict:
+    """
+    Run every combination of triangle count, format, quality, resolution and view count
+    :param args: The parsed command line arguments
+    :return: The benchmark results
+    """
+    os.makedirs(args.models_dir, exist_ok=True)
+    results = []
+
+    for triangles, model_format in itertools.product(args.triangles, args.formats):
+        model = generate_model(args.models_dir, triangles, model_format)
+        for quality, resolution, views in itertools.product(
+            args.qualities, args.resolutions, args.views
+        ):
+            with tempfile.TemporaryDirectory() as output:
+                options = create_options(model, output, resolution, views)
+                measurements = run_benchmark(
+                    args.blender, options, quality, args.cpu_only
+                )
+
+            result = {
+                "Triangles": triangles,
+                "Format": model_format,
+                "Quality": quality,
+                "Resolution": f"{resolution[0]}x{resolution[1]}",
+                "Views": views,
+                **measurements,
+            }
+            print(json.dumps(result), flush=True)
+            results.append(result)
+
+    return {
+        "Host": platform.node(),
+        "Platform": platform.platform(),
+        "Time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "CPUOnly": args.cpu_only,
+        "Results": results,
+    }
+
+
+########################################################################################################################
+# COMPARISON FUNCTIONS
+########################################################################################################################
+def result_key(result: dict) -> tuple:
+    """
+    Get the key that identifies the same benchmark run in two results files
+    :param result: A benchmark result
+    :return: The key of the result
+    """
+    return tuple(result[x] for x in RUN_KEYS)
+
+
+def compare_results(old: dict, new: dict, threshold: float) -> List[dict]:
+    """
+    Compare two results files and find the metrics that got worse by more than the threshold. A run that failed when
+    its baseline succeeded is a regression of its ExitCode, and its metrics are not compared as they only measure the
+    part of the run before it failed.
+    :param old: The baseline results
+    :param new: The new results
+    :param threshold: The allowed relative increase, for example 0.1 for 10%
+    :return: A list of regressions
+    """
+    baseline = {result_key(x): x for x in old["Results"]}
+    regressions = []
+
+    for result in new["Results"]:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        if result.get("ExitCode") != 0 and previous.get("ExitCode") == 0:
+            regressions.append(
+                {
+                    "Run": {x: result[x] for x in RUN_KEYS},
+                    "Metric": "ExitCode",
+                    "Before": previous["ExitCode"],
+                    "After": result.get("ExitCode"),
+                    "Change": None,
+                }
+            )
+            continue
+        for metric in METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change > threshold:
+                regressions.append(
+                    {
+                        "Run": {x: result[x] for x in RUN_KEYS},
+                        "Metric": metric,
+                        "Before": before,
+                        "After": after,
+                        "Change": round(change, 4),
+                    }
+                )
+
+    return regressions
+
+
+########################################################################################################################
+# HELPER FUNCTIONS
+########################################################################################################################
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """
+    Parse a resolution of the form <width>x<height>
+    :param value: The resolution string
+    :return: The width and height
+    """
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark render.py")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite")
+    run_parser.add_argument(
+        "--blender", type=str, default="blender", help="Path to the Blender executable"
+    )
+    run_parser.add_argument(
+        "--output", type=str, required=True, help="Path of the JSON results file"
+    )
+    run_parser.add_argument(
+        "--models-dir",
+        type=str,
+        default=os.path.join(tempfile.gettempdir(), "orthographic-renderer-benchmark"),
+        help="Directory the synthetic models are generated in and reused from",
+    )
+    run_parser.add_argument(
+        "--triangles",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000, 10_000_000],
+        help="The triangle counts of the synthetic models",
+    )
+    run_parser.add_argument(
+        "--formats", nargs="+", choices=["stl", "obj"], default=["stl", "obj"]
+    )
+    run_parser.add_argument(
+        "--qualities",
+        nargs="+",
+        choices=["preview", "normal"],
+        default=["preview", "normal"],
+    )
+    run_parser.add_argument(
+        "--resolutions",
+        type=parse_resolution,
+        nargs="+",
+        default=[(640, 480), (1920, 1080)],
+        help="The resolutions to render at, as <width>x<height>",
+    )
+    run_parser.add_argument(
+        "--views",
+        type=int,
+        nargs="+",
+        choices=range(1, len(VIEWS) + 1),
+        default=[1, len(VIEWS)],
+        help="The numbers of views to render per run",
+    )
+    run_parser.add_argument(
+        "--cpu-only", action="store_true", help="Hide every GPU from Blender"
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("old", type=str, help="The baseline results file")
+    compare_parser.add_argument("new", type=str, help="The new results file")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The allowed relative increase of a metric before it is a regression",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        suite = run_suite(args)
+        with open(args.output, "w") as output_file:
+            json.dump(suite, output_file, indent=4)
+
+    elif args.command == "compare":
+        with open(args.old, "r") as old_file, open(args.new, "r") as new_file:
+            old_results, new_results = json.load(old_file), json.load(new_file)
+        found = compare_results(old_results, new_results, args.threshold)
+        print(json.dumps({"Regressions": found}, indent=4))
+        sys.exit(1 if len(found) != 0 else 0)
@@ -0,0 +1,330 @@
+########################################################################################################################
+# render_cache.py
+#
+# This script is used to cache rendered images on disk, keyed on the contents of the model file and the normalized
+# render options, so that repeated renders of the same view can be served without rendering. It can also be run on its
+# own to print the cache statistics or to invalidate cached renders.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # The fcntl module is not available on Windows
+    fcntl = None
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The options that do not change the rendered pixels and are therefore left out of the cache key
+IGNORED_OPTIONS = [
+    "Name",
+    "Model",
+    "OutputDirectory",
+    "SaveBlenderFile",
+    "Views",
+    "Threads",
+    "Progressive",
+]
+
+# The name of the file used to store the hit and miss counters
+STATS_FILE = "stats.json"
+
+# The content hashes of the model files that have been hashed by this process, keyed on (path, mtime, size)
+MODEL_HASHES = dict()
+
+
+########################################################################################################################
+# HASHING FUNCTIONS
+########################################################################################################################
+def hash_model(model_path: str) -> str:
+    """
+    Compute the SHA-256 hash of the contents of a model file, reusing the hash if the file has not changed
+    :param model_path: The path to the model file
+    :return: The hex digest of the model contents
+    """
+    stat = os.stat(model_path)
+    file_key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+
+    if file_key not in MODEL_HASHES:
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        MODEL_HASHES[file_key] = digest.hexdigest()
+
+    return MODEL_HASHES[file_key]
+
+
+def hash_options(
+    data: dict, position: dict, quality: str, environment: Optional[dict] = None
+) -> str:
+    """
+    Compute the SHA-256 hash of the canonicalized render options of a single view
+    :param data: The render options
+    :param position: The JSON representation of the camera position of the view
+    :param quality: The quality of the render
+    :param environment: What renders the view besides the options, such as the Blender version and the render engine
+    and device, which change the rendered pixels without changing the options, may be None
+    :return: The hex digest of the canonical options
+    """
+    options = {k: v for k, v in data.items() if k not in IGNORED_OPTIONS}
+    options["Camera"] = dict(options.get("Camera", {}), Position=position)
+    options["Quality"] = quality
+    options["Environment"] = environment
+    canonical = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+########################################################################################################################
+# RENDER CACHE CLASS
+########################################################################################################################
+class RenderCache:
+    """
+    A content-addressed cache of rendered images with a size cap and least recently used eviction. Each entry is a file
+    named <model hash>-<options hash> followed by the extension of its output format, such as .png or .exr, and the
+    modification time of the file is used as its last use time.
+    """
+
+    # The directory the cached images are stored in
+    directory: str
+    # The maximum total size of the cached images in bytes
+    max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(
+        self,
+        data: dict,
+        position: dict,
+        quality: str,
+        environment: Optional[dict] = None,
+    ) -> str:
+        """
+        Get the cache key of a single view
+        :param data: The render options
+        :param position: The JSON representation of the camera position of the view
+        :param quality: The quality of the render
+        :param environment: The Blender version and the resolved render engine and device, may be None
+        :return: The cache key
+        """
+        # An assembly is identified by the contents of all of its parts, their paths and transforms are in the options
+        if "Models" in data:
+            hashes = "".join(hash_model(x["Model"]) for x in data["Models"])
+            model_hash = hashlib.sha256(hashes.encode()).hexdigest()[:32]
+        else:
+            model_hash = hash_model(data["Model"])[:32]
+        options_hash = hash_options(data, position, quality, environment)[:32]
+        return f"{model_hash}-{options_hash}"
+
+    def path(self, key: str, extension: str = ".png") -> str:
+        """
+        Get the path of a cached image
+        :param key: The cache key
+        :param extension: The file extension of the output format of the image, including the leading dot
+        :return: The path of the cached image
+        """
+        return os.path.join(self.directory, key + extension)
+
+    def contains(self, key: str, extension: str = ".png") -> bool:
+        """
+        Check if an image is cached
+        :param key: The cache key
+        :param extension: The file extension of the output format of the image, including the leading dot
+        :return: True if the image is cached, otherwise False
+        """
+        return os.path.exists(self.path(key, extension))
+
+    def fetch(self, key: str, destination: str) -> bool:
+        """
+        Place a cached image at the destination path, hardlinking it if possible and otherwise copying it. A hardlinked
+        image shares its contents with the cache entry, so it must be removed rather than written over in place.
+        :param key: The cache key
+        :param destination: The path to place the image at, whose extension is the extension of the cached image
+        :return: True if the image was cached, otherwise False
+        """
+        source = self.path(key, os.path.splitext(destination)[1])
+
+        # Leave the image at the destination as it is if the view is not cached
+        if not os.path.exists(source):
+            return False
+        try:
+            if os.path.exists(destination):
+                os.remove(destination)
+            try:
+                os.link(source, destination)
+            except OSError:
+                shutil.copyfile(source, destination)
+            # Mark the entry as recently used
+            os.utime(source)
+        except FileNotFoundError:
+            return False
+
+        self.record(hits=1)
+        return True
+
+    def store(self, key: str, source: str) -> None:
+        """
+        Add a rendered image to the cache, evicting the least recently used images if the cache is over its size cap
+        :param key: The cache key
+        :param source: The path of the rendered image, whose extension is kept in the name of the entry
+        :return: None
+        """
+        path = self.path(key, os.path.splitext(source)[1])
+
+        # Copy to a temporary file first so that other processes never see a partially written entry
+        temporary = path + f".{os.getpid()}.tmp"
+        shutil.copyfile(source, temporary)
+        os.replace(temporary, path)
+        self.record(misses=1)
+        self.evict()
+
+    def entries(self) -> list:
+        """
+        Get the cached images ordered from least to most recently used
+        :return: A list of (path, size, last use time) tuples
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            # Leave out the counters and the entries that are still being written
+            if name.startswith(STATS_FILE) or name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda x: x[2])
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used images until the cache is within its size cap
+        :return: None
+        """
+        entries = self.entries()
+        total = sum(x[1] for x in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def invalidate(self, model_path: Optional[str] = None) -> int:
+        """
+        Remove cached images, either all of them or only those of a single model
+        :param model_path: The path of the model to invalidate, or None to invalidate everything
+        :return: The number of removed images
+        """
+        prefix = "" if model_path is None else hash_model(model_path)[:32] + "-"
+        removed = 0
+        for path, _, _ in self.entries():
+            if os.path.basename(path).startswith(prefix):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def record(self, hits: int = 0, misses: int = 0) -> None:
+        """
+        Add to the hit and miss counters of the cache, holding a lock on the counters so that concurrent workers do not
+        lose each other's updates
+        :param hits: The number of hits to add
+        :param misses: The number of misses to add
+        :return: None
+        """
+        with open(os.path.join(self.directory, STATS_FILE + ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self.read_counters()
+            stats["Hits"] += hits
+            stats["Misses"] += misses
+            temporary = os.path.join(self.directory, f"{STATS_FILE}.{os.getpid()}.tmp")
+            with open(temporary, "w") as file:
+                json.dump(stats, file)
+            os.replace(temporary, os.path.join(self.directory, STATS_FILE))
+
+    def read_counters(self) -> dict:
+        """
+        Read the hit and miss counters of the cache
+        :return: A dictionary with the keys Hits and Misses
+        """
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"Hits": 0, "Misses": 0}
+
+    def stats(self) -> dict:
+        """
+        Get the statistics of the cache
+        :return: A dictionary of the hits, misses, number of entries and their total size in bytes
+        """
+        entries = self.entries()
+        stats = self.read_counters()
+        stats["Entries"] = len(entries)
+        stats["Bytes"] = sum(x[1] for x in entries)
+        stats["MaxBytes"] = self.max_bytes
+        return stats
+
+
+########################################################################################################################
+# HELPER FUNCTIONS
+########################################################################################################################
+def default_cache_directory() -> str:
+    """
+    Get the default directory of the render cache
+    :return: The path of the default cache directory
+    """
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "orthographic-renderer", "renders"
+    )
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect or invalidate the render cache"
+    )
+    parser.add_argument(
+        "command", choices=["stats", "invalidate"], help="The command to run"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=default_cache_directory(),
+        help="The cache directory",
+    )
+    parser.add_argument(
+        "--model", type=str, help="Only invalidate the cached renders of this model"
+    )
+    args = parser.parse_args()
+
+    cache = RenderCache(args.cache_dir, sys.maxsize)
+
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=4))
+    elif args.command == "invalidate":
+        print(json.dumps({"Removed": cache.invalidate(args.model)}, indent=4))
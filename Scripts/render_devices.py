@@ -1,7 +1,8 @@
 ########################################################################################################################
 # render_devices.py
 #
-# This script is used to find and set the appropriate render device for the current system.
+# This script is used to find and set the appropriate render device for the current system. The found devices are
+# cached on disk, so that later processes can choose a device without probing every device type again.
 #
 # Copyright (C) 2024 noahsub
 ########################################################################################################################
@@ -10,14 +11,111 @@
 ########################################################################################################################
 # IMPORTS
 ########################################################################################################################
+import hashlib
 import json
+import os
+import platform
+import socket
+import sys
+import time
+from typing import Optional
+
 import bpy
 
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+import render_profiler
+
 ########################################################################################################################
 # GLOBALS
 ########################################################################################################################
 RENDER_DEVICES = None
 
+# Where the render devices came from, either "cache" or "probe"
+DEVICE_SOURCE = None
+
+# Whether to ignore the device cache and probe the devices again
+REFRESH_DEVICES = False
+
+# The path of the device cache file
+DEVICE_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "orthographic-renderer", "render_devices.json"
+)
+
+# The number of seconds the device cache is valid for
+DEVICE_CACHE_TTL = 24 * 60 * 60
+
+# The device types in order of preference
+DEVICE_TYPES = ["OPTIX", "CUDA", "CPU"]
+
+
+########################################################################################################################
+# DEVICE CACHE FUNCTIONS
+########################################################################################################################
+def get_driver_fingerprint() -> str:
+    """
+    Get a fingerprint of the installed GPU driver, which changes when the driver is updated
+    :return: The hex digest of the driver fingerprint
+    """
+    fingerprint = platform.platform()
+
+    # The NVIDIA kernel module reports its version here on Linux
+    try:
+        with open("/proc/driver/nvidia/version", "r") as file:
+            fingerprint += file.read()
+    except OSError:
+        pass
+
+    fingerprint += os.environ.get("CUDA_VISIBLE_DEVICES", "")
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]
+
+
+def get_cache_key() -> str:
+    """
+    Get the key the device cache is valid for, made of the Blender version, hostname and driver fingerprint
+    :return: The device cache key
+    """
+    return f"{bpy.app.version_string}|{socket.gethostname()}|{get_driver_fingerprint()}"
+
+
+def load_cached_devices() -> Optional[dict]:
+    """
+    Load the names of the render devices from the device cache
+    :return: The device names organized by type, or None if there is no valid cache
+    """
+    try:
+        with open(DEVICE_CACHE_FILE, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if cache.get("Key") != get_cache_key():
+        return None
+    if time.time() - cache.get("Time", 0) > DEVICE_CACHE_TTL:
+        return None
+    return cache["Devices"]
+
+
+def save_cached_devices(names: dict) -> None:
+    """
+    Save the names of the render devices to the device cache
+    :param names: The device names organized by type
+    :return: None
+    """
+    try:
+        os.makedirs(os.path.dirname(DEVICE_CACHE_FILE), exist_ok=True)
+        temporary = DEVICE_CACHE_FILE + f".{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            cache = {"Key": get_cache_key(), "Time": time.time(), "Devices": names}
+            json.dump(cache, file)
+        os.replace(temporary, DEVICE_CACHE_FILE)
+    except OSError:
+        # The cache is only an optimization, so failing to write it is not an error
+        pass
+
 
 ########################################################################################################################
 # RENDER DEVICE FUNCTIONS
@@ -28,12 +126,13 @@ def find_render_devices() -> dict:
     """
 
     # Use the global variable to store the render devices
-    global RENDER_DEVICES
+    global RENDER_DEVICES, DEVICE_SOURCE
 
     # Get the preferences and devices
     preferences = bpy.context.preferences
     cycles_preferences = preferences.addons["cycles"].preferences
-    cycles_preferences.refresh_devices()
+    with render_profiler.stage("find_render_devices"):
+        cycles_preferences.refresh_devices()
     devices = list(cycles_preferences.devices)
 
     # Organize the devices by type
@@ -42,11 +141,73 @@ def find_render_devices() -> dict:
         "CUDA": [x for x in devices if str(x.type) == "CUDA"],
         "CPU": [x for x in devices if str(x.type) == "CPU"],
     }
+    DEVICE_SOURCE = "probe"
+
+    # Cache the names of the render devices for later processes
+    save_cached_devices(get_render_device_names())
 
     # Return the render devices
     return RENDER_DEVICES
 
 
+def get_render_device_names() -> dict:
+    """
+    Get the names of the found render devices organized by type
+    :return: The device names organized by type
+    """
+    assert RENDER_DEVICES is not None
+    return {key: [x.name for x in value] for key, value in RENDER_DEVICES.items()}
+
+
+def set_cached_render_device():
+    """
+    Sets the render device from the device cache, only querying the devices of the cached device type instead of
+    probing every type
+    :return: The render engine and device, or None if the cache is missing, expired or no longer matches the devices
+    """
+    global RENDER_DEVICES, DEVICE_SOURCE
+
+    if REFRESH_DEVICES:
+        return None
+
+    names = load_cached_devices()
+    if names is None:
+        return None
+
+    device_type = next((x for x in DEVICE_TYPES if len(names.get(x, [])) != 0), None)
+    if device_type is None:
+        return None
+
+    # The CPU path renders with Eevee, which does not need the Cycles devices at all
+    if device_type == "CPU":
+        bpy.context.scene.render.engine = "BLENDER_EEVEE_NEXT"
+        DEVICE_SOURCE = "cache"
+        return "BLENDER_EEVEE_NEXT", "CPU"
+
+    # Only query the cached device type, and fall back to a full probe if its devices have gone
+    cycles_preferences = bpy.context.preferences.addons["cycles"].preferences
+    with render_profiler.stage("find_render_devices"):
+        devices = [
+            x
+            for x in cycles_preferences.get_devices_for_type(device_type)
+            if str(x.type) == device_type
+        ]
+    if len(devices) == 0:
+        return None
+
+    cycles_preferences.compute_device_type = device_type
+    bpy.context.scene.render.engine = "CYCLES"
+    bpy.context.scene.cycles.device = "GPU"
+    for gpu in devices:
+        gpu.use = True
+
+    # Only the devices of the cached type are known without a full probe
+    RENDER_DEVICES = {x: [] for x in DEVICE_TYPES}
+    RENDER_DEVICES[device_type] = devices
+    DEVICE_SOURCE = "cache"
+    return "CYCLES", device_type
+
+
 def set_render_device():
     """
     Sets the render device(s) to used, taking priority of OptiX, then CUDA, then CPU.
@@ -54,6 +215,11 @@ def set_render_device():
 
     # Check if the render devices have been found
     if RENDER_DEVICES is None:
+        # Use the cached device choice if there is one, to avoid probing every device type
+        device = set_cached_render_device()
+        if device is not None:
+            return device
+
         # Find the render devices if they have not been found
         find_render_devices()
 
@@ -106,26 +272,33 @@ def set_render_device():
         return "BLENDER_EEVEE_NEXT", "CPU"
 
 
-def print_found_render_devices():
+def print_found_render_devices(show_source: bool = False):
     """
     Print the found render devices in a JSON format.
+    :param show_source: Whether to include whether the devices came from the device cache or a fresh probe
     """
+    global DEVICE_SOURCE
 
-    # Check if the render devices have been found
-    if RENDER_DEVICES is None:
-        # Find the render devices if they have not been found
-        find_render_devices()
+    # Use the device cache if it is valid
+    names = None if REFRESH_DEVICES else load_cached_devices()
+    if names is not None:
+        DEVICE_SOURCE = "cache"
 
-    # Ensure the render devices have been found
-    assert RENDER_DEVICES is not None
-    # Ensure the render devices are a dictionary
-    assert type(RENDER_DEVICES) == dict
+    # Otherwise, find the render devices if they have not been found
+    else:
+        if RENDER_DEVICES is None:
+            find_render_devices()
 
-    # Create a dictionary of the render device names
-    names = dict()
-    # Get the names of the render devices
-    for key, value in RENDER_DEVICES.items():
-        names[key] = [x.name for x in value]
+        # Ensure the render devices have been found
+        assert RENDER_DEVICES is not None
+        # Ensure the render devices are a dictionary
+        assert type(RENDER_DEVICES) == dict
+
+        # Get the names of the render devices
+        names = get_render_device_names()
+
+    if show_source:
+        names = dict(names, Source=DEVICE_SOURCE)
 
     # Convert the dictionary to a JSON string
     devices_json = json.dumps(names, indent=4)
@@ -137,5 +310,8 @@ def print_found_render_devices():
 # MAIN
 ########################################################################################################################
 if __name__ == "__main__":
+    arguments = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    REFRESH_DEVICES = "--refresh-devices" in arguments
+
     # Find and print the render devices
-    print_found_render_devices()
+    print_found_render_devices("--show-source" in arguments)
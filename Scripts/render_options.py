@@ -0,0 +1,282 @@
+########################################################################################################################
+# render_options.py
+#
+# This script is used to validate render options before any work is done with them. Every problem with a job is
+# collected in one pass over its JSON, and model files are checked to exist, so a malformed job fails in milliseconds
+# instead of with a KeyError after its model has been imported. It only uses the standard library, so the runners that
+# are started with a regular Python interpreter can check jobs before queueing them.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The keys of a position, in the order of the Position class
+POSITION_KEYS = ("X", "Y", "Z", "Rx", "Ry", "Rz")
+
+# The number of values of a row of the compact "LightArray" option, [Power, Size, R, G, B, X, Y, Z, Rx, Ry, Rz]
+LIGHT_ARRAY_LENGTH = 11
+
+
+########################################################################################################################
+# OPTIONS ERROR
+########################################################################################################################
+class OptionsError(ValueError):
+    """
+    An error raised when render options do not match the schema, listing every problem that was found.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+########################################################################################################################
+# COLOUR FUNCTIONS
+########################################################################################################################
+def parse_colour(colour: Union[str, Sequence[int]]) -> Tuple[int, int, int, int]:
+    """
+    Parse an sRGB colour of 0-255 values
+    :param colour: Either a "r,g,b,a" or "r,g,b" string, or a sequence of three or four values
+    :return: The red, green, blue and alpha values, the alpha is 255 if it is not given
+    :raises ValueError: If the colour does not have three or four whole values from 0 to 255
+    """
+    values = colour.split(",") if isinstance(colour, str) else list(colour)
+    if len(values) not in (3, 4):
+        raise ValueError(f"{colour!r} is not an r,g,b or r,g,b,a colour")
+    channels = tuple(int(x) for x in values)
+    if any(x < 0 or x > 255 for x in channels):
+        raise ValueError(f"{colour!r} has values outside 0-255")
+    return channels + (255,) * (4 - len(channels))
+
+
+########################################################################################################################
+# VALIDATION FUNCTIONS
+########################################################################################################################
+def is_number(value) -> bool:
+    """
+    Check if a JSON value is a number, which booleans are not even though Python treats them as integers
+    :param value: The value
+    :return: True if the value is an integer or a float, otherwise False
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_number(
+    errors: List[str],
+    data: dict,
+    key: str,
+    path: str,
+    required: bool = True,
+    minimum: Optional[float] = None,
+    integer: bool = False,
+) -> None:
+    """
+    Check a numeric option, recording a problem if it is missing or invalid
+    :param errors: The list the problems are added to
+    :param data: The dictionary holding the option
+    :param key: The key of the option
+    :param path: The path of the dictionary in the options, used to name the option in the problem
+    :param required: Whether the option must be given
+    :param minimum: The smallest value the option may have, may be None
+    :param integer: Whether the option must be a whole number
+    :return: None
+    """
+    name = f"{path}.{key}" if path else key
+    if key not in data:
+        if required:
+            errors.append(f"{name} is missing")
+        return
+    value = data[key]
+    if not is_number(value) or (integer and not isinstance(value, int)):
+        errors.append(f"{name} must be {'an integer' if integer else 'a number'}")
+    elif minimum is not None and value < minimum:
+        errors.append(f"{name} must be at least {minimum}")
+
+
+def check_position(
+    errors: List[str], position, path: str, partial: bool = False
+) -> None:
+    """
+    Check a position, recording a problem for every invalid coordinate or rotation
+    :param errors: The list the problems are added to
+    :param position: The position, a dictionary with the keys X, Y, Z, Rx, Ry and Rz
+    :param path: The path of the position in the options
+    :param partial: Whether keys may be left out, for positions whose missing keys default to zero
+    :return: None
+    """
+    if not isinstance(position, dict):
+        errors.append(f"{path} must be an object")
+        return
+    for key in POSITION_KEYS:
+        check_number(errors, position, key, path, required=not partial)
+
+
+def check_colour(errors: List[str], colour, path: str) -> None:
+    """
+    Check an sRGB colour, recording a problem if it cannot be parsed
+    :param errors: The list the problems are added to
+    :param colour: The colour
+    :param path: The path of the colour in the options
+    :return: None
+    """
+    if colour is None:
+        errors.append(f"{path} is missing")
+        return
+    try:
+        parse_colour(colour)
+    except (ValueError, TypeError) as e:
+        errors.append(f"{path}: {e}")
+
+
+def check_model(errors: List[str], model, path: str, check_files: bool) -> None:
+    """
+    Check the path of a model, recording a problem if it is not a string or does not exist
+    :param errors: The list the problems are added to
+    :param model: The path of the model
+    :param path: The path of the option in the options
+    :param check_files: Whether to check that the model file exists
+    :return: None
+    """
+    if not isinstance(model, str):
+        errors.append(f"{path} must be a path")
+    elif check_files and not os.path.isfile(model):
+        errors.append(f"{path} {model!r} does not exist")
+
+
+def check_list(errors: List[str], data: dict, key: str) -> list:
+    """
+    Check that an optional option is a list
+    :param errors: The list the problems are added to
+    :param data: The render options
+    :param key: The key of the option
+    :return: The entries of the list, empty if the option is missing or invalid
+    """
+    value = data.get(key, [])
+    if not isinstance(value, list):
+        errors.append(f"{key} must be a list")
+        return []
+    return value
+
+
+def get_option_errors(data: dict, check_files: bool = True) -> List[str]:
+    """
+    Check render options against the schema shared by every job: the model or assembly, the unit, the output
+    directory, the resolution, the camera, the background colour, the lights and the views. Feature options, such as
+    "Atlas" or "Tiles", are checked where they are used.
+    :param data: The render options
+    :param check_files: Whether to check that the model files exist
+    :return: A description of every problem, empty if the options are valid
+    """
+    if not isinstance(data, dict):
+        return ["The options must be an object"]
+
+    errors = []
+    for key in ("Name", "OutputDirectory"):
+        if not isinstance(data.get(key), str):
+            errors.append(f"{key} must be a string")
+    check_number(errors, data, "Unit", "", minimum=0)
+
+    # An assembly of parts takes the place of a single model
+    if "Models" in data:
+        parts = check_list(errors, data, "Models")
+        if isinstance(data["Models"], list) and len(parts) == 0:
+            errors.append("Models must not be empty")
+        for index, part in enumerate(parts):
+            path = f"Models[{index}]"
+            if not isinstance(part, dict):
+                errors.append(f"{path} must be an object")
+                continue
+            check_model(errors, part.get("Model"), f"{path}.Model", check_files)
+            check_number(errors, part, "Unit", path, required=False, minimum=0)
+            check_number(errors, part, "Scale", path, required=False)
+            if "Position" in part:
+                check_position(errors, part["Position"], f"{path}.Position", True)
+    else:
+        check_model(errors, data.get("Model"), "Model", check_files)
+
+    resolution = data.get("Resolution")
+    if isinstance(resolution, dict):
+        for key in ("Width", "Height", "Scale"):
+            check_number(errors, resolution, key, "Resolution", minimum=1, integer=True)
+    else:
+        errors.append("Resolution must be an object")
+
+    camera = data.get("Camera")
+    if isinstance(camera, dict):
+        check_number(errors, camera, "Distance", "Camera")
+        # The camera position is only used when the views are not listed
+        if "Views" not in data or "Position" in camera:
+            check_position(errors, camera.get("Position"), "Camera.Position")
+    else:
+        errors.append("Camera must be an object")
+
+    check_colour(errors, data.get("BackgroundColour"), "BackgroundColour")
+
+    for index, light in enumerate(check_list(errors, data, "Lights")):
+        path = f"Lights[{index}]"
+        if not isinstance(light, dict):
+            errors.append(f"{path} must be an object")
+            continue
+        check_number(errors, light, "Power", path, minimum=0)
+        check_number(errors, light, "Size", path, minimum=0)
+        check_position(errors, light.get("Position"), f"{path}.Position")
+        check_colour(errors, light.get("Colour"), f"{path}.Colour")
+
+    for index, row in enumerate(check_list(errors, data, "LightArray")):
+        path = f"LightArray[{index}]"
+        if not isinstance(row, list) or len(row) != LIGHT_ARRAY_LENGTH:
+            errors.append(f"{path} must be a list of {LIGHT_ARRAY_LENGTH} numbers")
+        elif not all(is_number(x) for x in row):
+            errors.append(f"{path} must only contain numbers")
+        else:
+            check_colour(errors, row[2:5], path)
+
+    for index, view in enumerate(check_list(errors, data, "Views")):
+        path = f"Views[{index}]"
+        if not isinstance(view, dict):
+            errors.append(f"{path} must be an object")
+            continue
+        if "Name" in view and not isinstance(view["Name"], str):
+            errors.append(f"{path}.Name must be a string")
+        check_position(errors, view.get("Position"), f"{path}.Position")
+
+    check_number(errors, data, "Threads", "", required=False, minimum=0, integer=True)
+    # The noise is measured on the noisy image Cycles stores before denoising, which the pixels captured for thumbnails
+    # would then also come from, so the delivered image stays denoised but the two cannot be combined
+    sampling = data.get("Sampling", dict())
+    if not isinstance(sampling, dict):
+        errors.append("Sampling must be an object")
+    elif not isinstance(sampling.get("MeasureNoise", False), bool):
+        errors.append("Sampling.MeasureNoise must be true or false")
+    elif sampling.get("MeasureNoise", False):
+        output = data.get("Output", dict())
+        if isinstance(output, dict) and output.get("Thumbnails"):
+            errors.append(
+                "Sampling.MeasureNoise cannot be combined with Output.Thumbnails"
+            )
+
+    for key in ("SaveBlenderFile", "Profile"):
+        if not isinstance(data.get(key, False), bool):
+            errors.append(f"{key} must be true or false")
+    return errors
+
+
+def check_options(data: dict, check_files: bool = True) -> None:
+    """
+    Check render options against the schema, before any expensive work is done with them
+    :param data: The render options
+    :param check_files: Whether to check that the model files exist
+    :return: None
+    :raises OptionsError: If the options are invalid
+    """
+    errors = get_option_errors(data, check_files)
+    if len(errors) != 0:
+        raise OptionsError(errors)
@@ -0,0 +1,262 @@
+########################################################################################################################
+# render_parallel.py
+#
+# This script is used to render a multi-view job with several Blender processes at once. The views are split across N
+# workers, each of which loads the model once and renders its share of the views with a fixed number of threads. It is
+# run with a regular Python interpreter rather than inside Blender.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The path to the render script that is run by every worker
+RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render.py")
+
+# Serializes the status lines printed by the worker threads
+PRINT_LOCK = threading.Lock()
+
+# The number of lines at the end of the output of a failed worker that are kept in its report
+OUTPUT_TAIL_LINES = 40
+
+# The options that render a job as a whole rather than view by view, so their jobs cannot be split into shards
+UNSPLITTABLE_OPTIONS = ["Atlas", "Turntable", "Tiles"]
+
+
+########################################################################################################################
+# SHARDING FUNCTIONS
+########################################################################################################################
+def get_views(data: dict) -> List[dict]:
+    """
+    Get the views of a job in the same form as the "Views" array, treating a single-view job as one view
+    :param data: The render options
+    :return: A list of views with the keys Name and Position
+    """
+    if "Views" in data:
+        return [
+            dict(view, Name=view.get("Name", f"{data['Name']}-{index}"))
+            for index, view in enumerate(data["Views"])
+        ]
+    return [{"Name": data["Name"], "Position": data["Camera"]["Position"]}]
+
+
+def check_splittable(data: dict) -> None:
+    """
+    Check that the views of a job can be rendered independently of each other. Every shard of an atlas would write the
+    same sheet with only its own views, and a turntable or a tiled render would be rendered in full by every worker.
+    :param data: The render options
+    :return: None
+    :raises ValueError: If the job uses an option that renders it as a whole
+    """
+    # render.py renders an atlas or a turntable whenever the key is present, and tiles only when the option is set
+    found = [
+        x for x in UNSPLITTABLE_OPTIONS if (data.get(x) if x == "Tiles" else x in data)
+    ]
+    if len(found) != 0:
+        raise ValueError(
+            f"{', '.join(found)} jobs cannot be split across workers, render them with render.py instead"
+        )
+
+
+def shard_views(views: List[dict], workers: int) -> List[List[dict]]:
+    """
+    Split the views into at most the given number of shards of nearly equal size
+    :param views: The views to split
+    :param workers: The number of workers
+    :return: A list of non-empty shards
+    """
+    shards = [views[i::workers] for i in range(workers)]
+    return [x for x in shards if len(x) != 0]
+
+
+########################################################################################################################
+# WORKER FUNCTIONS
+########################################################################################################################
+def run_worker(
+    index: int,
+    blender: str,
+    manifest: str,
+    quality: str,
+    extra_args: List[str],
+    report: dict,
+) -> None:
+    """
+    Run a Blender worker on a shard manifest, forwarding its per-view status lines and recording its report, along
+    with the end of its output if it fails
+    :param index: The index of the worker
+    :param blender: The path to the Blender executable
+    :param manifest: The path to the shard manifest
+    :param quality: The quality of the render
+    :param extra_args: Extra arguments forwarded to render.py
+    :param report: The dictionary to record the report of the worker in
+    :return: None
+    """
+    start = time.perf_counter()
+    # Blender exits with code 0 when the script raises unless it is told otherwise
+    command = [blender, "-b", "--python-exit-code", "1", "-P", RENDER_SCRIPT, "--"]
+    command += ["--manifest", manifest, "--quality", quality] + extra_args
+
+    views = []
+    output = []
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    for line in process.stdout:
+        if line.startswith("[VIEW] "):
+            status = json.loads(line[len("[VIEW] ") :])
+            status["Worker"] = index
+            views.append(status)
+            with PRINT_LOCK:
+                print(f"[VIEW] {json.dumps(status)}", flush=True)
+        else:
+            output.append(line.rstrip("\n"))
+            del output[:-OUTPUT_TAIL_LINES]
+    process.wait()
+
+    report["Worker"] = index
+    report["ExitCode"] = process.returncode
+    report["Views"] = len(views)
+    report["Failed"] = [x["Name"] for x in views if x["Status"] == "failed"]
+    report["Seconds"] = round(time.perf_counter() - start, 3)
+    if process.returncode != 0:
+        report["Output"] = output
+
+
+def render_parallel(
+    data: dict,
+    blender: str,
+    quality: str,
+    workers: int,
+    threads: int,
+    extra_args: List[str],
+) -> List[dict]:
+    """
+    Render the views of a job across several Blender workers and wait for all of them to finish
+    :param data: The render options
+    :param blender: The path to the Blender executable
+    :param quality: The quality of the render
+    :param workers: The number of workers
+    :param threads: The number of render threads of each worker, or 0 to let Blender decide
+    :param extra_args: Extra arguments forwarded to render.py
+    :return: The report of each worker
+    :raises ValueError: If the job cannot be split into shards
+    """
+    check_splittable(data)
+    shards = shard_views(get_views(data), workers)
+    reports = [dict() for _ in shards]
+    threads_list = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for index, shard in enumerate(shards):
+            shard_data = dict(data, Views=shard)
+            if threads != 0:
+                shard_data["Threads"] = threads
+            # Only one worker saves the Blender file, as it would be identical for every shard
+            if index != 0:
+                shard_data["SaveBlenderFile"] = False
+
+            manifest = os.path.join(directory, f"shard-{index}.json")
+            with open(manifest, "w") as file:
+                json.dump(shard_data, file)
+
+            thread = threading.Thread(
+                target=run_worker,
+                args=(index, blender, manifest, quality, extra_args, reports[index]),
+            )
+            thread.start()
+            threads_list.append(thread)
+
+        for thread in threads_list:
+            thread.join()
+
+    return reports
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the views of a job across several Blender processes. Unknown arguments are forwarded to "
+        "render.py."
+    )
+    parser.add_argument(
+        "--blender", type=str, default="blender", help="Path to the Blender executable"
+    )
+    parser.add_argument("--options", type=str, help="Options for rendering")
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Path to a JSON file of options for rendering, used instead of --options",
+    )
+    parser.add_argument(
+        "--quality",
+        type=str,
+        default="normal",
+        help="The quality of the render, either 'preview' or 'normal'",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="The number of Blender processes"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="The number of render threads per process, defaults to the CPU count divided by the number of workers",
+    )
+    args, extra = parser.parse_known_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.manifest is not None:
+        with open(args.manifest, "r") as file:
+            options = json.load(file)
+    else:
+        options = json.loads(args.options)
+
+    try:
+        check_splittable(options)
+    except ValueError as e:
+        parser.error(str(e))
+
+    thread_count = args.threads
+    if thread_count is None:
+        thread_count = max(1, (os.cpu_count() or 1) // args.workers)
+
+    start_time = time.perf_counter()
+    worker_reports = render_parallel(
+        options, args.blender, args.quality, args.workers, thread_count, extra
+    )
+
+    print(
+        "[REPORT] "
+        + json.dumps(
+            {
+                "Workers": worker_reports,
+                "Threads": thread_count,
+                "Seconds": round(time.perf_counter() - start_time, 3),
+            }
+        ),
+        flush=True,
+    )
+
+    # Exit with the same code a single render.py process would, 1 if any view failed
+    if any(x["ExitCode"] != 0 for x in worker_reports):
+        sys.exit(1)
@@ -0,0 +1,136 @@
+########################################################################################################################
+# render_profiler.py
+#
+# This script is used to record the wall and CPU time spent in each stage of a render, along with the peak memory of
+# the process, so that slow jobs can be attributed to the stage that made them slow.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    # The resource module is not available on Windows
+    resource = None
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The recorded stages in the order they finished, each with the keys Stage, Depth, Wall and CPU
+STAGES = []
+
+# The number of stages the code currently runs inside of, the depth of a top-level stage is 0
+DEPTH = 0
+
+# The innermost stage the last exception was raised in, and the exception
+LAST_FAILURE = None
+
+
+########################################################################################################################
+# PROFILING FUNCTIONS
+########################################################################################################################
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Record the wall and CPU time spent in a block of code as a named stage, along with how deeply it is nested in other
+    stages
+    :param name: The name of the stage
+    :return: None
+    """
+    global LAST_FAILURE, DEPTH
+
+    depth = DEPTH
+    DEPTH += 1
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    except BaseException as e:
+        # Only the innermost stage records the exception as it passes through the enclosing stages
+        if LAST_FAILURE is None or LAST_FAILURE[1] is not e:
+            LAST_FAILURE = (name, e)
+        raise
+    finally:
+        DEPTH = depth
+        STAGES.append(
+            {
+                "Stage": name,
+                "Depth": depth,
+                "Wall": time.perf_counter() - wall_start,
+                "CPU": time.process_time() - cpu_start,
+            }
+        )
+
+
+def get_failed_stage(error: BaseException) -> Optional[str]:
+    """
+    Get the stage an exception was raised in
+    :param error: The exception
+    :return: The name of the innermost stage the exception was raised in, or None if it was raised outside every stage
+    """
+    if LAST_FAILURE is not None and LAST_FAILURE[1] is error:
+        return LAST_FAILURE[0]
+    return None
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+    Get the peak resident set size of the process
+    :return: The peak resident set size in bytes, or None if it cannot be measured on this platform
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the peak in kilobytes, macOS in bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_report() -> dict:
+    """
+    Get the recorded stages, summed per stage name in the order they first finished, and the peak memory. The
+    TopLevelWall of a stage only sums the times it ran outside every other stage, so the top-level times can be added
+    up without counting nested stages twice.
+    :return: The profiling report
+    """
+    stages = dict()
+    for record in STAGES:
+        total = stages.setdefault(
+            record["Stage"],
+            {
+                "Stage": record["Stage"],
+                "Count": 0,
+                "Wall": 0,
+                "TopLevelWall": 0,
+                "CPU": 0,
+            },
+        )
+        total["Count"] += 1
+        total["Wall"] += record["Wall"]
+        total["CPU"] += record["CPU"]
+        if record["Depth"] == 0:
+            total["TopLevelWall"] += record["Wall"]
+
+    for total in stages.values():
+        for key in ("Wall", "TopLevelWall", "CPU"):
+            total[key] = round(total[key], 4)
+
+    return {"Stages": list(stages.values()), "PeakRSS": get_peak_rss()}
+
+
+def reset() -> None:
+    """
+    Forget the recorded stages, so that the next report only covers the stages recorded from now on
+    :return: None
+    """
+    global DEPTH
+
+    STAGES.clear()
+    DEPTH = 0
@@ -0,0 +1,520 @@
+########################################################################################################################
+# render_queue.py
+#
+# This script is used to render a large catalogue of jobs from a persistent queue. Jobs are stored in a SQLite database
+# with a priority, a timeout and a number of attempts, and are dispatched to a pool of render.py processes, so a crash
+# only fails the job that caused it. Failed jobs are retried a bounded number of times with their error recorded, and
+# a restarted runner resumes the queue without rendering completed jobs again. It is run with a regular Python
+# interpreter rather than inside Blender.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import render_options
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The path to the render script that is run for every job
+RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render.py")
+
+# Serializes the status lines printed by the worker threads
+PRINT_LOCK = threading.Lock()
+
+# The number of lines at the end of the output of a failed job that are kept with its error
+OUTPUT_TAIL_LINES = 40
+
+# The number of seconds between the heartbeats a runner records for the jobs it is rendering
+HEARTBEAT_SECONDS = 30
+
+# The number of seconds without a heartbeat after which a running job is considered abandoned by its runner
+LEASE_SECONDS = 120
+
+# The identity of this runner, recorded on the jobs it claims
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# The columns added to the schema after its first version, which are added to older databases when they are opened
+ADDED_COLUMNS = {"runner": "TEXT", "heartbeat": "REAL"}
+
+# The schema of the queue database
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    options TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    timeout REAL,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    exit_code INTEGER,
+    error TEXT,
+    runner TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, id);
+"""
+
+
+########################################################################################################################
+# DATABASE FUNCTIONS
+########################################################################################################################
+def connect(database: str) -> sqlite3.Connection:
+    """
+    Open the queue database, creating it if it does not exist. Each thread needs its own connection.
+    :param database: The path to the database
+    :return: The connection, in autocommit mode so that transactions are started explicitly
+    """
+    connection = sqlite3.connect(database, timeout=60, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in columns:
+            connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+    return connection
+
+
+def get_job_key(options: dict, quality: str) -> str:
+    """
+    Get the key that identifies a job, so the same job is not queued twice
+    :param options: The render options of the job
+    :param quality: The quality of the render
+    :return: The hex digest of the job
+    """
+    canonical = json.dumps([options, quality], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def add_jobs(
+    connection: sqlite3.Connection,
+    jobs: List[dict],
+    quality: str,
+    priority: int,
+    timeout: Optional[float],
+    retries: int,
+) -> int:
+    """
+    Add jobs to the queue, ignoring jobs that are already queued with the same options and quality
+    :param connection: The queue database
+    :param jobs: The render options of each job
+    :param quality: The quality of the renders
+    :param priority: The priority of the jobs, jobs with a higher priority are rendered first
+    :param timeout: The number of seconds a job may take before it is stopped, or None for no limit
+    :param retries: The number of times a failed job is tried again
+    :return: The number of jobs that were added
+    """
+    added = 0
+    connection.execute("BEGIN IMMEDIATE")
+    for options in jobs:
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO jobs (key, name, options, quality, priority, timeout, max_attempts, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                get_job_key(options, quality),
+                options["Name"],
+                json.dumps(options),
+                quality,
+                priority,
+                timeout,
+                retries + 1,
+                time.time(),
+            ),
+        )
+        added += cursor.rowcount
+    connection.execute("COMMIT")
+    return added
+
+
+def claim_job(connection: sqlite3.Connection) -> Optional[sqlite3.Row]:
+    """
+    Take the queued job with the highest priority, marking it as running and owned by this runner
+    :param connection: The queue database
+    :return: The job, or None if the queue is empty
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    job = connection.execute(
+        "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, id LIMIT 1"
+    ).fetchone()
+    if job is not None:
+        now = time.time()
+        connection.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, runner = ?, heartbeat = ? "
+            "WHERE id = ?",
+            (now, RUNNER_ID, now, job["id"]),
+        )
+    connection.execute("COMMIT")
+    return job
+
+
+def finish_job(
+    connection: sqlite3.Connection,
+    job: sqlite3.Row,
+    exit_code: Optional[int],
+    error: Optional[dict],
+) -> str:
+    """
+    Record the outcome of a job, queueing it again if it failed and has attempts left
+    :param connection: The queue database
+    :param job: The job as it was claimed
+    :param exit_code: The exit code of render.py, or None if it was stopped
+    :param error: The structured error of the job, or None if it completed
+    :return: The new status of the job
+    """
+    if error is None:
+        status = "completed"
+    elif job["attempts"] + 1 < job["max_attempts"]:
+        status = "queued"
+    else:
+        status = "failed"
+
+    connection.execute(
+        "UPDATE jobs SET status = ?, finished = ?, exit_code = ?, error = ? WHERE id = ?",
+        (
+            status,
+            time.time(),
+            exit_code,
+            None if error is None else json.dumps(error),
+            job["id"],
+        ),
+    )
+    return status
+
+
+def record_heartbeat(connection: sqlite3.Connection) -> None:
+    """
+    Renew the lease of every job this runner is rendering
+    :param connection: The queue database
+    :return: None
+    """
+    connection.execute(
+        "UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND runner = ?",
+        (time.time(), RUNNER_ID),
+    )
+
+
+def recover_jobs(connection: sqlite3.Connection) -> int:
+    """
+    Queue the jobs that were left running by a runner that stopped, so that they are rendered again. Only the jobs of
+    this runner and the jobs whose lease ran out are recovered, the jobs of a concurrent runner keep their heartbeat
+    fresh and are left alone.
+    :param connection: The queue database
+    :return: The number of recovered jobs
+    """
+    cursor = connection.execute(
+        "UPDATE jobs SET status = 'queued', runner = NULL WHERE status = 'running' "
+        "AND (runner = ? OR heartbeat IS NULL OR heartbeat < ?)",
+        (RUNNER_ID, time.time() - LEASE_SECONDS),
+    )
+    return cursor.rowcount
+
+
+########################################################################################################################
+# JOB FUNCTIONS
+########################################################################################################################
+def load_jobs(path: str) -> List[dict]:
+    """
+    Load the render options of jobs from a JSON file, which holds either one job or a list of jobs, or from every JSON
+    file in a directory
+    :param path: The path to a JSON file or a directory of JSON files
+    :return: The render options of each job
+    """
+    if os.path.isdir(path):
+        paths = sorted(
+            os.path.join(path, x) for x in os.listdir(path) if x.endswith(".json")
+        )
+    else:
+        paths = [path]
+
+    jobs = []
+    for file_path in paths:
+        with open(file_path, "r") as file:
+            data = json.load(file)
+        jobs.extend(data if isinstance(data, list) else [data])
+    return jobs
+
+
+def run_job(job: sqlite3.Row, blender: str, extra_args: List[str]) -> tuple:
+    """
+    Render a job in its own Blender process
+    :param job: The job
+    :param blender: The path to the Blender executable
+    :param extra_args: Extra arguments forwarded to render.py
+    :return: The exit code of render.py, or None if it timed out, and the structured error, or None if it completed
+    """
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".json", delete=False
+    ) as manifest_file:
+        manifest_file.write(job["options"])
+    # Blender exits with code 0 when the script raises unless it is told otherwise
+    command = [blender, "-b", "--python-exit-code", "1", "-P", RENDER_SCRIPT, "--"]
+    command += ["--manifest", manifest_file.name, "--quality", job["quality"]]
+    command += extra_args
+
+    try:
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            timeout=job["timeout"],
+        )
+        exit_code, output = process.returncode, process.stdout
+    except subprocess.TimeoutExpired as e:
+        exit_code = None
+        # The partial output is given as bytes even in text mode
+        output = e.stdout or ""
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+    finally:
+        os.remove(manifest_file.name)
+
+    failed_views = [
+        x
+        for x in (
+            json.loads(line[len("[VIEW] ") :])
+            for line in output.splitlines()
+            if line.startswith("[VIEW] ")
+        )
+        if x["Status"] == "failed"
+    ]
+    if exit_code == 0 and len(failed_views) == 0:
+        return exit_code, None
+
+    if exit_code is None:
+        kind, message = "timeout", f"Timed out after {job['timeout']} seconds"
+    elif len(failed_views) != 0:
+        kind, message = "view", failed_views[0]["Error"]
+    else:
+        kind, message = "exit", f"render.py exited with code {exit_code}"
+
+    error = {
+        "Type": kind,
+        "Message": message,
+        "Stage": failed_views[0].get("Stage") if failed_views else None,
+        "ExitCode": exit_code,
+        "Views": [
+            {"Name": x["Name"], "Error": x["Error"], "Stage": x.get("Stage")}
+            for x in failed_views
+        ],
+        "Output": output.splitlines()[-OUTPUT_TAIL_LINES:],
+    }
+    return exit_code, error
+
+
+def run_worker(
+    index: int, database: str, blender: str, extra_args: List[str], counts: dict
+) -> None:
+    """
+    Render jobs from the queue until it is empty
+    :param index: The index of the worker
+    :param database: The path to the queue database
+    :param blender: The path to the Blender executable
+    :param extra_args: Extra arguments forwarded to render.py
+    :param counts: The dictionary counting the outcomes of the jobs of every worker
+    :return: None
+    """
+    connection = connect(database)
+    while True:
+        job = claim_job(connection)
+        if job is None:
+            break
+
+        start = time.perf_counter()
+        exit_code, error = run_job(job, blender, extra_args)
+        status = finish_job(connection, job, exit_code, error)
+
+        with PRINT_LOCK:
+            counts[status] = counts.get(status, 0) + 1
+            result = {
+                "Id": job["id"],
+                "Name": job["name"],
+                "Worker": index,
+                "Attempt": job["attempts"] + 1,
+                "Status": status,
+                "Seconds": round(time.perf_counter() - start, 3),
+                "Error": error,
+            }
+            print(f"[JOB] {json.dumps(result)}", flush=True)
+    connection.close()
+
+
+def run_queue(database: str, blender: str, workers: int, extra_args: List[str]) -> dict:
+    """
+    Render every queued job with a pool of workers, first queueing the jobs a stopped runner left running
+    :param database: The path to the queue database
+    :param blender: The path to the Blender executable
+    :param workers: The number of jobs rendered at once
+    :param extra_args: Extra arguments forwarded to render.py
+    :return: The number of jobs of each outcome keyed on their new status, and the number of recovered jobs
+    """
+    connection = connect(database)
+    recovered = recover_jobs(connection)
+
+    counts = dict()
+    threads = [
+        threading.Thread(
+            target=run_worker, args=(i, database, blender, extra_args, counts)
+        )
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Renew the leases of the running jobs until every worker is done, so other runners do not recover them
+    alive = threads
+    while len(alive) != 0:
+        record_heartbeat(connection)
+        alive[0].join(HEARTBEAT_SECONDS)
+        alive = [x for x in alive if x.is_alive()]
+    connection.close()
+    return {"Jobs": counts, "Recovered": recovered}
+
+
+def get_queue_status(connection: sqlite3.Connection) -> dict:
+    """
+    Get the number of jobs of each status and the errors of the failed jobs
+    :param connection: The queue database
+    :return: The status of the queue
+    """
+    counts = {
+        row["status"]: row["count"]
+        for row in connection.execute(
+            "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+        )
+    }
+    failed = [
+        {
+            "Id": row["id"],
+            "Name": row["name"],
+            "Attempts": row["attempts"],
+            "ExitCode": row["exit_code"],
+            "Error": json.loads(row["error"]) if row["error"] else None,
+        }
+        for row in connection.execute(
+            "SELECT * FROM jobs WHERE status = 'failed' ORDER BY id"
+        )
+    ]
+    return {"Counts": counts, "Failed": failed}
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render jobs from a persistent queue with a pool of Blender processes"
+    )
+    parser.add_argument(
+        "--db", type=str, default="render_queue.db", help="Path to the queue database"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add jobs to the queue")
+    add_parser.add_argument(
+        "path", type=str, help="A JSON file of one or more jobs, or a directory of them"
+    )
+    add_parser.add_argument(
+        "--quality",
+        type=str,
+        default="normal",
+        help="The quality of the render, either 'preview' or 'normal'",
+    )
+    add_parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="The priority of the jobs, higher priorities are rendered first",
+    )
+    add_parser.add_argument(
+        "--timeout", type=float, help="The number of seconds a job may take"
+    )
+    add_parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="The number of times a failed job is tried again",
+    )
+
+    run_parser = subparsers.add_parser(
+        "run",
+        help="Render every queued job, unknown arguments are forwarded to render.py",
+    )
+    run_parser.add_argument(
+        "--blender", type=str, default="blender", help="Path to the Blender executable"
+    )
+    run_parser.add_argument(
+        "--workers", type=int, default=1, help="The number of jobs rendered at once"
+    )
+
+    subparsers.add_parser("status", help="Print the status of the queue")
+
+    retry_parser = subparsers.add_parser("retry", help="Queue failed jobs again")
+    retry_parser.add_argument(
+        "--id", type=int, help="The job to queue again, every failed job if not given"
+    )
+
+    args, extra = parser.parse_known_args()
+    if extra and args.command != "run":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.command == "add":
+        # Invalid jobs are reported instead of queued, so they never take up a worker
+        valid, invalid = [], []
+        for options in load_jobs(args.path):
+            errors = render_options.get_option_errors(options)
+            if errors:
+                name = options.get("Name") if isinstance(options, dict) else None
+                invalid.append({"Name": name, "Errors": errors})
+            else:
+                valid.append(options)
+
+        queue = connect(args.db)
+        count = add_jobs(
+            queue, valid, args.quality, args.priority, args.timeout, args.retries
+        )
+        print(json.dumps({"Added": count, "Invalid": invalid}))
+        sys.exit(1 if invalid else 0)
+
+    elif args.command == "run":
+        outcome = run_queue(args.db, args.blender, args.workers, extra)
+        print(f"[REPORT] {json.dumps(outcome)}", flush=True)
+        sys.exit(1 if outcome["Jobs"].get("failed", 0) != 0 else 0)
+
+    elif args.command == "status":
+        print(json.dumps(get_queue_status(connect(args.db)), indent=4))
+
+    elif args.command == "retry":
+        queue = connect(args.db)
+        query = (
+            "UPDATE jobs SET status = 'queued', attempts = 0 WHERE status = 'failed'"
+        )
+        if args.id is not None:
+            cursor = queue.execute(query + " AND id = ?", (args.id,))
+        else:
+            cursor = queue.execute(query)
+        print(json.dumps({"Queued": cursor.rowcount}))
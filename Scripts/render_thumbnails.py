@@ -0,0 +1,577 @@
+########################################################################################################################
+# render_thumbnails.py
+#
+# This script is used to keep preview thumbnails of every model in a directory up to date. The directory is scanned, or
+# watched with inotify where it is available and polled otherwise, and new or changed .stl and .obj files are rendered
+# by a fixed pool of long-lived render.py workers, which clear and import scenes between models instead of restarting
+# Blender. Processed files are recorded in a manifest, so a restarted service skips the work it has already done. It is
+# run with a regular Python interpreter rather than inside Blender.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The path to the render script that is run by every worker
+RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render.py")
+
+# Serializes the status lines printed by the worker threads and the writes of the manifest
+PRINT_LOCK = threading.Lock()
+
+# The extensions of the model files that are given thumbnails
+MODEL_EXTENSIONS = (".stl", ".obj")
+
+# The render options shared by every thumbnail, a top front right view framed automatically and lit from above
+THUMBNAIL_PRESET = {
+    "Camera": {
+        "Distance": 10,
+        "Position": {"X": 10, "Y": -10, "Z": 10, "Rx": 54.74, "Ry": 0, "Rz": 45},
+    },
+    "AutoFrame": True,
+    "LightArray": [
+        [1000, 3, 255, 255, 255, -7.071, -7.071, 10, 45, 0, 315],
+        [800, 3, 255, 255, 255, 7.071, -7.071, 10, 45, 0, 45],
+        [200, 3, 255, 255, 255, -7.071, 7.071, 10, 45, 0, 225],
+    ],
+    "BackgroundColour": "0,0,0,0",
+    "Output": {"Format": "PNG", "ColorMode": "RGBA", "ColorDepth": "8"},
+    "SaveBlenderFile": False,
+    "Quality": "preview",
+}
+
+# The number of seconds a file must go unmodified before it is rendered, so that files still being copied are skipped
+DEFAULT_SETTLE_SECONDS = 2.0
+
+# The number of lines at the end of the output of a crashed worker that are kept with the error
+OUTPUT_TAIL_LINES = 40
+
+# The inotify events that can make a model new or changed, or add a directory to watch
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+########################################################################################################################
+# MANIFEST FUNCTIONS
+########################################################################################################################
+def load_manifest(path: str) -> dict:
+    """
+    Load the manifest of processed models
+    :param path: The path to the manifest
+    :return: The entry of each processed model keyed on its path relative to the watched directory, empty if the
+    manifest does not exist yet
+    """
+    if not os.path.exists(path):
+        return dict()
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """
+    Write the manifest of processed models, replacing the previous manifest atomically so a crash never truncates it
+    :param path: The path to the manifest
+    :param manifest: The entry of each processed model
+    :return: None
+    """
+    temporary = path + f".{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temporary, path)
+
+
+def get_file_state(path: str) -> dict:
+    """
+    Get the size and modification time of a file, which together tell whether it changed since it was processed
+    :param path: The path to the file
+    :return: A dictionary with the keys Size and Modified, the modification time in nanoseconds
+    """
+    stat = os.stat(path)
+    return {"Size": stat.st_size, "Modified": stat.st_mtime_ns}
+
+
+def walk_directory(directory: str, exclude: Optional[str] = None):
+    """
+    Walk a directory tree, leaving out a directory inside it such as the output directory of the thumbnails
+    :param directory: The directory to walk
+    :param exclude: The directory to leave out along with everything below it, may be None
+    :return: An iterator of (directory, file names) pairs
+    """
+    exclude = os.path.abspath(exclude) if exclude is not None else None
+    for root, directories, files in os.walk(directory):
+        directories[:] = [
+            x for x in directories if os.path.abspath(os.path.join(root, x)) != exclude
+        ]
+        yield root, files
+
+
+def get_changed_models(
+    directory: str,
+    manifest: dict,
+    attempted: dict,
+    settle: float,
+    exclude: Optional[str] = None,
+) -> Tuple[List[Tuple[str, dict]], bool]:
+    """
+    Find the models in a directory that are new or changed since they were processed
+    :param directory: The directory of models, searched recursively
+    :param manifest: The entry of each processed model
+    :param attempted: The file state of each model that already failed in this run, which is not tried again until it
+    changes
+    :param settle: The number of seconds a file must go unmodified before it is returned
+    :param exclude: A directory inside the directory of models that is not searched, may be None
+    :return: A list of (relative path, file state) pairs of the models to render, and whether any other changed model
+    is still being modified
+    """
+    changed = []
+    unsettled = False
+    now = time.time_ns()
+    for root, files in walk_directory(directory, exclude):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith(MODEL_EXTENSIONS):
+                continue
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, directory)
+            try:
+                state = get_file_state(path)
+            except FileNotFoundError:
+                continue
+
+            entry = manifest.get(relative, dict())
+            done = entry.get("Status") == "done" and entry.get("State") == state
+            if done or attempted.get(relative) == state:
+                continue
+            if now - state["Modified"] < settle * 1e9:
+                unsettled = True
+                continue
+            changed.append((relative, state))
+    return changed, unsettled
+
+
+########################################################################################################################
+# WATCHER CLASS
+########################################################################################################################
+class InotifyWatcher:
+    """
+    Wait for files to be written or moved into a directory tree with inotify, so changes are picked up without
+    polling. Directories created after the watcher are watched from the next call to wait.
+    """
+
+    def __init__(self, directory: str, exclude: Optional[str] = None):
+        """
+        Start watching a directory tree
+        :param directory: The directory to watch
+        :param exclude: A directory inside the tree that is not watched, may be None
+        :raises OSError: If inotify is not available
+        """
+        self.directory = directory
+        self.exclude = exclude
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watched = set()
+        self.add_watches()
+
+    def add_watches(self) -> None:
+        """
+        Watch every directory of the tree that is not watched yet
+        :return: None
+        """
+        for root, _ in walk_directory(self.directory, self.exclude):
+            if root in self.watched:
+                continue
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if self.libc.inotify_add_watch(self.fd, os.fsencode(root), mask) >= 0:
+                self.watched.add(root)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for a change in the directory tree
+        :param timeout: The maximum number of seconds to wait
+        :return: True if anything changed, otherwise False
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # The events only wake the service up, the next scan finds what changed
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        self.add_watches()
+        return True
+
+    def close(self) -> None:
+        """
+        Stop watching the directory tree
+        :return: None
+        """
+        os.close(self.fd)
+
+
+def create_watcher(
+    directory: str, exclude: Optional[str] = None
+) -> Optional[InotifyWatcher]:
+    """
+    Watch a directory tree with inotify if the platform supports it
+    :param directory: The directory to watch
+    :param exclude: A directory inside the tree that is not watched, may be None
+    :return: The watcher, or None if the directory has to be polled instead
+    """
+    try:
+        return InotifyWatcher(directory, exclude)
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+########################################################################################################################
+# WORKER CLASS
+########################################################################################################################
+class BlenderWorker:
+    """
+    A long-lived render.py worker that is sent one JSON job per line and answers each with a [RESULT] line. The worker
+    is started on the first job and started again after it crashes.
+    """
+
+    def __init__(self, blender: str, extra_args: List[str]):
+        """
+        Create a worker, without starting Blender yet
+        :param blender: The path to the Blender executable
+        :param extra_args: Extra arguments forwarded to render.py
+        """
+        # Blender exits with code 0 when the script raises unless it is told otherwise
+        self.command = [blender, "-b", "--python-exit-code", "1", "-P", RENDER_SCRIPT]
+        self.command += ["--", "--worker"]
+        self.command += ["--quality", "preview"] + extra_args
+        self.process = None
+
+    def render(self, options: dict) -> dict:
+        """
+        Run a job on the worker and wait for its result
+        :param options: The render options of the job
+        :return: The result of the job, with an error and the last lines of output if the worker crashed
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+                bufsize=1,
+            )
+
+        output = []
+        try:
+            self.process.stdin.write(json.dumps(options) + "\n")
+            self.process.stdin.flush()
+            for line in self.process.stdout:
+                if line.startswith("[RESULT] "):
+                    return json.loads(line[len("[RESULT] ") :])
+                output.append(line.rstrip("\n"))
+                del output[:-OUTPUT_TAIL_LINES]
+        except BrokenPipeError:
+            pass
+
+        # The worker exited before answering, the next job starts a new one
+        exit_code = self.process.wait()
+        self.process = None
+        return {
+            "Error": f"The Blender worker exited with code {exit_code}",
+            "Output": output,
+        }
+
+    def close(self) -> None:
+        """
+        Shut the worker down, killing it if it does not exit in time
+        :return: None
+        """
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write(json.dumps({"Command": "shutdown"}) + "\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=30)
+        except (BrokenPipeError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+########################################################################################################################
+# SERVICE FUNCTIONS
+########################################################################################################################
+def get_thumbnail_name(relative: str) -> str:
+    """
+    Get the name of the thumbnail of a model, which keeps the extension so that models differing only by it do not
+    share a thumbnail
+    :param relative: The path of the model relative to the watched directory
+    :return: The name of the thumbnail without its file extension
+    """
+    return relative.replace(os.sep, "__").replace("/", "__")
+
+
+def get_thumbnail_options(
+    model_path: str, name: str, output: str, size: int, unit: float
+) -> dict:
+    """
+    Get the render options of the thumbnail of a model
+    :param model_path: The path to the model
+    :param name: The name of the thumbnail
+    :param output: The directory the thumbnails are written to
+    :param size: The width and height of the thumbnail in pixels
+    :param unit: The scale of the model relative to meters
+    :return: The render options
+    """
+    return dict(
+        THUMBNAIL_PRESET,
+        Name=name,
+        Model=os.path.abspath(model_path),
+        Unit=unit,
+        OutputDirectory=os.path.abspath(output),
+        Resolution={"Width": size, "Height": size, "Scale": 100},
+    )
+
+
+def run_worker(
+    index: int,
+    worker: BlenderWorker,
+    jobs: queue.Queue,
+    manifest: dict,
+    manifest_path: str,
+    attempted: dict,
+    counts: dict,
+) -> None:
+    """
+    Render thumbnails from the job queue until it is given None, recording each outcome in the manifest
+    :param index: The index of the worker
+    :param worker: The Blender worker
+    :param jobs: The queue of (relative path, file state, render options) jobs
+    :param manifest: The entry of each processed model
+    :param manifest_path: The path to the manifest
+    :param attempted: The file state of each model that failed in this run
+    :param counts: The dictionary counting the outcomes of the jobs of every worker
+    :return: None
+    """
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        relative, state, options = job
+
+        start = time.perf_counter()
+        result = worker.render(options)
+        paths = result.get("Paths") or []
+        error = result.get("Error")
+        if error is None and len(paths) == 0:
+            error = "No thumbnail was rendered"
+        status = "done" if error is None else "failed"
+
+        entry = {
+            "State": state,
+            "Status": status,
+            "Thumbnail": paths[0] if paths else None,
+            "Seconds": round(time.perf_counter() - start, 3),
+            "Error": error,
+        }
+        with PRINT_LOCK:
+            manifest[relative] = entry
+            if status == "failed":
+                attempted[relative] = state
+            save_manifest(manifest_path, manifest)
+            counts[status] = counts.get(status, 0) + 1
+            status_line = dict(entry, Model=relative, Worker=index)
+            if "Output" in result:
+                status_line["Output"] = result["Output"]
+            print(f"[THUMBNAIL] {json.dumps(status_line)}", flush=True)
+
+
+def run_service(
+    directory: str,
+    output: str,
+    manifest_path: str,
+    blender: str,
+    workers: int,
+    size: int,
+    unit: float,
+    watch: bool,
+    interval: float,
+    settle: float,
+    extra_args: List[str],
+) -> dict:
+    """
+    Render the thumbnails of the new and changed models in a directory with a pool of long-lived workers, then either
+    return or keep watching the directory for more
+    :param directory: The directory of models
+    :param output: The directory the thumbnails are written to
+    :param manifest_path: The path to the manifest of processed models
+    :param blender: The path to the Blender executable
+    :param workers: The number of Blender workers
+    :param size: The width and height of the thumbnails in pixels
+    :param unit: The scale of the models relative to meters
+    :param watch: Whether to keep watching the directory until interrupted
+    :param interval: The number of seconds between scans when the directory is polled
+    :param settle: The number of seconds a file must go unmodified before it is rendered
+    :param extra_args: Extra arguments forwarded to render.py
+    :return: The number of thumbnails of each outcome, and whether the directory was watched with inotify
+    """
+    os.makedirs(output, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+    attempted = dict()
+    counts = dict()
+    jobs = queue.Queue()
+    # The models that are queued or rendering, with the file state they were queued with
+    queued = dict()
+
+    pool = [BlenderWorker(blender, extra_args) for _ in range(workers)]
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(i, x, jobs, manifest, manifest_path, attempted, counts),
+        )
+        for i, x in enumerate(pool)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # The thumbnails and the manifest are written inside the directory by default, which must not wake the service up
+    watcher = create_watcher(directory, output) if watch else None
+    try:
+        while True:
+            with PRINT_LOCK:
+                changed, unsettled = get_changed_models(
+                    directory, manifest, attempted, settle, output
+                )
+            for relative, state in changed:
+                # Models leave the changed list once their outcome is recorded, so this only skips unfinished ones
+                if queued.get(relative) == state:
+                    continue
+                queued[relative] = state
+                options = get_thumbnail_options(
+                    os.path.join(directory, relative),
+                    get_thumbnail_name(relative),
+                    output,
+                    size,
+                    unit,
+                )
+                jobs.put((relative, state, options))
+
+            if not watch:
+                # Wait for the files that are still being written before stopping
+                if not unsettled:
+                    break
+                time.sleep(settle)
+            elif watcher is not None:
+                watcher.wait(settle if unsettled else interval)
+            else:
+                time.sleep(settle if unsettled else interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _ in threads:
+            jobs.put(None)
+        for thread in threads:
+            thread.join()
+        for worker in pool:
+            worker.close()
+        if watcher is not None:
+            watcher.close()
+
+    return {"Thumbnails": counts, "Inotify": watcher is not None}
+
+
+########################################################################################################################
+# MAIN
+########################################################################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render preview thumbnails of the new and changed models in a directory with a pool of Blender "
+        "workers. Unknown arguments are forwarded to render.py."
+    )
+    parser.add_argument("directory", type=str, help="The directory of models")
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="The directory the thumbnails are written to, defaults to 'thumbnails' in the directory of models",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Path to the manifest of processed models, defaults to 'thumbnails.json' in the output directory",
+    )
+    parser.add_argument(
+        "--blender", type=str, default="blender", help="Path to the Blender executable"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="The number of Blender workers"
+    )
+    parser.add_argument(
+        "--size", type=int, default=256, help="The width and height of the thumbnails"
+    )
+    parser.add_argument(
+        "--unit",
+        type=float,
+        default=1,
+        help="The scale of the models relative to meters",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep watching the directory for new and changed models until interrupted",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=10,
+        help="The number of seconds between scans when inotify is not available",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help="The number of seconds a model must go unmodified before it is rendered",
+    )
+    args, extra = parser.parse_known_args()
+
+    output_directory = args.output or os.path.join(args.directory, "thumbnails")
+    start_time = time.perf_counter()
+    outcome = run_service(
+        args.directory,
+        output_directory,
+        args.manifest or os.path.join(output_directory, "thumbnails.json"),
+        args.blender,
+        args.workers,
+        args.size,
+        args.unit,
+        args.watch,
+        args.interval,
+        args.settle,
+        extra,
+    )
+    outcome["Seconds"] = round(time.perf_counter() - start_time, 3)
+    print(f"[REPORT] {json.dumps(outcome)}", flush=True)
+
+    # Exit with 1 if any thumbnail failed, like render.py does for failed views
+    sys.exit(1 if outcome["Thumbnails"].get("failed", 0) != 0 else 0)
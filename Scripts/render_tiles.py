@@ -0,0 +1,352 @@
+########################################################################################################################
+# render_tiles.py
+#
+# This script is used to split a high resolution render into tiles and to stitch the rendered tiles back into a single
+# PNG. The tiles are written by Blender as uncompressed TIFF files, which are memory-mapped and streamed into the PNG
+# one row at a time, so the memory used for stitching does not grow with the height of the image.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import json
+import os
+import struct
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The TIFF tags needed to locate the pixels of an uncompressed TIFF file
+TIFF_TAGS = {
+    256: "Width",
+    257: "Height",
+    258: "BitsPerSample",
+    259: "Compression",
+    273: "StripOffsets",
+    277: "SamplesPerPixel",
+    279: "StripByteCounts",
+    338: "ExtraSamples",
+}
+
+# The struct format of each TIFF field type that the tags above can have
+TIFF_TYPES = {1: "B", 3: "H", 4: "I"}
+
+# The value of the ExtraSamples tag for an alpha channel that is premultiplied
+ASSOCIATED_ALPHA = 1
+
+# The PNG colour type of each number of channels
+PNG_COLOUR_TYPES = {3: 2, 4: 6}
+
+# The number of compressed bytes buffered before a PNG data chunk is written
+PNG_CHUNK_SIZE = 1 << 20
+
+
+########################################################################################################################
+# TILE FUNCTIONS
+########################################################################################################################
+def get_tiles(width: int, height: int, size: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Split an image into tiles of at most the given size, row by row from the top left corner
+    :param width: The width of the image in pixels
+    :param height: The height of the image in pixels
+    :param size: The maximum width and height of a tile in pixels
+    :return: A list of (x, y, width, height) tiles, where y is measured from the top of the image
+    """
+    return [
+        (x, y, min(size, width - x), min(size, height - y))
+        for y in range(0, height, size)
+        for x in range(0, width, size)
+    ]
+
+
+def get_signature_path(tile_path: str) -> str:
+    """
+    Get the path to the sidecar file that records what a tile was rendered with
+    :param tile_path: The path to the TIFF file of the tile
+    :return: The path to the JSON sidecar file next to the tile
+    """
+    return os.path.splitext(tile_path)[0] + ".json"
+
+
+def write_tile_signature(tile_path: str, signature: str) -> None:
+    """
+    Record what a tile was rendered with, once the tile has been written, so that a tile left behind by an interrupted
+    render has no sidecar and is rendered again
+    :param tile_path: The path to the TIFF file of the tile
+    :param signature: The hash of what the tile was rendered with
+    :return: None
+    """
+    sidecar_path = get_signature_path(tile_path)
+    temporary = sidecar_path + f".{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump({"Signature": signature}, file)
+    os.replace(temporary, sidecar_path)
+
+
+def is_tile_current(tile_path: str, signature: str) -> bool:
+    """
+    Check whether a tile exists and was rendered with the given signature, so that a tile left behind by a render with
+    other options, another tile size or another model is never stitched into the image
+    :param tile_path: The path to the TIFF file of the tile
+    :param signature: The hash of what the tile is rendered with
+    :return: Whether the tile can be reused
+    """
+    if not os.path.exists(tile_path):
+        return False
+    try:
+        with open(get_signature_path(tile_path)) as file:
+            return json.load(file).get("Signature") == signature
+    except (FileNotFoundError, ValueError, AttributeError):
+        return False
+
+
+def remove_tile(tile_path: str) -> None:
+    """
+    Remove a tile and its sidecar file
+    :param tile_path: The path to the TIFF file of the tile
+    :return: None
+    """
+    for path in (tile_path, get_signature_path(tile_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_tiff(file_path: str) -> Tuple[np.ndarray, bool]:
+    """
+    Read the pixels of an uncompressed TIFF file. The pixels are memory-mapped if the strips of the file follow each
+    other, as a single strip always does, and are otherwise read strip by strip into memory.
+    :param file_path: The path to the TIFF file
+    :return: A (height, width, channels) array of the pixels, top row first, and whether the alpha is premultiplied
+    :raises ValueError: If the TIFF file is compressed or its strips do not hold every pixel
+    """
+    fields = dict()
+    with open(file_path, "rb") as file:
+        order = "<" if file.read(2) == b"II" else ">"
+        _, offset = struct.unpack(order + "HI", file.read(6))
+        file.seek(offset)
+        (count,) = struct.unpack(order + "H", file.read(2))
+        entries = [struct.unpack(order + "HHII", file.read(12)) for _ in range(count)]
+
+        for tag, field_type, values, value_offset in entries:
+            if tag not in TIFF_TAGS or field_type not in TIFF_TYPES:
+                continue
+            value_format = order + str(values) + TIFF_TYPES[field_type]
+            size = struct.calcsize(value_format)
+            # Values of up to four bytes are stored in place of their offset
+            if size <= 4:
+                data = struct.pack(order + "I", value_offset)[:size]
+            else:
+                file.seek(value_offset)
+                data = file.read(size)
+            fields[TIFF_TAGS[tag]] = struct.unpack(value_format, data)
+
+    if fields.get("Compression", (1,))[0] != 1:
+        raise ValueError(f"{file_path} is compressed")
+
+    bits = fields["BitsPerSample"][0]
+    dtype = np.dtype(order + ("u1" if bits == 8 else "u2"))
+    shape = (fields["Height"][0], fields["Width"][0], fields["SamplesPerPixel"][0])
+    size = int(np.prod(shape)) * dtype.itemsize
+
+    # A single strip may leave out its byte count, as it holds every pixel
+    offsets = fields["StripOffsets"]
+    counts = fields.get("StripByteCounts", (size,) if len(offsets) == 1 else ())
+    if len(counts) != len(offsets) or sum(counts) != size:
+        raise ValueError(f"{file_path} has strips that do not hold every pixel")
+
+    if all(offsets[i] + counts[i] == offsets[i + 1] for i in range(len(offsets) - 1)):
+        pixels = np.memmap(
+            file_path, dtype=dtype, mode="r", offset=offsets[0], shape=shape
+        )
+    else:
+        data = bytearray(size)
+        position = 0
+        with open(file_path, "rb") as file:
+            for strip_offset, strip_count in zip(offsets, counts):
+                file.seek(strip_offset)
+                file.readinto(memoryview(data)[position : position + strip_count])
+                position += strip_count
+        pixels = np.frombuffer(data, dtype=dtype).reshape(shape)
+    associated = fields.get("ExtraSamples", (0,))[0] == ASSOCIATED_ALPHA
+    return pixels, associated
+
+
+def unpremultiply(pixels: np.ndarray) -> np.ndarray:
+    """
+    Divide the colour of RGBA pixels by their alpha
+    :param pixels: An (..., 4) integer array of premultiplied pixels
+    :return: An array of straight pixels with the same type
+    """
+    maximum = np.iinfo(pixels.dtype).max
+    colour = pixels.astype(np.float32)
+    alpha = colour[..., 3:]
+    np.divide(colour[..., :3] * maximum, alpha, out=colour[..., :3], where=alpha > 0)
+    return np.clip(np.rint(colour), 0, maximum).astype(pixels.dtype)
+
+
+########################################################################################################################
+# PNG WRITER CLASS
+########################################################################################################################
+class PngWriter:
+    """
+    Write a PNG file one row at a time, so that the image never has to be held in memory. The file is written to a
+    temporary path and moved into place when it is closed.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        width: int,
+        height: int,
+        depth: int,
+        channels: int,
+        compression: int = 6,
+    ):
+        """
+        Start writing a PNG file
+        :param file_path: The path to the PNG file
+        :param width: The width of the image in pixels
+        :param height: The height of the image in pixels
+        :param depth: The bit depth of a channel, either 8 or 16
+        :param channels: The number of channels, either 3 for RGB or 4 for RGBA
+        :param compression: The zlib compression level from 0 to 9
+        """
+        self.file_path = file_path
+        self.temporary = file_path + f".{os.getpid()}.tmp"
+        self.dtype = np.dtype(">u1" if depth == 8 else ">u2")
+        self.rows = 0
+        self.height = height
+        self.compressor = zlib.compressobj(compression)
+        self.pending = []
+        self.pending_size = 0
+
+        self.file = open(self.temporary, "wb")
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        header = struct.pack(
+            ">IIBBBBB", width, height, depth, PNG_COLOUR_TYPES[channels], 0, 0, 0
+        )
+        self.write_chunk(b"IHDR", header)
+
+    def write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        """
+        Write a chunk of the PNG file
+        :param chunk_type: The four byte type of the chunk
+        :param data: The data of the chunk
+        :return: None
+        """
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    def write_row(self, row: np.ndarray) -> None:
+        """
+        Compress a row of the image, writing a data chunk whenever enough compressed data is buffered
+        :param row: A (width, channels) array of the pixels of the row
+        :return: None
+        """
+        # Every row starts with the filter type, which is always none
+        data = self.compressor.compress(b"\x00" + row.astype(self.dtype).tobytes())
+        self.rows += 1
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+        if self.pending_size >= PNG_CHUNK_SIZE:
+            self.write_chunk(b"IDAT", b"".join(self.pending))
+            self.pending, self.pending_size = [], 0
+
+    def close(self) -> None:
+        """
+        Finish the PNG file and move it into place. The temporary file is removed if the PNG file cannot be finished.
+        :return: None
+        :raises ValueError: If fewer rows were written than the height of the image
+        """
+        try:
+            try:
+                if self.rows != self.height:
+                    raise ValueError(f"Wrote {self.rows} of {self.height} rows")
+                self.pending.append(self.compressor.flush())
+                self.write_chunk(b"IDAT", b"".join(self.pending))
+                self.write_chunk(b"IEND", b"")
+            finally:
+                self.file.close()
+            os.replace(self.temporary, self.file_path)
+        except Exception:
+            if os.path.exists(self.temporary):
+                os.remove(self.temporary)
+            raise
+
+    def abort(self) -> None:
+        """
+        Stop writing the PNG file and remove it
+        :return: None
+        """
+        self.file.close()
+        os.remove(self.temporary)
+
+
+########################################################################################################################
+# STITCHING FUNCTIONS
+########################################################################################################################
+def stitch_tiles(
+    tiles: List[Tuple[int, int, int, int]],
+    tile_paths: List[str],
+    file_path: str,
+    compression: int = 6,
+) -> None:
+    """
+    Stitch rendered tiles into a single PNG, streaming one row of the image at a time
+    :param tiles: The (x, y, width, height) tiles in the order returned by get_tiles
+    :param tile_paths: The path to the uncompressed TIFF file of each tile
+    :param file_path: The path to the PNG file
+    :param compression: The zlib compression level from 0 to 9
+    :return: None
+    :raises ValueError: If a tile does not have the size of its region
+    """
+    width = sum(w for x, y, w, h in tiles if y == 0)
+    height = sum(h for x, y, w, h in tiles if x == 0)
+
+    # Group the tiles into bands of tiles that share the same rows
+    bands = dict()
+    for tile, path in zip(tiles, tile_paths):
+        bands.setdefault(tile[1], []).append((tile, path))
+
+    writer = None
+    try:
+        for y in sorted(bands):
+            band = []
+            for (_, _, w, h), path in bands[y]:
+                pixels, associated = read_tiff(path)
+                if pixels.shape[:2] != (h, w):
+                    raise ValueError(f"{path} is not {w}x{h} pixels")
+                band.append((pixels, associated))
+
+            if writer is None:
+                pixels = band[0][0]
+                writer = PngWriter(
+                    file_path,
+                    width,
+                    height,
+                    8 * pixels.dtype.itemsize,
+                    pixels.shape[2],
+                    compression,
+                )
+
+            for row in range(band[0][0].shape[0]):
+                parts = [
+                    unpremultiply(x[row]) if associated and x.shape[2] == 4 else x[row]
+                    for x, associated in band
+                ]
+                writer.write_row(np.concatenate(parts))
+            del band
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+    writer.close()
@@ -0,0 +1,192 @@
+########################################################################################################################
+# stl_loader.py
+#
+# This script is used to load very large binary STL files with bounded memory. The file is memory-mapped and read in
+# fixed-size chunks of triangles, the vertices are de-duplicated through a hash index as they are read, and the mesh is
+# built with the bulk foreach_set APIs rather than through the stock importer.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import os
+
+import bpy
+import numpy as np
+
+########################################################################################################################
+# GLOBALS
+########################################################################################################################
+# The layout of a single triangle record of a binary STL file
+TRIANGLE_DTYPE = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]
+)
+
+# The size of the header of a binary STL file, followed by the triangle count
+HEADER_SIZE = 84
+
+# The number of triangles read from the file at a time
+CHUNK_TRIANGLES = 1 << 20
+
+# The multipliers used to hash the bit patterns of the x, y and z coordinates of a vertex
+HASH_MULTIPLIERS = np.array(
+    [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64
+)
+
+
+########################################################################################################################
+# STL FUNCTIONS
+########################################################################################################################
+def is_binary_stl(model_path: str) -> bool:
+    """
+    Check if an STL file is binary, by checking that its size matches the triangle count in its header
+    :param model_path: The path to the STL file
+    :return: True if the file is a binary STL file, otherwise False
+    """
+    size = os.path.getsize(model_path)
+    if size < HEADER_SIZE:
+        return False
+    with open(model_path, "rb") as file:
+        file.seek(80)
+        count = int.from_bytes(file.read(4), "little")
+    return size == HEADER_SIZE + count * TRIANGLE_DTYPE.itemsize
+
+
+def hash_vertices(vertices: np.ndarray) -> np.ndarray:
+    """
+    Hash the exact bit patterns of vertices into 64-bit keys
+    :param vertices: An (n, 3) float32 array of vertices
+    :return: An array of n uint64 keys
+    """
+    bits = vertices.view(np.uint32).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        hashed = bits * HASH_MULTIPLIERS
+    return hashed[:, 0] ^ hashed[:, 1] ^ hashed[:, 2]
+
+
+def read_stl(model_path: str):
+    """
+    Read a binary STL file in chunks, de-duplicating its vertices
+    :param model_path: The path to the binary STL file
+    :return: An (n, 3) float32 array of unique vertices and an (m, 3) int32 array of triangle vertex indices
+    """
+    records = np.memmap(model_path, dtype=TRIANGLE_DTYPE, mode="r", offset=HEADER_SIZE)
+
+    # The sorted hash index of the unique vertices and the index of the vertex each key belongs to
+    index_keys = np.empty(0, dtype=np.uint64)
+    index_values = np.empty(0, dtype=np.int32)
+    # The unique vertices, grown by doubling so that appending is amortized
+    unique = np.empty((1024, 3), dtype=np.float32)
+    unique_count = 0
+    triangle_chunks = []
+
+    for start in range(0, len(records), CHUNK_TRIANGLES):
+        # Adding zero turns negative zeros into positive zeros so that they hash the same
+        vertices = records["vertices"][start : start + CHUNK_TRIANGLES].reshape(-1, 3)
+        vertices = vertices + np.float32(0)
+
+        # De-duplicate the chunk on the exact bytes of the coordinates, so that only equal vertices are merged
+        raw = vertices.view(np.dtype((np.void, vertices.dtype.itemsize * 3))).ravel()
+        _, first, inverse = np.unique(raw, return_index=True, return_inverse=True)
+        del raw
+
+        # Order the unique vertices of the chunk by key, as the hash index is kept sorted by inserting them in order
+        keys = hash_vertices(vertices[first])
+        order = np.argsort(keys, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        chunk_keys = keys[order]
+        chunk_vertices = vertices[first[order]]
+        inverse = rank[inverse]
+        del vertices, keys
+
+        # Look up the keys of the chunk in the hash index
+        mapping = np.empty(len(chunk_keys), dtype=np.int32)
+        found = np.zeros(len(chunk_keys), dtype=bool)
+        collided = np.zeros(len(chunk_keys), dtype=bool)
+        if len(index_keys) != 0:
+            position = np.searchsorted(index_keys, chunk_keys)
+            position = np.minimum(position, len(index_keys) - 1)
+            found = index_keys[position] == chunk_keys
+            mapping[found] = index_values[position[found]]
+
+            # Guard against hash collisions by checking the coordinates of the matched vertices
+            same = np.all(unique[mapping[found]] == chunk_vertices[found], axis=1)
+            collided[np.flatnonzero(found)[~same]] = True
+            found &= ~collided
+
+        # Add the new vertices, collided vertices are kept as separate vertices but not added to the index
+        new = ~found
+        new_count = int(new.sum())
+        while unique_count + new_count > len(unique):
+            unique = np.resize(unique, (len(unique) * 2, 3))
+        unique[unique_count : unique_count + new_count] = chunk_vertices[new]
+        mapping[new] = np.arange(unique_count, unique_count + new_count)
+        unique_count += new_count
+
+        # Different vertices of the chunk can share a key, only the first of them is added to the index
+        indexable = new & ~collided
+        indexable[1:] &= chunk_keys[1:] != chunk_keys[:-1]
+        insert_at = np.searchsorted(index_keys, chunk_keys[indexable])
+        index_keys = np.insert(index_keys, insert_at, chunk_keys[indexable])
+        index_values = np.insert(index_values, insert_at, mapping[indexable])
+
+        # Drop the degenerate triangles that collapse onto fewer than three vertices
+        triangles = mapping[inverse.ravel()].reshape(-1, 3)
+        valid = (
+            (triangles[:, 0] != triangles[:, 1])
+            & (triangles[:, 1] != triangles[:, 2])
+            & (triangles[:, 0] != triangles[:, 2])
+        )
+        triangle_chunks.append(triangles[valid])
+
+    del records, index_keys, index_values
+    triangles = (
+        np.concatenate(triangle_chunks)
+        if triangle_chunks
+        else np.empty((0, 3), dtype=np.int32)
+    )
+    return unique[:unique_count].copy(), triangles
+
+
+def load_stl(model_path: str, unit: float, name: str) -> bpy.types.Object:
+    """
+    Load a binary STL file into a new object, scaled by the unit and centered on the bounds of its geometry like the
+    stock importer followed by origin_set
+    :param model_path: The path to the binary STL file
+    :param unit: The scale of the model relative to meters
+    :param name: The name of the new object and mesh
+    :return: The new object
+    """
+    vertices, triangles = read_stl(model_path)
+
+    # Scale the vertices and center them on their bounds
+    vertices *= np.float32(unit)
+    if len(vertices) != 0:
+        vertices -= (vertices.min(axis=0) + vertices.max(axis=0)) / 2
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    del vertices
+
+    mesh.loops.add(triangles.size)
+    mesh.loops.foreach_set("vertex_index", triangles.ravel())
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set(
+        "loop_start", np.arange(0, triangles.size, 3, dtype=np.int32)
+    )
+    # Older versions of Blender need the loop count of every polygon, newer versions derive it from loop_start
+    try:
+        mesh.polygons.foreach_set("loop_total", np.full(len(triangles), 3, np.int32))
+    except (AttributeError, TypeError):
+        pass
+    del triangles
+
+    mesh.update(calc_edges=True)
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
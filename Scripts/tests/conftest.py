@@ -0,0 +1,16 @@
+########################################################################################################################
+# conftest.py
+#
+# This script is used to make the scripts importable from the tests, as the scripts import each other by their module
+# names the same way Blender runs them. Only the scripts that do not need Blender are tested.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
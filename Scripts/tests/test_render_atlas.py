@@ -0,0 +1,76 @@
+########################################################################################################################
+# test_render_atlas.py
+#
+# Tests of the in-memory atlas composition of render_atlas.py.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import numpy as np
+
+import render_atlas
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+def test_layout_is_close_to_square():
+    assert render_atlas.get_layout(4) == (2, 2)
+    assert render_atlas.get_layout(5) == (2, 3)
+    assert render_atlas.get_layout(3, columns=10) == (1, 3)
+
+
+def test_opaque_views_are_copied_into_their_cells():
+    red = np.zeros((2, 3, 4), np.float32)
+    red[...] = (1, 0, 0, 1)
+    sheet = render_atlas.compose_atlas(
+        [("a", red), ("b", red)], columns=2, padding=1, label_colour=None
+    )
+
+    assert sheet.shape == (4, 9, 4)
+    np.testing.assert_array_equal(sheet[1:3, 1:4], red)
+    np.testing.assert_array_equal(sheet[1:3, 5:8], red)
+    np.testing.assert_array_equal(sheet[0, 0], (1, 1, 1, 1))
+
+
+def test_transparent_views_show_the_background():
+    # A preview render with a transparent film, half covered by a half transparent grey, premultiplied
+    tile = np.zeros((2, 2, 4), np.float32)
+    tile[0] = (0.25, 0.25, 0.25, 0.5)
+    sheet = render_atlas.compose_atlas(
+        [("a", tile)],
+        padding=1,
+        background=(0, 0, 1, 1),
+        label_colour=None,
+    )
+
+    np.testing.assert_allclose(sheet[1, 1], (0.25, 0.25, 0.75, 1))
+    np.testing.assert_allclose(sheet[2, 1], (0, 0, 1, 1))
+    np.testing.assert_array_equal(sheet[..., 3], 1)
+
+
+def test_straight_views_are_weighted_by_their_alpha():
+    tile = np.zeros((1, 1, 4), np.float32)
+    tile[0, 0] = (1, 0, 0, 0.25)
+    sheet = render_atlas.compose_atlas(
+        [("a", tile)],
+        padding=0,
+        background=(0, 1, 0, 1),
+        label_colour=None,
+        premultiplied=False,
+    )
+
+    np.testing.assert_allclose(sheet[0, 0], (0.25, 0.75, 0, 1))
+
+
+def test_labels_are_drawn_under_each_view():
+    tile = np.ones((4, 40, 4), np.float32)
+    sheet = render_atlas.compose_atlas(
+        [("top", tile)], padding=2, label_colour=(1, 0, 0, 1), label_scale=1
+    )
+
+    label = sheet[8:15]
+    assert np.any(np.all(label == (1, 0, 0, 1), axis=-1))
@@ -0,0 +1,134 @@
+########################################################################################################################
+# test_render_cache.py
+#
+# Tests of the cache keys, entries and counters of render_cache.py.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import os
+
+import pytest
+
+import render_cache
+
+
+########################################################################################################################
+# FIXTURES
+########################################################################################################################
+@pytest.fixture
+def model(tmp_path) -> str:
+    path = tmp_path / "model.stl"
+    path.write_bytes(b"solid model")
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path) -> render_cache.RenderCache:
+    return render_cache.RenderCache(str(tmp_path / "cache"), 1024)
+
+
+POSITION = {"X": 0, "Y": 0, "Z": 1, "Rx": 0, "Ry": 0, "Rz": 0}
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+def test_keys_ignore_the_order_and_the_options_that_do_not_change_pixels(cache, model):
+    data = {
+        "Model": model,
+        "Unit": 1,
+        "Name": "a",
+        "Resolution": {"Width": 1, "Height": 2},
+    }
+    same = {
+        "Resolution": {"Height": 2, "Width": 1},
+        "Unit": 1,
+        "Name": "b",
+        "Model": model,
+    }
+    assert cache.key(data, POSITION, "normal") == cache.key(same, POSITION, "normal")
+
+
+def test_keys_change_with_what_changes_the_pixels(cache, model):
+    data = {"Model": model, "Unit": 1}
+    key = cache.key(data, POSITION, "normal")
+    environment = {"Blender": "4.2.0", "Engine": "CYCLES", "Device": "GPU"}
+
+    assert cache.key(dict(data, Unit=2), POSITION, "normal") != key
+    assert cache.key(data, dict(POSITION, Z=2), "normal") != key
+    assert cache.key(data, POSITION, "preview") != key
+    assert cache.key(data, POSITION, "normal", environment) != key
+    assert cache.key(
+        data, POSITION, "normal", dict(environment, Device="CPU")
+    ) != cache.key(data, POSITION, "normal", environment)
+
+
+def test_keys_follow_the_contents_of_the_model(cache, model):
+    key = cache.key({"Model": model}, POSITION, "normal")
+    with open(model, "ab") as file:
+        file.write(b" changed")
+    assert cache.key({"Model": model}, POSITION, "normal") != key
+
+
+def test_copies_of_a_model_share_their_keys(cache, model, tmp_path):
+    copy = tmp_path / "copy.stl"
+    copy.write_bytes(open(model, "rb").read())
+    assert cache.key({"Model": model}, POSITION, "normal") == cache.key(
+        {"Model": str(copy)}, POSITION, "normal"
+    )
+
+
+def test_stored_images_are_fetched_with_their_extension(cache, tmp_path):
+    source = tmp_path / "render.exr"
+    source.write_bytes(b"pixels")
+    cache.store("key", str(source))
+
+    assert cache.contains("key", ".exr")
+    assert not cache.fetch("key", str(tmp_path / "view.png"))
+    assert cache.fetch("key", str(tmp_path / "view.exr"))
+    assert (tmp_path / "view.exr").read_bytes() == b"pixels"
+
+
+def test_fetching_an_uncached_view_leaves_the_destination_alone(cache, tmp_path):
+    destination = tmp_path / "view.png"
+    destination.write_bytes(b"previous")
+    assert not cache.fetch("missing", str(destination))
+    assert destination.read_bytes() == b"previous"
+
+
+def test_counters_and_statistics(cache, tmp_path):
+    source = tmp_path / "render.png"
+    source.write_bytes(b"pixels")
+    cache.store("key", str(source))
+    cache.fetch("key", str(tmp_path / "view.png"))
+    cache.fetch("missing", str(tmp_path / "other.png"))
+
+    stats = cache.stats()
+    assert (stats["Hits"], stats["Misses"]) == (1, 1)
+    assert (stats["Entries"], stats["Bytes"], stats["MaxBytes"]) == (1, 6, 1024)
+
+
+def test_the_least_recently_used_images_are_evicted(cache, tmp_path):
+    source = tmp_path / "render.png"
+    source.write_bytes(b"x" * 300)
+    for index, key in enumerate(["a", "b", "c"]):
+        cache.store(key, str(source))
+        os.utime(cache.path(key), (index, index))
+    cache.fetch("a", str(tmp_path / "view.png"))
+    cache.store("d", str(source))
+
+    assert [cache.contains(x) for x in "abcd"] == [True, False, True, True]
+
+
+def test_invalidating_a_model_only_removes_its_images(cache, model, tmp_path):
+    source = tmp_path / "render.png"
+    source.write_bytes(b"pixels")
+    cache.store(cache.key({"Model": model}, POSITION, "normal"), str(source))
+    cache.store("other-key", str(source))
+
+    assert cache.invalidate(model) == 1
+    assert cache.stats()["Entries"] == 1
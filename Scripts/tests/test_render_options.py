@@ -0,0 +1,110 @@
+########################################################################################################################
+# test_render_options.py
+#
+# Tests of the validation of render options by render_options.py.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import pytest
+
+import render_options
+
+
+########################################################################################################################
+# HELPERS
+########################################################################################################################
+def get_options(**overrides) -> dict:
+    """
+    Get valid render options with some options replaced
+    :param overrides: The options to replace
+    :return: The render options
+    """
+    options = {
+        "Name": "view",
+        "Model": "model.stl",
+        "OutputDirectory": "out/",
+        "Unit": 0.001,
+        "Resolution": {"Width": 64, "Height": 32, "Scale": 100},
+        "Camera": {
+            "Distance": 2,
+            "Position": {"X": 0, "Y": 0, "Z": 1, "Rx": 0, "Ry": 0, "Rz": 0},
+        },
+        "BackgroundColour": "255,255,255,0",
+    }
+    options.update(overrides)
+    return options
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+def test_valid_options_have_no_errors():
+    assert render_options.get_option_errors(get_options(), check_files=False) == []
+
+
+def test_every_problem_is_listed():
+    options = get_options(
+        Unit=-1, Resolution={"Width": 1.5, "Height": 32}, BackgroundColour="1,2"
+    )
+    errors = render_options.get_option_errors(options, check_files=False)
+
+    assert "Unit must be at least 0" in errors
+    assert "Resolution.Width must be an integer" in errors
+    assert "Resolution.Scale is missing" in errors
+    assert any(x.startswith("BackgroundColour:") for x in errors)
+
+
+def test_booleans_are_not_numbers():
+    options = get_options(Threads=True)
+    errors = render_options.get_option_errors(options, check_files=False)
+    assert errors == ["Threads must be an integer"]
+
+
+def test_missing_model_files_are_reported(tmp_path):
+    model = tmp_path / "model.stl"
+    assert render_options.get_option_errors(get_options(Model=str(model))) == [
+        f"Model {str(model)!r} does not exist"
+    ]
+    model.write_bytes(b"")
+    assert render_options.get_option_errors(get_options(Model=str(model))) == []
+
+
+def test_views_replace_the_camera_position():
+    camera = {"Distance": 2}
+    views = [{"Name": "front", "Position": {"X": 0, "Y": 0, "Z": 1}}]
+    errors = render_options.get_option_errors(
+        get_options(Camera=camera, Views=views), check_files=False
+    )
+    assert errors == [f"Views[0].Position.{x} is missing" for x in ("Rx", "Ry", "Rz")]
+
+
+def test_noise_measurement_cannot_be_combined_with_thumbnails():
+    options = get_options(
+        Sampling={"MeasureNoise": True}, Output={"Thumbnails": [{"Width": 16}]}
+    )
+    errors = render_options.get_option_errors(options, check_files=False)
+    assert errors == ["Sampling.MeasureNoise cannot be combined with Output.Thumbnails"]
+
+
+def test_check_options_raises_with_every_error():
+    with pytest.raises(render_options.OptionsError) as error:
+        render_options.check_options({"Name": 1}, check_files=False)
+    assert "Name must be a string" in error.value.errors
+    assert "Camera must be an object" in error.value.errors
+
+
+@pytest.mark.parametrize(
+    "colour, expected",
+    [("1,2,3", (1, 2, 3, 255)), ([1, 2, 3, 4], (1, 2, 3, 4))],
+)
+def test_colours_are_parsed(colour, expected):
+    assert render_options.parse_colour(colour) == expected
+
+
+def test_colours_outside_the_range_are_rejected():
+    with pytest.raises(ValueError):
+        render_options.parse_colour("0,0,256")
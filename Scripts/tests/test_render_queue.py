@@ -0,0 +1,154 @@
+########################################################################################################################
+# test_render_queue.py
+#
+# Tests of the job queue database of render_queue.py: queueing, claiming, retries and the recovery of abandoned jobs.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import sqlite3
+import time
+
+import pytest
+
+import render_queue
+
+
+########################################################################################################################
+# FIXTURES
+########################################################################################################################
+@pytest.fixture
+def connection(tmp_path) -> sqlite3.Connection:
+    connection = render_queue.connect(str(tmp_path / "queue.db"))
+    yield connection
+    connection.close()
+
+
+########################################################################################################################
+# HELPERS
+########################################################################################################################
+def add_job(connection: sqlite3.Connection, name: str, **kwargs) -> int:
+    """
+    Queue a single job
+    :param connection: The queue database
+    :param name: The name of the job
+    :param kwargs: The priority, timeout and retries of the job, which default to 0, None and 0
+    :return: The number of jobs that were added
+    """
+    options = dict(priority=0, timeout=None, retries=0)
+    options.update(kwargs)
+    return render_queue.add_jobs(connection, [{"Name": name}], "normal", **options)
+
+
+def get_status(connection: sqlite3.Connection, name: str) -> str:
+    """
+    Get the status of a job
+    :param connection: The queue database
+    :param name: The name of the job
+    :return: The status of the job
+    """
+    return connection.execute(
+        "SELECT status FROM jobs WHERE name = ?", (name,)
+    ).fetchone()["status"]
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+def test_the_same_job_is_only_queued_once(connection):
+    assert add_job(connection, "a") == 1
+    assert add_job(connection, "a") == 0
+    assert add_job(connection, "a", priority=5) == 0
+    assert render_queue.get_job_key({"Name": "a"}, "normal") != (
+        render_queue.get_job_key({"Name": "a"}, "preview")
+    )
+
+
+def test_jobs_are_claimed_by_priority_then_in_order(connection):
+    add_job(connection, "a")
+    add_job(connection, "b", priority=1)
+    add_job(connection, "c")
+
+    names = [render_queue.claim_job(connection)["name"] for _ in range(3)]
+    assert names == ["b", "a", "c"]
+    assert render_queue.claim_job(connection) is None
+    assert get_status(connection, "a") == "running"
+
+
+def test_failed_jobs_are_retried_until_they_run_out_of_attempts(connection):
+    add_job(connection, "a", retries=1)
+    error = {"Type": "RenderError"}
+
+    job = render_queue.claim_job(connection)
+    assert render_queue.finish_job(connection, job, 1, error) == "queued"
+    job = render_queue.claim_job(connection)
+    assert job["attempts"] == 1
+    assert render_queue.finish_job(connection, job, 1, error) == "failed"
+    assert render_queue.claim_job(connection) is None
+
+
+def test_completed_jobs_are_not_retried(connection):
+    add_job(connection, "a", retries=3)
+    job = render_queue.claim_job(connection)
+    assert render_queue.finish_job(connection, job, 0, None) == "completed"
+    assert render_queue.claim_job(connection) is None
+
+
+def test_only_abandoned_jobs_and_jobs_of_this_runner_are_recovered(connection):
+    for name in ("own", "stale", "live", "unowned"):
+        add_job(connection, name)
+        render_queue.claim_job(connection)
+
+    now = time.time()
+    rows = [
+        ("stale", "other", now - render_queue.LEASE_SECONDS - 1),
+        ("live", "other", now),
+        ("unowned", None, None),
+    ]
+    connection.executemany(
+        "UPDATE jobs SET runner = ?, heartbeat = ? WHERE name = ?",
+        [(runner, heartbeat, name) for name, runner, heartbeat in rows],
+    )
+
+    assert render_queue.recover_jobs(connection) == 3
+    assert get_status(connection, "live") == "running"
+    for name in ("own", "stale", "unowned"):
+        assert get_status(connection, name) == "queued"
+
+
+def test_heartbeats_only_renew_the_jobs_of_this_runner(connection):
+    add_job(connection, "own")
+    add_job(connection, "other")
+    render_queue.claim_job(connection)
+    render_queue.claim_job(connection)
+    connection.execute(
+        "UPDATE jobs SET runner = 'other', heartbeat = 0 WHERE name = 'other'"
+    )
+    connection.execute("UPDATE jobs SET heartbeat = 0 WHERE name = 'own'")
+
+    render_queue.record_heartbeat(connection)
+    heartbeats = dict(connection.execute("SELECT name, heartbeat FROM jobs"))
+    assert heartbeats["own"] > 0
+    assert heartbeats["other"] == 0
+
+
+def test_older_databases_get_the_new_columns(tmp_path):
+    path = str(tmp_path / "queue.db")
+    old = sqlite3.connect(path)
+    old.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, name TEXT NOT NULL, "
+        "options TEXT NOT NULL, quality TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, timeout REAL, "
+        "max_attempts INTEGER NOT NULL DEFAULT 1, attempts INTEGER NOT NULL DEFAULT 0, "
+        "status TEXT NOT NULL DEFAULT 'queued', created REAL NOT NULL, started REAL, finished REAL, "
+        "exit_code INTEGER, error TEXT)"
+    )
+    old.close()
+
+    connection = render_queue.connect(path)
+    add_job(connection, "a")
+    assert render_queue.claim_job(connection)["name"] == "a"
+    assert get_status(connection, "a") == "running"
+    connection.close()
@@ -0,0 +1,264 @@
+########################################################################################################################
+# test_render_tiles.py
+#
+# Tests of the tile layout, the TIFF reader, the streaming PNG writer and the stitching of render_tiles.py. The TIFF
+# and PNG files are written and read with the standard library, so the tests do not depend on an image library.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+import render_tiles
+
+
+########################################################################################################################
+# HELPERS
+########################################################################################################################
+def write_tiff(
+    path: str,
+    pixels: np.ndarray,
+    order: str = "<",
+    strips: int = 1,
+    gap: int = 0,
+    associated: bool = False,
+    compression: int = 1,
+) -> None:
+    """
+    Write an uncompressed TIFF file, optionally split into strips with unused bytes between them
+    :param path: The path to the TIFF file
+    :param pixels: A (height, width, channels) uint8 or uint16 array
+    :param order: The byte order, "<" or ">"
+    :param strips: The number of strips
+    :param gap: The number of unused bytes after every strip
+    :param associated: Whether the alpha channel is marked as premultiplied
+    :param compression: The value of the Compression tag
+    :return: None
+    """
+    height, width, channels = pixels.shape
+    data = pixels.astype(pixels.dtype.newbyteorder(order)).tobytes()
+    rows = -(-height // strips)
+    row_size = width * channels * pixels.dtype.itemsize
+    strip_data = [
+        data[i * row_size : (i + rows) * row_size] for i in range(0, height, rows)
+    ]
+
+    entries = [
+        (256, 4, [width]),
+        (257, 4, [height]),
+        (258, 3, [8 * pixels.dtype.itemsize] * channels),
+        (259, 3, [compression]),
+        (273, 4, [0] * len(strip_data)),
+        (277, 3, [channels]),
+        (279, 4, [len(x) for x in strip_data]),
+    ]
+    if channels == 4:
+        entries.append((338, 3, [1 if associated else 2]))
+
+    # The values that do not fit in their entry follow the entries, and the strips follow them
+    formats = {3: "H", 4: "I"}
+    sizes = [struct.calcsize(order + str(len(v)) + formats[t]) for _, t, v in entries]
+    extra_start = 8 + 2 + 12 * len(entries) + 4
+    data_start = extra_start + sum(x for x in sizes if x > 4)
+    offsets, position = [], data_start
+    for strip in strip_data:
+        offsets.append(position)
+        position += len(strip) + gap
+    entries[4] = (273, 4, offsets)
+
+    ifd = struct.pack(order + "H", len(entries))
+    extra = b""
+    for (tag, field_type, values), size in zip(entries, sizes):
+        packed = struct.pack(order + str(len(values)) + formats[field_type], *values)
+        if size > 4:
+            value = struct.pack(order + "I", extra_start + len(extra))
+            extra += packed
+        else:
+            value = packed.ljust(4, b"\x00")
+        ifd += struct.pack(order + "HHI", tag, field_type, len(values)) + value
+    ifd += struct.pack(order + "I", 0)
+
+    with open(path, "wb") as file:
+        file.write(
+            (b"II" if order == "<" else b"MM") + struct.pack(order + "HI", 42, 8)
+        )
+        file.write(ifd + extra)
+        for strip in strip_data:
+            file.write(strip + b"\xff" * gap)
+
+
+def read_png(path: str) -> np.ndarray:
+    """
+    Read a PNG file without filters, as written by PngWriter
+    :param path: The path to the PNG file
+    :return: A (height, width, channels) array of the pixels
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+
+    position, chunks = 8, []
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position : position + 4])
+        chunk_type = data[position + 4 : position + 8]
+        chunk = data[position + 8 : position + 8 + length]
+        (crc,) = struct.unpack(
+            ">I", data[position + 8 + length : position + 12 + length]
+        )
+        assert crc == zlib.crc32(chunk_type + chunk)
+        chunks.append((chunk_type, chunk))
+        position += 12 + length
+    assert chunks[0][0] == b"IHDR" and chunks[-1][0] == b"IEND"
+
+    width, height, depth, colour_type = struct.unpack(">IIBB", chunks[0][1][:10])
+    channels = {2: 3, 6: 4}[colour_type]
+    raw = zlib.decompress(b"".join(x for t, x in chunks if t == b"IDAT"))
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, -1)
+    assert np.all(rows[:, 0] == 0)
+    dtype = np.dtype(">u1" if depth == 8 else ">u2")
+    return np.frombuffer(rows[:, 1:].tobytes(), dtype=dtype).reshape(
+        height, width, channels
+    )
+
+
+def write_tiles(folder, image: np.ndarray, size: int, **kwargs) -> tuple:
+    """
+    Split an image into tiles and write each tile as a TIFF file
+    :param folder: The folder to write the tiles to
+    :param image: A (height, width, channels) array
+    :param size: The maximum width and height of a tile
+    :param kwargs: The options of write_tiff
+    :return: The tiles and the path of each tile
+    """
+    tiles = render_tiles.get_tiles(image.shape[1], image.shape[0], size)
+    paths = []
+    for index, (x, y, w, h) in enumerate(tiles):
+        paths.append(str(folder / f"view.tile{index}.tif"))
+        write_tiff(paths[-1], image[y : y + h, x : x + w], **kwargs)
+    return tiles, paths
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+def test_tiles_cover_the_image_row_by_row():
+    assert render_tiles.get_tiles(5, 3, 2) == [
+        (0, 0, 2, 2),
+        (2, 0, 2, 2),
+        (4, 0, 1, 2),
+        (0, 2, 2, 1),
+        (2, 2, 2, 1),
+        (4, 2, 1, 1),
+    ]
+
+
+@pytest.mark.parametrize("order", ["<", ">"])
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+def test_contiguous_tiffs_are_memory_mapped(tmp_path, order, dtype):
+    pixels = np.random.default_rng(0).integers(0, 255, (3, 4, 4)).astype(dtype)
+    write_tiff(str(tmp_path / "a.tif"), pixels, order=order, strips=3)
+
+    read, associated = render_tiles.read_tiff(str(tmp_path / "a.tif"))
+    assert isinstance(read, np.memmap)
+    np.testing.assert_array_equal(read, pixels)
+    assert not associated
+
+
+def test_separate_strips_are_read_into_memory(tmp_path):
+    pixels = np.random.default_rng(1).integers(0, 65535, (5, 2, 3)).astype(np.uint16)
+    write_tiff(str(tmp_path / "a.tif"), pixels, order=">", strips=2, gap=3)
+
+    read, _ = render_tiles.read_tiff(str(tmp_path / "a.tif"))
+    assert not isinstance(read, np.memmap)
+    np.testing.assert_array_equal(read, pixels)
+
+
+def test_premultiplied_alpha_is_reported(tmp_path):
+    write_tiff(str(tmp_path / "a.tif"), np.zeros((1, 1, 4), np.uint8), associated=True)
+    assert render_tiles.read_tiff(str(tmp_path / "a.tif"))[1]
+
+
+def test_compressed_tiffs_are_rejected(tmp_path):
+    write_tiff(str(tmp_path / "a.tif"), np.zeros((1, 1, 3), np.uint8), compression=5)
+    with pytest.raises(ValueError, match="compressed"):
+        render_tiles.read_tiff(str(tmp_path / "a.tif"))
+
+
+def test_unpremultiply_leaves_transparent_pixels_black():
+    pixels = np.array([[128, 64, 0, 128], [10, 10, 10, 0]], np.uint8)
+    np.testing.assert_array_equal(
+        render_tiles.unpremultiply(pixels), [[255, 128, 0, 128], [10, 10, 10, 0]]
+    )
+
+
+@pytest.mark.parametrize("depth, channels", [(8, 3), (16, 4)])
+def test_png_writer_writes_every_row(tmp_path, depth, channels, monkeypatch):
+    # Write a data chunk for every few rows
+    monkeypatch.setattr(render_tiles, "PNG_CHUNK_SIZE", 16)
+    maximum = (1 << depth) - 1
+    image = np.random.default_rng(2).integers(0, maximum, (7, 5, channels))
+
+    writer = render_tiles.PngWriter(str(tmp_path / "a.png"), 5, 7, depth, channels)
+    for row in image:
+        writer.write_row(row)
+    writer.close()
+
+    np.testing.assert_array_equal(read_png(str(tmp_path / "a.png")), image)
+    assert os.listdir(tmp_path) == ["a.png"]
+
+
+def test_png_writer_removes_its_temporary_file_when_it_fails(tmp_path):
+    writer = render_tiles.PngWriter(str(tmp_path / "a.png"), 2, 2, 8, 3)
+    writer.write_row(np.zeros((2, 3)))
+    with pytest.raises(ValueError, match="Wrote 1 of 2 rows"):
+        writer.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_stitched_tiles_match_the_image(tmp_path):
+    image = np.random.default_rng(3).integers(0, 255, (5, 7, 3)).astype(np.uint8)
+    tiles, paths = write_tiles(tmp_path, image, 3)
+
+    render_tiles.stitch_tiles(tiles, paths, str(tmp_path / "view.png"))
+    np.testing.assert_array_equal(read_png(str(tmp_path / "view.png")), image)
+
+
+def test_stitching_unpremultiplies_the_tiles(tmp_path):
+    image = np.array([[[128, 64, 0, 128], [0, 0, 0, 0]]], np.uint16) * 257
+    tiles, paths = write_tiles(tmp_path, image, 1, associated=True)
+
+    render_tiles.stitch_tiles(tiles, paths, str(tmp_path / "view.png"))
+    np.testing.assert_array_equal(
+        read_png(str(tmp_path / "view.png")), render_tiles.unpremultiply(image)
+    )
+
+
+def test_stitching_a_tile_of_the_wrong_size_leaves_no_image(tmp_path):
+    image = np.zeros((4, 4, 3), np.uint8)
+    tiles, paths = write_tiles(tmp_path, image, 2)
+    write_tiff(paths[-1], np.zeros((1, 2, 3), np.uint8))
+
+    with pytest.raises(ValueError, match="is not 2x2 pixels"):
+        render_tiles.stitch_tiles(tiles, paths, str(tmp_path / "view.png"))
+    assert not any(x.startswith("view.png") for x in os.listdir(tmp_path))
+
+
+def test_tiles_are_only_reused_with_the_same_signature(tmp_path):
+    path = str(tmp_path / "view.tile0.tif")
+    write_tiff(path, np.zeros((1, 1, 3), np.uint8))
+    assert not render_tiles.is_tile_current(path, "a")
+
+    render_tiles.write_tile_signature(path, "a")
+    assert render_tiles.is_tile_current(path, "a")
+    assert not render_tiles.is_tile_current(path, "b")
+
+    render_tiles.remove_tile(path)
+    assert os.listdir(tmp_path) == []
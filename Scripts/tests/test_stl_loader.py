@@ -0,0 +1,102 @@
+########################################################################################################################
+# test_stl_loader.py
+#
+# Tests of the chunked reading and vertex de-duplication of stl_loader.py. The loader builds Blender meshes, so these
+# tests only run where bpy can be imported, such as the Python of Blender or the bpy module from PyPI.
+#
+# Copyright (C) 2024 noahsub
+########################################################################################################################
+
+########################################################################################################################
+# IMPORTS
+########################################################################################################################
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+
+import stl_loader
+
+
+########################################################################################################################
+# HELPERS
+########################################################################################################################
+def write_stl(path: str, triangles: np.ndarray) -> str:
+    """
+    Write a binary STL file
+    :param path: The path to the STL file
+    :param triangles: An (n, 3, 3) array of the vertices of each triangle
+    :return: The path to the STL file
+    """
+    records = np.zeros(len(triangles), dtype=stl_loader.TRIANGLE_DTYPE)
+    records["vertices"] = triangles
+    with open(path, "wb") as file:
+        file.write(b"\x00" * 80 + len(triangles).to_bytes(4, "little"))
+        file.write(records.tobytes())
+    return path
+
+
+def get_triangles(seed: int) -> np.ndarray:
+    """
+    Get triangles whose vertices are drawn from a small set of points, so that most vertices are shared
+    :param seed: The seed of the random triangles
+    :return: An (n, 3, 3) float32 array of the vertices of each triangle
+    """
+    rng = np.random.default_rng(seed)
+    points = (rng.integers(-3, 3, (40, 3)) * 0.5).astype(np.float32)
+    points[0] = (-0.0, 0, 0)
+    return points[rng.integers(0, len(points), (300, 3))]
+
+
+def check_mesh(
+    vertices: np.ndarray, indices: np.ndarray, triangles: np.ndarray
+) -> None:
+    """
+    Check that a mesh holds the non-degenerate triangles it was read from
+    :param vertices: The vertices read from the file
+    :param indices: The vertex indices of each triangle read from the file
+    :param triangles: The vertices of each triangle written to the file
+    :return: None
+    """
+    # Negative zeros are read as positive zeros
+    triangles = triangles + np.float32(0)
+    kept = [len({tuple(x) for x in triangle}) == 3 for triangle in triangles]
+    np.testing.assert_array_equal(vertices[indices], triangles[kept])
+
+
+########################################################################################################################
+# TESTS
+########################################################################################################################
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 20])
+def test_shared_vertices_are_merged_across_chunks(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(stl_loader, "CHUNK_TRIANGLES", chunk)
+    triangles = get_triangles(chunk)
+    path = write_stl(str(tmp_path / "model.stl"), triangles)
+
+    assert stl_loader.is_binary_stl(path)
+    vertices, indices = stl_loader.read_stl(path)
+    assert len(vertices) == len(np.unique(triangles.reshape(-1, 3) + 0, axis=0))
+    check_mesh(vertices, indices, triangles)
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 20])
+def test_vertices_with_the_same_hash_are_kept_apart(tmp_path, monkeypatch, chunk):
+    # Keep only two bits of the hash, so that most different vertices collide
+    hash_vertices = stl_loader.hash_vertices
+    monkeypatch.setattr(
+        stl_loader, "hash_vertices", lambda x: hash_vertices(x) & np.uint64(3)
+    )
+    monkeypatch.setattr(stl_loader, "CHUNK_TRIANGLES", chunk)
+    triangles = get_triangles(chunk)
+    path = write_stl(str(tmp_path / "model.stl"), triangles)
+
+    vertices, indices = stl_loader.read_stl(path)
+    check_mesh(vertices, indices, triangles)
+    if chunk > len(triangles):
+        assert len(vertices) == len(np.unique(vertices, axis=0))
+
+
+def test_ascii_stl_files_are_not_binary(tmp_path):
+    path = tmp_path / "model.stl"
+    path.write_text("solid model\nendsolid model\n")
+    assert not stl_loader.is_binary_stl(str(path))